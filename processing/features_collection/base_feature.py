@@ -7,14 +7,24 @@ import pandas as pd
 
 from processing.utility.utility import UtilityProcess
 
+# DataFrame attribute marking a building set prepared by an incremental update, whose cleared rows are recalculated
+INCREMENTAL_ATTR = "incremental_update"
+
 
 class BaseFeature(UtilityProcess, ABC):
+    # Bump when a feature's calculation changes, so cached results of the old implementation are not reused
+    version = 1
+    # Features that look up the project's census table; its content is part of their cache key
+    reads_census_table = False
+
     def __init__(self):
         # Initialize default and projected CRS from configuration
         super().__init__()
         self.feature_name = None
         self.projected_crs = self.config.get('PROJECTED_CRS', 'EPSG:32632')
         self.default_crs = self.config.get('DEFAULT_CRS', 4326)
+        # Set by the feature factory for building sets coming from an incremental update
+        self.incremental_update = False
 
     # --- CRS Management ---
     def set_crs(self, gdf, target_crs, crs_type="default"):
@@ -84,9 +94,14 @@ class BaseFeature(UtilityProcess, ABC):
         return gdf
 
     def check_invalid_rows(self, gdf, feature_name):
-        if not gdf[feature_name].isnull().all():
+        missing = gdf[feature_name].isnull()
+        if not missing.all():
             gdf = self.validate_data(gdf, feature_name)
-        invalid_rows = gdf[gdf[feature_name].isnull()]
+        if self.incremental_update:
+            # Rows cleared by the update still need to be calculated, even if validation fills them
+            invalid_rows = gdf[missing.reindex(gdf.index, fill_value=False) | gdf[feature_name].isnull()]
+        else:
+            invalid_rows = gdf[gdf[feature_name].isnull()]
         if not invalid_rows.empty:
             print(f"Found {len(invalid_rows)} invalid rows in feature '{feature_name}'.")
         else:
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import threading
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import shapely
+
+from config.config import Config
+from processing.utility.census_table import CensusTable
+from processing.utility.disk_cache import DiskCache
+
+# Hit and miss counts per feature in this process
+_CACHE_STATS = {}
+_STATS_LOCK = threading.Lock()
+
+ROW_COLUMN = "__row__"
+GEOMETRY_COLUMN = "__geometry__"
+
+
+class FeatureCache(Config):
+    """
+    Content-addressed cache of feature results.
+    A feature's result is keyed on its input columns (required features, columns named in its config,
+    its own column, building ids and footprints), its configuration, its implementation version and, for
+    features that read it, the census table. It is stored as an Arrow file holding everything the feature
+    changed in the frame (the rows it kept, the columns it added, rewrote or dropped, and the footprints
+    and CRS if it moved them), so a hit returns the same frame as a run.
+    The key covers the index and footprints of the whole frame: any added, removed or moved building
+    changes the key of every feature, so results are only reused for the same building set.
+    """
+
+    def __init__(self):
+        super().__init__()
+        cache_config = self.config.get("feature_cache", {})
+        self.enabled = cache_config.get("enabled", True)
+        self.excluded = set(cache_config.get("exclude", []))
+        self.features = self.config.get("features", {})
+        self.scenario_list = self.config.get("project_info", {}).get("scenarioList", [])
+        self.cache = DiskCache(
+            cache_config.get("directory", "./data_source/cache/features"),
+            cache_config.get("max_bytes", 500 * 1024 * 1024),
+            suffix=".arrow"
+        )
+
+    @staticmethod
+    def stats():
+        """Return the hit and miss counts per feature."""
+        with _STATS_LOCK:
+            return {feature: dict(counts) for feature, counts in _CACHE_STATS.items()}
+
+    def _count(self, feature_name, outcome):
+        with _STATS_LOCK:
+            counts = _CACHE_STATS.setdefault(feature_name, {"hits": 0, "misses": 0})
+            counts[outcome] += 1
+
+    def _column_hash(self, series):
+        """Hash a column row by row, falling back to the text form for unhashable values (lists, dicts)."""
+        if series.dtype == object:
+            try:
+                return pd.util.hash_array(series.to_numpy(dtype=object))
+            except TypeError:
+                return pd.util.hash_array(series.astype(str).to_numpy(dtype=object))
+        return pd.util.hash_pandas_object(series, index=False).to_numpy()
+
+    @staticmethod
+    def _config_columns(value, columns):
+        """Return the frame columns named anywhere in a feature's config, e.g. its census_id_column."""
+        found = []
+        if isinstance(value, str):
+            if value in columns:
+                found.append(value)
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                found += FeatureCache._config_columns(key, columns) + FeatureCache._config_columns(item, columns)
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                found += FeatureCache._config_columns(item, columns)
+        return found
+
+    def key(self, feature_name, feature_class, gdf):
+        """Return the cache key of a feature run on the given frame, or None if it must not be cached."""
+        if not self.enabled or feature_name in self.excluded or gdf.geometry.name not in gdf.columns:
+            return None
+
+        feature_config = self.features.get(feature_name, {})
+        # Declared inputs, plus the columns a feature reads through its config without declaring them
+        inputs = list(dict.fromkeys(feature_config.get("required_features", []) + [feature_name, "building_id"] +
+                                    self._config_columns(feature_config, set(gdf.columns))))
+
+        reads_census = getattr(feature_class, "reads_census_table", False)
+
+        digest = hashlib.sha1()
+        digest.update(json.dumps({
+            "feature": feature_name,
+            "config": feature_config,
+            "scenarios": sorted(self.scenario_list),
+            "version": getattr(feature_class, "version", 1),
+            "crs": str(gdf.crs),
+            "census_table": CensusTable().content_hash() if reads_census else None,
+        }, sort_keys=True, default=str).encode("utf-8"))
+        digest.update(pd.util.hash_array(np.asarray(gdf.index, dtype=object)).tobytes())
+        digest.update(self._geometry_hash(gdf).tobytes())
+        for column in inputs:
+            digest.update(column.encode("utf-8"))
+            if column in gdf.columns:
+                digest.update(str(gdf[column].dtype).encode("utf-8"))
+                digest.update(self._column_hash(gdf[column]).tobytes())
+        return f"{feature_name}/{digest.hexdigest()}"
+
+    def _geometry_hash(self, gdf):
+        return pd.util.hash_array(shapely.to_wkb(np.asarray(gdf.geometry.values, dtype=object)))
+
+    def snapshot(self, gdf):
+        """Record the frame a feature is about to run on, so that put can store everything the feature changed."""
+        geometry_name = gdf.geometry.name
+        return {
+            "index": gdf.index.copy(),
+            "dtypes": {col: str(gdf[col].dtype) for col in gdf.columns if col != geometry_name},
+            "hashes": {col: self._column_hash(gdf[col]) for col in gdf.columns if col != geometry_name},
+            "geometry": self._geometry_hash(gdf),
+            "crs": gdf.crs,
+        }
+
+    def get(self, key, feature_name, gdf):
+        """Return the frame with the cached feature result applied, or None on a cache miss."""
+        if key is None:
+            return None
+
+        data = self.cache.get(key)
+        if data is None:
+            self._count(feature_name, "misses")
+            return None
+
+        table = pa.ipc.open_file(pa.BufferReader(data)).read_all()
+        layout = json.loads(table.schema.metadata[b"feature_cache"])
+        result = table.to_pandas()
+        gdf = gdf.iloc[result.pop(ROW_COLUMN).to_numpy()].drop(columns=layout["dropped"])
+        if GEOMETRY_COLUMN in result.columns:
+            geometry = shapely.from_wkb(result.pop(GEOMETRY_COLUMN).to_numpy())
+            gdf[gdf.geometry.name] = gpd.GeoSeries(geometry, index=gdf.index, crs=layout["crs"])
+        for column in result.columns:
+            gdf[column] = result[column].values
+        gdf = gdf[layout["columns"]]
+        self._count(feature_name, "hits")
+        print(f"Feature '{feature_name}' served from cache.")
+        return gdf
+
+    def put(self, key, feature_name, before, result_gdf):
+        """
+        Store everything the feature changed: the input rows it kept, the columns it added, rewrote or retyped,
+        the columns it dropped and, if it moved or reprojected them, the footprints with their CRS.
+        """
+        if key is None:
+            return
+
+        if not before["index"].is_unique:
+            print(f"Building index is not unique; '{feature_name}' result not cached.")
+            return
+        rows = before["index"].get_indexer(result_gdf.index)
+        if (rows < 0).any():
+            print(f"Feature '{feature_name}' changed the building index; result not cached.")
+            return
+
+        geometry_name = result_gdf.geometry.name
+        columns = [col for col in result_gdf.columns if col != geometry_name and (
+            col == feature_name or col not in before["hashes"]
+            or str(result_gdf[col].dtype) != before["dtypes"][col]
+            or not np.array_equal(self._column_hash(result_gdf[col]), before["hashes"][col][rows]))]
+        table = pd.DataFrame({col: result_gdf[col].to_numpy() for col in columns})
+        moved = not np.array_equal(self._geometry_hash(result_gdf), before["geometry"][rows])
+        if moved or result_gdf.crs != before["crs"]:
+            table[GEOMETRY_COLUMN] = shapely.to_wkb(np.asarray(result_gdf.geometry.values, dtype=object))
+        table[ROW_COLUMN] = rows
+
+        layout = {
+            "columns": list(result_gdf.columns),
+            "dropped": [col for col in before["hashes"] if col not in result_gdf.columns],
+            "crs": result_gdf.crs.to_string() if result_gdf.crs is not None else None,
+        }
+        try:
+            arrow_table = pa.Table.from_pandas(table, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            print(f"Feature '{feature_name}' result cannot be stored as Arrow ({e}); result not cached.")
+            return
+        arrow_table = arrow_table.replace_schema_metadata(
+            {**(arrow_table.schema.metadata or {}), b"feature_cache": json.dumps(layout).encode("utf-8")})
+
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_file(sink, arrow_table.schema) as writer:
+            writer.write_table(arrow_table)
+        self.cache.put(key, sink.getvalue().to_pybytes())
@@ -1,4 +1,6 @@
 from config.config import Config
+from processing.features_collection.base_feature import INCREMENTAL_ATTR
+from processing.features_collection.feature_cache import FeatureCache
 from processing.features_collection.features.area import Area
 from processing.features_collection.features.building_id import BuildingID
 from processing.features_collection.features.census_id import CensusId
@@ -19,6 +21,8 @@ from processing.features_collection.features.tot_area_per_cens_id import TotalAr
 from processing.features_collection.features.usage import Usage
 from processing.features_collection.features.w2w import W2W
 from processing.features_collection.features.year_of_construction import YearOfConstruction
+from processing.utility.building_schema import BuildingSchema
+from processing.utility.metrics import measure
 
 
 class FeatureFactory(Config):
@@ -46,6 +50,24 @@ class FeatureFactory(Config):
             "neighbours_ids": NeighboursIds,
             "tabula_id": TabulaID,
         }
+        self.features = self.config.get("features", {})
+        # Features aggregated over each census section, which depend on every building of the section
+        self.census_aggregates = self.config.get("incremental_update", {}).get(
+            "census_aggregates", ["tot_area_per_cens_id", "n_family"])
+        self.schema = BuildingSchema()
+        self.cache = FeatureCache()
+
+    def dependents(self, feature_names):
+        """Return the features that depend on any of the given features, directly or transitively."""
+        found = set()
+        pending = list(feature_names)
+        while pending:
+            current = pending.pop()
+            for name, feature_config in self.features.items():
+                if current in feature_config.get("required_features", []) and name not in found:
+                    found.add(name)
+                    pending.append(name)
+        return found
 
     def run_feature(self, feature_name, gdf):
         feature_class = self.feature_classes.get(feature_name)
@@ -54,16 +76,37 @@ class FeatureFactory(Config):
             return gdf
 
         try:
-            # Instantiate the feature class and call its `run` method
-            feature_instance = feature_class()
-            print(f"Running feature extraction for '{feature_name}'.")
+            with measure("feature", feature_name) as record:
+                # Instantiate the feature class and call its `run` method
+                feature_instance = feature_class()
+                print(f"Running feature extraction for '{feature_name}'.")
+
+                # The update marker must reach every feature, but not all pandas operations keep frame attributes
+                attrs = dict(gdf.attrs)
+                feature_instance.incremental_update = bool(attrs.get(INCREMENTAL_ATTR))
+
+                # The feature writes its own column with plain dtypes; it is compacted again afterwards
+                gdf = self.schema.restore(gdf, [feature_name])
+
+                # Reuse the result of an earlier run over identical inputs
+                cache_key = self.cache.key(feature_name, feature_class, gdf)
+                cached_gdf = self.cache.get(cache_key, feature_name, gdf)
+                if cached_gdf is not None:
+                    record["rows"] = len(cached_gdf)
+                    cached_gdf.attrs.update(attrs)
+                    return self.schema.compact(cached_gdf, feature_name)
+                input_state = self.cache.snapshot(gdf) if cache_key is not None else None
 
-            # Dynamically call the run method
-            if hasattr(feature_instance, 'run'):
-                return feature_instance.run(gdf, feature_name)
-            else:
-                # Fallback to BaseFeature's run
-                return super(feature_class, feature_instance).run(gdf, feature_name)
+                # Dynamically call the run method
+                if hasattr(feature_instance, 'run'):
+                    gdf = feature_instance.run(gdf, feature_name)
+                else:
+                    # Fallback to BaseFeature's run
+                    gdf = super(feature_class, feature_instance).run(gdf, feature_name)
+                self.cache.put(cache_key, feature_name, input_state, gdf)
+                record["rows"] = len(gdf)
+                gdf.attrs.update(attrs)
+                return self.schema.compact(gdf, feature_name)
         except Exception as e:
             print(f"Error while running feature '{feature_name}': {e}")
             raise
@@ -1,6 +1,7 @@
 import uuid
 
 from processing.features_collection.base_feature import BaseFeature
+from processing.utility.geometry_hash import GeometryHasher
 
 
 class BuildingID(BaseFeature):
@@ -19,8 +20,8 @@ class BuildingID(BaseFeature):
         initial_id_count = gdf[self.feature_name].notnull().sum()
         print(f"Number of building IDs before: {initial_id_count}")
 
-        # Handle invalid or missing Tabula IDs
-        invalid_rows = self.check_invalid_rows(gdf, self.feature_name)
+        # Only missing IDs are assigned; IDs supplied by the database or the user are kept as they are
+        invalid_rows = gdf[gdf[self.feature_name].isnull()]
         print(f"Invalid rows count: {len(invalid_rows)} for {self.feature_name}")
         if not invalid_rows.empty:
             gdf = self.calculate(gdf, invalid_rows.index)
@@ -33,8 +34,31 @@ class BuildingID(BaseFeature):
         return gdf
 
     def calculate(self, gdf, rows):
-        # Assign UUIDs only to rows where building_id is NaN
-        gdf.loc[gdf[self.feature_name].isnull(), self.feature_name] = [
-            str(uuid.uuid4()) for _ in range(gdf[self.feature_name].isnull().sum())]
+        # Assign IDs only to rows where building_id is NaN
+        missing = gdf.index[gdf[self.feature_name].isnull()]
+        if getattr(self, 'id_mode', 'random') == 'geometry':
+            new_ids = self._geometry_ids(gdf.loc[missing], set(gdf[self.feature_name].dropna().astype(str)))
+        else:
+            new_ids = [str(uuid.uuid4()) for _ in range(len(missing))]
+        gdf.loc[missing, self.feature_name] = new_ids
 
         return gdf
+
+    def _geometry_ids(self, gdf, taken):
+        """
+        Derive UUIDv5 IDs from the normalized footprint in the default CRS, so the same footprint
+        gets the same ID on every run. Identical footprints are told apart by their occurrence number.
+        """
+        namespace = uuid.UUID(getattr(self, 'id_namespace', str(uuid.NAMESPACE_OID)))
+        keys = GeometryHasher().keys(self.check_crs_with_default_crs(gdf[[gdf.geometry.name]].copy()).geometry.values)
+
+        ids = []
+        for key in keys:
+            name = key.hex() if key is not None else "empty"
+            building_id, occurrence = str(uuid.uuid5(namespace, name)), 0
+            while building_id in taken:
+                occurrence += 1
+                building_id = str(uuid.uuid5(namespace, f"{name}:{occurrence}"))
+            taken.add(building_id)
+            ids.append(building_id)
+        return ids
@@ -3,6 +3,7 @@ import logging
 import requests
 
 from config.config import Config
+from processing.utility.metrics import measure
 
 
 class DBHeightFetcher(Config):
@@ -41,10 +42,12 @@ class DBHeightFetcher(Config):
         payload = {"type": "FeatureCollection", "features": features}
 
         try:
-            response = requests.post(self.db_url, json=payload, headers=self.headers)
-            response.raise_for_status()
-            data = response.json()
-            results = data.get("results", [])
+            with measure("http", "height") as record:
+                response = requests.post(self.db_url, json=payload, headers=self.headers)
+                response.raise_for_status()
+                data = response.json()
+                results = data.get("results", [])
+                record["rows"] = len(results)
 
             if not results:
                 self.logger.warning(f"⚠️ No height data returned for {feature_name}.")
@@ -1,14 +1,16 @@
 import numpy as np
-import pandas as pd
 
 from processing.features_collection.base_feature import BaseFeature
 from processing.features_collection.features.feature_helpers.volume import Volume
+from processing.utility.census_table import CensusTable
 
 
 class NumberOfFamily(BaseFeature):
     """
     Processes and assigns the number of families to buildings.
     """
+    reads_census_table = True
+
     def __init__(self):
         super().__init__()
         self.volume_calculator = Volume()
@@ -23,11 +25,13 @@ class NumberOfFamily(BaseFeature):
             gdf[self.feature_name] = np.nan
             return gdf
 
-        # Aggregate census data
+        # Aggregate building volumes and look up the census families once per census section
         census_aggregated = gdf.groupby(self.required_features[0]).agg(
-            total_volume=(self.required_features[1], 'sum'),
-            total_families=(self.census_family_column, 'first')  # Assume consistency for each census ID
-        ).query("total_volume > 0")  # Filter out invalid census data
+            total_volume=(self.required_features[1], 'sum')
+        )
+        census_families = CensusTable().lookup(census_aggregated.index, [self.census_family_column])
+        census_aggregated["total_families"] = census_families[self.census_family_column].fillna(0).astype(int).values
+        census_aggregated = census_aggregated.query("total_volume > 0")  # Filter out invalid census data
 
         if census_aggregated.empty:
             print("Census data aggregation returned no valid entries. Skipping n_family calculation.")
@@ -61,8 +65,8 @@ class NumberOfFamily(BaseFeature):
         """
         missing_columns = []
 
-        if self.census_family_column not in gdf.columns:
-            print(f"Missing '{self.census_family_column}'. Unable to proceed.")
+        if self.census_family_column not in CensusTable().load().columns:
+            print(f"Missing '{self.census_family_column}' in the census table. Unable to proceed.")
             missing_columns.append(self.census_family_column)
 
         if self.required_features[1] not in gdf.columns:
@@ -80,10 +84,6 @@ class NumberOfFamily(BaseFeature):
             print(f"Missing required columns: {missing_columns}")
             return False
 
-        gdf[self.census_family_column] = pd.to_numeric(
-            gdf[self.census_family_column], errors='coerce'
-        ).fillna(0).astype(int)
-
         gdf[self.required_features[0]] = gdf[self.required_features[0]].fillna(-1).astype(int)
         gdf[self.required_features[1]] = gdf[self.required_features[1]].clip(lower=0)
         return True
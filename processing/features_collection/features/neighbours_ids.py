@@ -1,4 +1,5 @@
 import pandas as pd
+import shapely
 
 from processing.features_collection.base_feature import BaseFeature
 
@@ -12,49 +13,39 @@ class NeighboursIds(BaseFeature):
         """
         Calculates the neighbor IDs for buildings within a specified radius.
         """
-        if rows is not None:
-            gdf.loc[rows, self.feature_name] = self._add_neighbour_ids(gdf.loc[rows])
-        else:
-            gdf[self.feature_name] = self._add_neighbour_ids(gdf)
+        if rows is None:
+            rows = gdf.index
+        # Neighbours are searched in the whole frame, also when only some rows are (re)calculated
+        gdf.loc[rows, self.feature_name] = self._add_neighbour_ids(gdf, rows)
 
         gdf = self.validate_data(gdf, self.feature_name)
 
         print("NeighboursIds feature calculation completed.")
         return gdf
 
-    def _add_neighbour_ids(self, gdf):
+    def _add_neighbour_ids(self, gdf, rows):
         """
-        Adds neighbor IDs to the GeoDataFrame and ensures CRS consistency.
+        Return the neighbor IDs of the given rows, searching all buildings of the GeoDataFrame.
         """
-        # Ensure the GeoDataFrame has the projected CRS for distance calculations
-        gdf = self.check_crs_with_projected_crs(gdf)
-
-        # Initialize spatial index
-        spatial_index = gdf.sindex
-
-        # Dictionary to store neighbor ids for each building
-        neighbours_dict = {}
-
-        # Find neighbors for each building
-        for idx, building in gdf.iterrows():
-            # Buffer the building geometry for the search radius
-            buffer_geom = building.geometry.buffer(self.radius)
-
-            # Find potential neighbors using spatial index
-            possible_matches_index = list(spatial_index.intersection(buffer_geom.bounds))
-            possible_matches = gdf.iloc[possible_matches_index]
-
-            # Filter the neighbors based on actual distance and exclude self
-            neighbors = possible_matches[
-                (possible_matches[self.required_features[0]] != building[self.required_features[0]]) &
-                (possible_matches.geometry.distance(building.geometry) <= self.radius)
-            ]
-
-            # Format neighboring building IDs in the desired format "[4 1 2 3]"
-            neighbours_dict[idx] = f"[{' '.join(map(str, neighbors[self.required_features[0]].tolist()))}]"
-
-        # Convert neighbor IDs to a Series and assign it back to the feature column
-        gdf[self.feature_name] = pd.Series(neighbours_dict, index=gdf.index)
-
-        # Ensure the GeoDataFrame is in the default CRS after processing
-        return self.check_crs_with_default_crs(gdf)
+        # Use the projected CRS for distance calculations
+        geometries = self.check_crs_with_projected_crs(gdf[[gdf.geometry.name]].copy()).geometry
+        ids = gdf[self.required_features[0]].to_numpy(dtype=object)
+
+        # Find all buildings within the radius of each requested building using the spatial index
+        row_positions = gdf.index.get_indexer(rows)
+        tree = shapely.STRtree(geometries.values)
+        query_idx, neighbour_idx = tree.query(
+            geometries.values[row_positions], predicate="dwithin", distance=self.radius
+        )
+        pairs = pd.DataFrame({"row": query_idx, "neighbour": neighbour_idx}).sort_values(["row", "neighbour"])
+
+        # Exclude the building itself
+        pairs = pairs[ids[pairs["neighbour"].values] != ids[row_positions[pairs["row"].values]]]
+        grouped = pairs.groupby("row")["neighbour"].agg(list)
+
+        # Format neighboring building IDs in the desired format "[4 1 2 3]"
+        neighbours = [
+            f"[{' '.join(map(str, ids[grouped[position]])) if position in grouped.index else ''}]"
+            for position in range(len(row_positions))
+        ]
+        return pd.Series(neighbours, index=rows)
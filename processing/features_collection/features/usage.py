@@ -1,10 +1,12 @@
 from processing.features_collection.base_feature import BaseFeature
+from processing.utility.census_table import CensusTable
 
 
 class Usage(BaseFeature):
     """
     Processes and filters building usage data based on allowed usage types.
     """
+    reads_census_table = True
 
     def calculate(self, gdf, rows):
         """
@@ -36,34 +38,31 @@ class Usage(BaseFeature):
         """
         Calculate usage values using census data for specific rows.
         """
-        usage_mapping = {}
+        census_ids = gdf.loc[rows, self.required_features[0]]
 
-        # Group by census_id and calculate predominant usage for each group
-        for census_id, group in gdf.loc[rows].groupby(self.required_features[0]):
-            usage_mapping[census_id] = self._calculate_group_usage(group)
+        # Look up the census building counts once per census section
+        census_counts = CensusTable().lookup(census_ids.dropna().unique(), list(self.census_usage.keys()))
+        usage_mapping = self._calculate_census_usage(census_counts)
 
         # Assign calculated usage back to the GeoDataFrame
-        gdf.loc[rows, self.feature_name] = gdf.loc[rows, self.required_features[0]].map(
-            usage_mapping).fillna(self.default_usage)
+        gdf.loc[rows, self.feature_name] = census_ids.map(usage_mapping).fillna(self.default_usage)
 
         return gdf
 
-    def _calculate_group_usage(self, group):
+    def _calculate_census_usage(self, census_counts):
         """
-        Determine the predominant usage type for a group of buildings based on census data.
+        Determine the predominant usage type of each census section from its building counts.
         """
-        if not all(col in group.columns for col in self.census_usage.keys()):
-            return self.default_usage  # Default if required columns are missing
+        if not all(col in census_counts.columns for col in self.census_usage.keys()):
+            return {}  # Default usage if required columns are missing
 
-        # Count building types using census columns
-        building_counts = {col: group[col].astype(int).sum() for col in self.census_usage.keys()}
-        total_count = sum(building_counts.values())
+        # The usage of the largest building count; on a tie the first configured column wins
+        counts = census_counts[list(self.census_usage.keys())].fillna(0).astype(int)
+        usage = counts.idxmax(axis=1).map(self.census_usage)
 
-        if total_count == 0:
-            return self.default_usage  # Default if no data available
-
-        # Compare counts of residential (E3) and non-residential (E4)
-        return "residential" if building_counts.get("E3", 0) >= building_counts.get("E4", 0) else "non residential"
+        # Default if no data available
+        usage[counts.sum(axis=1) == 0] = self.default_usage
+        return usage.to_dict()
 
     def _filter_usage_values(self, gdf):
         """
@@ -1,23 +1,24 @@
 import pandas as pd
 
 from processing.features_collection.base_feature import BaseFeature
+from processing.utility.census_table import CensusTable
 
 
 class YearOfConstruction(BaseFeature):
     """
     Assigns year of construction to buildings based on census data.
     """
+    reads_census_table = True
 
     def calculate(self, gdf, rows=None):
-        self.median_years = self._calculate_median_years()
-        self._convert_to_numeric(gdf)
         """
-        Assign year_of_construction to buildings by grouping by census_id.
+        Assign year_of_construction to buildings from the census data of their census section.
         """
-        year_mapping = {
-            census_id: self._calculate_group_year(group)
-            for census_id, group in gdf.groupby(self.required_features[0])
-        }
+        self.median_years = self._calculate_median_years()
+
+        census_ids = gdf[self.required_features[0]].dropna().unique()
+        census_counts = CensusTable().lookup(census_ids, list(self.census_built_year.keys()))
+        year_mapping = self._calculate_census_years(census_counts)
 
         if rows is None:
             # Assign to all rows if no specific rows are specified
@@ -45,32 +46,16 @@ class YearOfConstruction(BaseFeature):
                 median_years[key] = None  # Assign None for invalid or unexpected formats
         return median_years
 
-    def _calculate_group_year(self, group):
+    def _calculate_census_years(self, census_counts):
         """
-        Calculate the weighted average year for a group of buildings.
+        Calculate the weighted average construction year of each census section.
         """
-        # Convert relevant columns to numeric to handle mixed types
-        building_counts = {
-            col: pd.to_numeric(group[col], errors='coerce').sum()
-            for col in self.census_built_year.keys() if col in group.columns
-        }
-        total_count = sum(building_counts.values())
-
-        if total_count == 0:
-            return 1900  # Default year for groups with no data
+        columns = [col for col in census_counts.columns if self.median_years.get(col) is not None]
+        counts = census_counts[columns].astype('float64').fillna(0)
+        total_count = counts.sum(axis=1)
 
-        # Weighted average year calculation
-        weighted_year = sum(
-            self.median_years[col] * count / total_count
-            for col, count in building_counts.items() if self.median_years.get(col) is not None
-        )
+        weights = pd.Series({col: self.median_years[col] for col in columns}, dtype='float64')
+        weighted_year = counts.dot(weights) / total_count.where(total_count > 0)
 
-        return int(round(weighted_year))
-
-    def _convert_to_numeric(self, gdf):
-        """
-        Convert census-related columns to numeric values, handling errors gracefully.
-        """
-        for col in self.census_built_year.keys():
-            if col in gdf.columns:
-                gdf[col] = pd.to_numeric(gdf[col], errors='coerce').fillna(0).astype(int)
+        # Default year for sections with no data
+        return weighted_year.round().fillna(1900).astype(int).to_dict()
@@ -1,6 +1,10 @@
 import requests
 
 from config.config import Config
+from processing.output_generator.geojson_stream import GeoJSONStreamWriter
+from processing.output_generator.output_encoding import OutputEncoding
+from processing.output_generator.paginated_upload import PaginatedUpload
+from processing.utility.metrics import measure
 
 
 class DBServerUploader(Config):
@@ -9,6 +13,11 @@ class DBServerUploader(Config):
         self.load_config()
         self.url = self.config["database_url"]
         self.headers = self.config["database_headers"]
+        self.upload_config = self.config.get("upload", {})
+        self.gzip = self.upload_config.get("gzip", False)
+        self.timeout = self.upload_config.get("timeout", 120)
+        self.paginated = self.upload_config.get("mode", "stream") == "paginated"
+        self.patch_url = self.config.get("delta_upload", {}).get("url")
 
     def validate_geojson(self, geojson_data):
         """Validate the GeoJSON data structure."""
@@ -27,12 +36,51 @@ class DBServerUploader(Config):
             return None
 
         try:
-            response = requests.post(self.url, headers=self.headers, json=geojson_data)
-            response.raise_for_status()  # Raise an error for bad responses
+            with measure("http", "upload") as record:
+                response = requests.post(self.url, headers=self.headers, json=geojson_data, timeout=self.timeout)
+                response.raise_for_status()  # Raise an error for bad responses
+                record["rows"] = len(geojson_data["features"])
             print("GeoJSON data uploaded successfully.")
             return response.json()  # Return server's response as a JSON object
         except requests.exceptions.HTTPError as http_err:
             print(f"HTTP error occurred: {http_err}")
         except requests.exceptions.RequestException as err:
             print(f"Error occurred: {err}")
-        return None
\ No newline at end of file
+        return None
+
+    def upload_stream(self, chunks, url=None):
+        """
+        Upload a GeoJSON document given as a stream of byte chunks, sent with chunked transfer encoding
+        and gzip-compressed if enabled in the config (upload.gzip).
+        """
+        headers = {**self.headers, "Content-Type": "application/json"}
+        if self.gzip:
+            chunks = GeoJSONStreamWriter.gzip_chunks(chunks)
+            headers["Content-Encoding"] = "gzip"
+
+        try:
+            with measure("http", "upload_stream"):
+                # An iterator is streamed as is; requests would form-encode a list of chunks
+                response = requests.post(url or self.url, headers=headers, data=iter(chunks), timeout=self.timeout)
+                response.raise_for_status()
+            print("GeoJSON data uploaded successfully.")
+            return response.json()
+        except requests.exceptions.HTTPError as http_err:
+            print(f"HTTP error occurred: {http_err}")
+        except requests.exceptions.RequestException as err:
+            print(f"Error occurred: {err}")
+        return None
+
+    def open_pages(self, project_info):
+        """Start a paginated upload; buildings are added frame by frame and the upload is finished with close()."""
+        return PaginatedUpload(
+            self.url, self.headers, project_info,
+            page_size=self.upload_config.get("page_size", 2000),
+            workers=self.upload_config.get("workers", 4),
+            retries=self.upload_config.get("retries", 5),
+            backoff_factor=self.upload_config.get("backoff_factor", 0.5),
+            timeout=self.timeout,
+            compress=self.gzip,
+            ledger_directory=self.upload_config.get("ledger_directory", "./data_source/cache/upload"),
+            encoder=OutputEncoding().collection_encoder()
+        )
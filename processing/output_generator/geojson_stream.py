@@ -0,0 +1,88 @@
+import zlib
+from decimal import Decimal
+
+import numpy as np
+import orjson
+import shapely
+
+
+class GeoJSONStreamWriter:
+    """
+    Encode GeoDataFrames as a GeoJSON FeatureCollection in byte chunks, straight from the column arrays:
+    geometries through shapely's GeoJSON writer and properties through orjson.
+    No intermediate GeoJSON dict of the whole collection is built.
+    """
+
+    def __init__(self, chunk_rows=5000, quantization=None, simplify_tolerance=0):
+        self.chunk_rows = chunk_rows
+        self.quantization = quantization
+        self.simplify_tolerance = simplify_tolerance
+
+    def geometries_json(self, geometries):
+        """Encode geometries as GeoJSON, simplified and snapped to the quantization grid if configured."""
+        if self.simplify_tolerance:
+            geometries = shapely.simplify(geometries, self.simplify_tolerance, preserve_topology=True)
+        if self.quantization:
+            geometries = shapely.set_precision(geometries, self.quantization)
+            # Snapped coordinates still carry binary noise (7.657678499999999); round it off for a short text form
+            decimals = max(0, -Decimal(str(self.quantization)).normalize().as_tuple().exponent)
+            geometries = shapely.transform(geometries, lambda coords: np.round(coords, decimals))
+        return shapely.to_geojson(geometries)
+
+    @staticmethod
+    def column_values(series):
+        """Return a column as a list of JSON-ready Python values (missing values as None)."""
+        values = series.astype(object).where(series.notna(), None) if series.dtype != object else series
+        return [value.item() if isinstance(value, np.generic) else value for value in values.tolist()]
+
+    def feature_chunks(self, gdf):
+        """Yield the encoded features of a GeoDataFrame, comma-separated, in chunks of chunk_rows features."""
+        geometry_name = gdf.geometry.name
+        columns = [col for col in gdf.columns if col != geometry_name]
+
+        for start in range(0, len(gdf), self.chunk_rows):
+            part = gdf.iloc[start:start + self.chunk_rows]
+            geometries = self.geometries_json(np.asarray(part.geometry.values, dtype=object))
+            values = [self.column_values(part[col]) for col in columns]
+
+            features = []
+            for row, geometry in enumerate(geometries):
+                properties = orjson.dumps({col: column[row] for col, column in zip(columns, values)},
+                                          option=orjson.OPT_SERIALIZE_NUMPY)
+                geometry_json = geometry.encode("utf-8") if geometry is not None else b"null"
+                features.append(b'{"type":"Feature","properties":' + properties +
+                                b',"geometry":' + geometry_json + b'}')
+            yield b",\n".join(features)
+
+    def collection_chunks(self, gdfs, extra=None):
+        """Yield a whole FeatureCollection over one or more GeoDataFrames, with extra top-level members."""
+        yield b'{"type":"FeatureCollection","features":[\n'
+        first = True
+        for gdf in gdfs:
+            for chunk in self.feature_chunks(gdf):
+                if not first:
+                    yield b",\n"
+                yield chunk
+                first = False
+        yield b"\n]"
+        for key, value in (extra or {}).items():
+            yield b"," + orjson.dumps(key) + b":" + orjson.dumps(value, default=str)
+        yield b"}\n"
+
+    @staticmethod
+    def tee_to_file(chunks, path):
+        """Write every chunk to the file while passing it on."""
+        with open(path, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+
+    @staticmethod
+    def gzip_chunks(chunks, level=6):
+        """Compress a chunk stream into a gzip stream."""
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
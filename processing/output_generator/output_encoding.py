@@ -0,0 +1,193 @@
+import numpy as np
+import orjson
+import pandas as pd
+import shapely
+
+from config.config import Config
+from processing.output_generator.geojson_stream import GeoJSONStreamWriter
+
+
+class TopoJSONEncoder:
+    """
+    Encode buildings as a TopoJSON topology. Coordinates are quantized to an integer grid, rings are cut
+    into arcs where their neighbours diverge, and every arc is stored once, so a wall shared by adjacent
+    buildings is written a single time. Simplification runs on the shared arcs, which keeps adjacent
+    buildings joined after simplifying.
+    """
+
+    def __init__(self, quantization=1e-7, simplify_tolerance=0, object_name="buildings", chunk_rows=5000):
+        self.quantization = quantization
+        self.simplify_tolerance = simplify_tolerance
+        self.object_name = object_name
+        self.chunk_rows = chunk_rows
+
+    def _quantized_polygons(self, geometry, origin):
+        """Return the polygons of a geometry as lists of open rings of integer grid points."""
+        polygons = []
+        for polygon in shapely.get_parts(geometry):
+            if polygon.geom_type != "Polygon" or polygon.is_empty:
+                continue
+            rings = []
+            for ring in [polygon.exterior, *polygon.interiors]:
+                points = np.round((shapely.get_coordinates(ring) - origin) / self.quantization).astype(np.int64)
+                # Points that fall on the same grid cell collapse into one
+                keep = np.r_[True, np.any(points[1:] != points[:-1], axis=1)]
+                points = [tuple(point) for point in points[keep][:-1].tolist()]
+                if len(points) >= 3:
+                    rings.append(points)
+                elif not rings:
+                    # The exterior collapsed on the grid; the polygon is dropped with its holes
+                    break
+            if rings:
+                polygons.append(rings)
+        return polygons
+
+    @staticmethod
+    def _junctions(polygons_per_geometry):
+        """Return the points where rings meet with different neighbours, i.e. where arcs must be cut."""
+        neighbours = {}
+        junctions = set()
+        for polygons in polygons_per_geometry:
+            for rings in polygons:
+                for ring in rings:
+                    count = len(ring)
+                    for i, point in enumerate(ring):
+                        previous, following = ring[i - 1], ring[(i + 1) % count]
+                        key = (previous, following) if previous < following else (following, previous)
+                        seen = neighbours.setdefault(point, key)
+                        if seen != key:
+                            junctions.add(point)
+        return junctions
+
+    @staticmethod
+    def _cut(ring, junctions):
+        """Cut an open ring into closed-chain arcs at its junctions."""
+        cuts = [i for i, point in enumerate(ring) if point in junctions]
+        if not cuts:
+            # A ring without junctions is one closed arc, started at its smallest point so twins match
+            start = ring.index(min(ring))
+            rotated = ring[start:] + ring[:start]
+            return [rotated + [rotated[0]]]
+
+        rotated = ring[cuts[0]:] + ring[:cuts[0]]
+        cuts = [i - cuts[0] for i in cuts]
+        arcs = [rotated[start:end + 1] for start, end in zip(cuts, cuts[1:])]
+        arcs.append(rotated[cuts[-1]:] + [rotated[0]])
+        return arcs
+
+    def _simplify(self, arc):
+        """Simplify an arc on the grid, keeping its end points (and closed arcs closed)."""
+        tolerance = self.simplify_tolerance / self.quantization
+        if len(arc) <= 2:
+            return arc
+        line = shapely.LineString(arc)
+        simplified = shapely.simplify(line, tolerance, preserve_topology=arc[0] == arc[-1])
+        points = [tuple(point) for point in np.round(shapely.get_coordinates(simplified)).astype(np.int64).tolist()]
+        return points if len(points) >= (4 if arc[0] == arc[-1] else 2) else arc
+
+    def encode(self, gdf):
+        """Return the transform, the delta-encoded arcs and the arc references of every geometry."""
+        geometries = np.asarray(gdf.geometry.values, dtype=object)
+        bounds = gdf.total_bounds if len(gdf) else np.zeros(4)
+        origin = bounds[:2]
+        polygons_per_geometry = [self._quantized_polygons(geometry, origin) if geometry is not None else []
+                                 for geometry in geometries]
+        junctions = self._junctions(polygons_per_geometry)
+
+        arc_index = {}
+        arcs = []
+        references = []
+        for polygons in polygons_per_geometry:
+            geometry_refs = []
+            for rings in polygons:
+                polygon_refs = []
+                for ring in rings:
+                    ring_refs = []
+                    for arc in self._cut(ring, junctions):
+                        key = tuple(arc)
+                        if key in arc_index:
+                            ring_refs.append(arc_index[key])
+                        elif key[::-1] in arc_index:
+                            ring_refs.append(~arc_index[key[::-1]])
+                        else:
+                            arc_index[key] = len(arcs)
+                            ring_refs.append(len(arcs))
+                            arcs.append(arc)
+                    polygon_refs.append(ring_refs)
+                geometry_refs.append(polygon_refs)
+            references.append(geometry_refs)
+
+        if self.simplify_tolerance:
+            arcs = [self._simplify(arc) for arc in arcs]
+
+        encoded_arcs = []
+        for arc in arcs:
+            points = np.asarray(arc, dtype=np.int64)
+            encoded_arcs.append(np.vstack([points[:1], np.diff(points, axis=0)]).tolist())
+
+        transform = {"scale": [self.quantization, self.quantization], "translate": origin.tolist()}
+        return transform, encoded_arcs, references, bounds.tolist()
+
+    def _geometry_chunks(self, gdf, references):
+        geometry_name = gdf.geometry.name
+        columns = [col for col in gdf.columns if col != geometry_name]
+        for start in range(0, len(gdf), self.chunk_rows):
+            part = gdf.iloc[start:start + self.chunk_rows]
+            values = [GeoJSONStreamWriter.column_values(part[col]) for col in columns]
+            objects = []
+            for row in range(len(part)):
+                refs = references[start + row]
+                if not refs:
+                    geometry = {"type": None}
+                elif len(refs) == 1:
+                    geometry = {"type": "Polygon", "arcs": refs[0]}
+                else:
+                    geometry = {"type": "MultiPolygon", "arcs": refs}
+                geometry["properties"] = {col: column[row] for col, column in zip(columns, values)}
+                objects.append(orjson.dumps(geometry, option=orjson.OPT_SERIALIZE_NUMPY))
+            yield b",\n".join(objects)
+
+    def collection_chunks(self, gdfs, extra=None):
+        """Yield the whole topology over one or more GeoDataFrames, with extra top-level members."""
+        gdfs = list(gdfs)
+        gdf = gdfs[0] if len(gdfs) == 1 else pd.concat(gdfs, ignore_index=True)
+        transform, arcs, references, bbox = self.encode(gdf)
+
+        yield (b'{"type":"Topology","bbox":' + orjson.dumps(bbox) + b',"transform":' + orjson.dumps(transform) +
+               b',"objects":{' + orjson.dumps(self.object_name) + b':{"type":"GeometryCollection","geometries":[\n')
+        first = True
+        for chunk in self._geometry_chunks(gdf, references):
+            if chunk:
+                yield chunk if first else b",\n" + chunk
+                first = False
+        yield b'\n]}},"arcs":['
+        for start in range(0, len(arcs), self.chunk_rows):
+            chunk = b",".join(orjson.dumps(arc) for arc in arcs[start:start + self.chunk_rows])
+            yield chunk if start == 0 else b"," + chunk
+        yield b"]"
+        for key, value in (extra or {}).items():
+            yield b"," + orjson.dumps(key) + b":" + orjson.dumps(value, default=str)
+        yield b"}\n"
+
+
+class OutputEncoding(Config):
+    """Chooses how output buildings are encoded for the output file and the upload."""
+
+    def __init__(self):
+        super().__init__()
+        encoding_config = self.config.get("output_encoding", {})
+        self.mode = encoding_config.get("mode", "geojson")
+        self.quantization = encoding_config.get("quantization", 1e-7)
+        self.simplify_tolerance = encoding_config.get("simplify_tolerance", 0)
+
+    def feature_writer(self):
+        """Return the GeoJSON writer, quantized unless the mode keeps full precision."""
+        if self.mode == "geojson":
+            return GeoJSONStreamWriter()
+        return GeoJSONStreamWriter(quantization=self.quantization, simplify_tolerance=self.simplify_tolerance)
+
+    def collection_encoder(self, streaming=False):
+        """Return the encoder of whole collections; a topology needs all buildings, so streaming falls back to GeoJSON."""
+        if self.mode == "topojson" and not streaming:
+            return TopoJSONEncoder(self.quantization, self.simplify_tolerance)
+        return self.feature_writer()
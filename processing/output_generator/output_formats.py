@@ -0,0 +1,196 @@
+import json
+import os
+import threading
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+
+from config.config import Config
+from processing.output_generator.geojson_stream import GeoJSONStreamWriter
+from processing.output_generator.output_encoding import OutputEncoding
+
+# Output formats: media type and file extension
+FORMATS = {
+    "geojson": ("application/geo+json", ".geojson"),
+    "flatgeobuf": ("application/flatgeobuf", ".fgb"),
+    "geoparquet": ("application/vnd.apache.parquet", ".parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", ".arrows"),
+}
+
+# Other names and media types clients use for the formats
+ALIASES = {
+    "json": "geojson",
+    "application/json": "geojson",
+    "fgb": "flatgeobuf",
+    "parquet": "geoparquet",
+    "application/x-parquet": "geoparquet",
+    "arrows": "arrow",
+    "ipc": "arrow",
+    "application/vnd.apache.arrow.file": "arrow",
+    "*/*": "geojson",
+    "application/*": "geojson",
+}
+
+
+class OutputFormats(Config):
+    """
+    Writes the output buildings as GeoJSON, FlatGeobuf, GeoParquet or Arrow IPC, and picks the format
+    a client asked for by format name or Accept header. GeoParquet and Arrow IPC are written from one
+    Arrow table built over the column arrays, with the geometry as WKB and the project info in the schema metadata.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.output_file = self.config.get('output_path')
+        self.extra_formats = self.config.get('output_formats', ['geoparquet'])
+        self.topology_output = OutputEncoding().mode == 'topojson'
+
+    @staticmethod
+    def negotiate(accept=None, requested=None):
+        """Return the format named by the request parameter or, failing that, the best match of the Accept header."""
+        if requested:
+            requested = requested.lower()
+            return requested if requested in FORMATS else ALIASES.get(requested)
+        if not accept:
+            return "geojson"
+
+        media_types = {media_type: name for name, (media_type, _) in FORMATS.items()}
+        candidates = []
+        for position, entry in enumerate(accept.split(",")):
+            media_type, *parameters = [part.strip() for part in entry.split(";")]
+            quality = 1.0
+            for parameter in parameters:
+                if parameter.startswith("q="):
+                    try:
+                        quality = float(parameter[2:])
+                    except ValueError:
+                        quality = 0.0
+            name = media_types.get(media_type.lower()) or ALIASES.get(media_type.lower())
+            if name and quality > 0:
+                candidates.append((-quality, position, name))
+        return min(candidates)[2] if candidates else None
+
+    def path_for(self, fmt):
+        """Return the output path of a format, next to the output file."""
+        if fmt == "geojson" and self.topology_output:
+            # The output file holds a TopoJSON topology; plain GeoJSON is written beside it
+            return os.path.splitext(self.output_file)[0] + "_features" + FORMATS[fmt][1]
+        return os.path.splitext(self.output_file)[0] + FORMATS[fmt][1]
+
+    @staticmethod
+    def _attribute_table(attributes):
+        """Convert the attribute columns to Arrow, writing mixed-type object columns as text."""
+        try:
+            return pa.Table.from_pandas(attributes, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            attributes = attributes.copy()
+            for col in attributes.columns[attributes.dtypes == object]:
+                attributes[col] = attributes[col].map(lambda value: None if value is None else str(value))
+            return pa.Table.from_pandas(attributes, preserve_index=False)
+
+    def to_arrow(self, gdf, project_info):
+        """Return the buildings as an Arrow table with a WKB geometry column and GeoParquet metadata."""
+        geometry_name = gdf.geometry.name
+        table = self._attribute_table(pd.DataFrame(gdf.drop(columns=geometry_name)))
+
+        crs = gdf.crs.to_json_dict() if gdf.crs is not None else None
+        geometry_field = pa.field(geometry_name, pa.binary(), metadata={
+            "ARROW:extension:name": "geoarrow.wkb",
+            "ARROW:extension:metadata": json.dumps({"crs": crs}),
+        })
+        wkb = pa.array(shapely.to_wkb(np.asarray(gdf.geometry.values, dtype=object)), type=pa.binary())
+        table = table.append_column(geometry_field, wkb)
+
+        geo = {
+            "version": "1.0.0",
+            "primary_column": geometry_name,
+            "columns": {geometry_name: {
+                "encoding": "WKB",
+                "geometry_types": sorted(gdf.geom_type.dropna().unique().tolist()),
+                "crs": crs,
+                "bbox": gdf.total_bounds.tolist() if len(gdf) else [],
+            }},
+        }
+        metadata = {**(table.schema.metadata or {}), b"geo": json.dumps(geo).encode("utf-8"),
+                    b"project_info": json.dumps(project_info, default=str).encode("utf-8")}
+        return table.replace_schema_metadata(metadata)
+
+    @staticmethod
+    def _temp_path(path):
+        """Return a temporary path beside the file, unique to this thread, to be moved over it when complete."""
+        root, extension = os.path.splitext(path)
+        return f"{root}.{os.getpid()}-{threading.get_ident()}.tmp{extension}"
+
+    @staticmethod
+    def _write_arrow_table(table, fmt, path):
+        if fmt == "geoparquet":
+            pq.write_table(table, path)
+        else:
+            with pa.OSFile(path, "wb") as sink, pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    def write(self, gdf, fmt, project_info, path=None):
+        """
+        Write the buildings in the given format and return the path. The file is written beside the path and
+        moved over it when complete, so concurrent requests never read a partly written file.
+        """
+        path = path or self.path_for(fmt)
+        temp_path = self._temp_path(path)
+        try:
+            if fmt in ("geoparquet", "arrow"):
+                self._write_arrow_table(self.to_arrow(gdf, project_info), fmt, temp_path)
+            elif fmt == "flatgeobuf":
+                gdf.to_file(temp_path, driver="FlatGeobuf")
+            else:
+                chunks = GeoJSONStreamWriter().collection_chunks([gdf], {"project_info": project_info})
+                for _ in GeoJSONStreamWriter.tee_to_file(chunks, temp_path):
+                    pass
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return path
+
+    def write_extra_formats(self, gdf, project_info):
+        """Write the output in the configured formats besides GeoJSON."""
+        for fmt in self.extra_formats:
+            if fmt in FORMATS and fmt != "geojson":
+                print(f"Output written as {fmt} to {self.write(gdf, fmt, project_info)}")
+
+    def result_file(self, fmt):
+        """
+        Return the path of the latest output in the given format, converting it from the GeoParquet copy
+        (or the GeoJSON output) if it is missing or older than the GeoJSON output file.
+        """
+        if not os.path.exists(self.output_file):
+            return None
+        if fmt == "geojson" and not self.topology_output:
+            return self.output_file
+
+        path = self.path_for(fmt)
+        if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(self.output_file):
+            return path
+
+        parquet_path = self.path_for("geoparquet")
+        if os.path.exists(parquet_path) and os.path.getmtime(parquet_path) >= os.path.getmtime(self.output_file):
+            if fmt == "arrow":
+                # Parquet and Arrow share the table layout, so the columns are passed on without conversion
+                temp_path = self._temp_path(path)
+                try:
+                    self._write_arrow_table(pq.read_table(parquet_path), fmt, temp_path)
+                    os.replace(temp_path, path)
+                finally:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                return path
+            gdf = gpd.read_parquet(parquet_path)
+            project_info = json.loads((pq.read_schema(parquet_path).metadata or {}).get(b"project_info", b"{}"))
+        else:
+            with open(self.output_file) as f:
+                project_info = json.load(f).get("project_info", {})
+            gdf = gpd.read_file(self.output_file)
+        return self.write(gdf, fmt, project_info, path)
@@ -1,10 +1,16 @@
-import json
 import os
 
 import geopandas as gpd
 from shapely.geometry import Polygon
 
 from config.config import Config
+from processing.output_generator.geojson_stream import GeoJSONStreamWriter
+from processing.output_generator.output_encoding import OutputEncoding
+from processing.output_generator.output_formats import OutputFormats
+from processing.output_generator.project_store import ProjectStore
+from processing.output_generator.upload_snapshot import UploadSnapshot
+from processing.utility.building_schema import BuildingSchema
+from processing.utility.metrics import measure
 
 
 class OutputFileGenerator(Config):
@@ -59,47 +65,149 @@ class OutputFileGenerator(Config):
             print("Filtered buildings data based on the user's polygon.")
         return gdf
 
-    def generate_output_file(self, gdf):
-        """Generate the final output file based on filters and user inputs."""
+    def _project_info(self):
+        project_info = self.project_info.copy()  # Avoid mutating the original
+        project_info.pop("scenarioList", None)  # Remove scenarioList
+        project_info.pop("translation", None)  # Remove translation
+        return project_info
+
+    @staticmethod
+    def _ensure_directory(path):
+        output_dir = os.path.dirname(path)
+        if output_dir and not os.path.exists(output_dir):
+            print(f"Directory {output_dir} does not exist. Creating it now.")
+            os.makedirs(output_dir, exist_ok=True)
+
+    def _output_frame(self, gdf):
+        """Return the buildings as written to the output file: configured features inside the user's polygon."""
+        filtered_gdf = self.filter_by_polygon(self.filter_columns(gdf))
+        # Drop 'id' column if it exists to prevent conflicts with building_id
+        if 'id' in filtered_gdf.columns:
+            filtered_gdf = filtered_gdf.drop(columns='id')
+        return filtered_gdf
+
+    def _open_pages(self, uploader):
+        """Return a paginated upload if the uploader is configured for one."""
+        if uploader is None or not uploader.paginated:
+            return None
+        return uploader.open_pages(self._project_info())
+
+    @staticmethod
+    def _upload_patch(snapshot, gdf, uploader):
+        """Upload the difference to the last uploaded snapshot; return the server's response, or None on failure."""
+        body, (added, changed, removed) = snapshot.patch(gdf)
+        if body is None:
+            print("No changes since the last upload; nothing sent to the database.")
+            return {}
+        print(f"Uploading changes since the last upload: {added} added, {changed} changed, {removed} removed.")
+        return uploader.upload_stream([body], uploader.patch_url)
+
+    def _write_output(self, chunks, uploader=None):
+        """
+        Write the encoded output to the output file and, if an uploader is given, send the same chunks
+        to the server in the same pass. The file is completed even if the upload stops early.
+        """
+        self._ensure_directory(self.output_file)
+        chunks = GeoJSONStreamWriter.tee_to_file(chunks, self.output_file)
+        response = uploader.upload_stream(chunks) if uploader is not None else None
+        for _ in chunks:
+            pass
+        print(f"Output file saved to {self.output_file}")
+        return response
+
+    def generate_output_stream(self, batches, building_file=None, uploader=None):
+        """
+        Write the output file (and optionally the full building file) batch by batch,
+        so only one batch of buildings is held in memory. Returns the output path and building count.
+        """
+        schema = BuildingSchema()
+        writer = GeoJSONStreamWriter()
+        encoder = OutputEncoding().collection_encoder(streaming=True)
+        counts = {"buildings": 0}
+        pages = self._open_pages(uploader)
+
+        def output_frames(buildings):
+            first = True
+            for gdf in batches:
+                gdf = schema.restore(self.validate_crs(gdf).copy())
+                if buildings is not None:
+                    for chunk in writer.feature_chunks(gdf):
+                        buildings.write(chunk if first else b",\n" + chunk)
+                        first = False
+                filtered_gdf = self._output_frame(gdf)
+                counts["buildings"] += len(filtered_gdf)
+                if pages is not None:
+                    pages.add(filtered_gdf)
+                yield filtered_gdf
+
+        buildings = None
+        if building_file:
+            self._ensure_directory(building_file)
+            buildings = open(building_file, 'wb')
+            buildings.write(b'{"type":"FeatureCollection","features":[\n')
+        with measure("output", "output_stream") as record:
+            try:
+                chunks = encoder.collection_chunks(output_frames(buildings), {"project_info": self._project_info()})
+                self._write_output(chunks, uploader if pages is None else None)
+            finally:
+                if buildings is not None:
+                    buildings.write(b'\n]}\n')
+                    buildings.close()
+            if pages is not None:
+                pages.close()
+            record["rows"] = counts["buildings"]
+
+        print(f"Number of buildings being sent to the database: {counts['buildings']}")
+        return self.output_file, counts["buildings"]
+
+    def generate_output_file(self, gdf, uploader=None):
+        """
+        Generate the final output file based on filters and user inputs, and upload it in the same pass
+        when an uploader is given. Returns the output path.
+        """
         try:
             # Ensure CRS is validated
             gdf = self.validate_crs(gdf)
 
-            # Filter columns based on config features
-            filtered_gdf = self.filter_columns(gdf)
+            # Write plain dtypes so the output does not depend on the in-memory schema
+            gdf = BuildingSchema().restore(gdf.copy())
 
-            # Filter by user's polygon
-            filtered_gdf = self.filter_by_polygon(filtered_gdf)
-
-            # Drop 'id' column if it exists to prevent conflicts with building_id
-            if 'id' in filtered_gdf.columns:
-                filtered_gdf = filtered_gdf.drop(columns='id')
+            # Filter columns based on config features and by the user's polygon
+            filtered_gdf = self._output_frame(gdf)
 
             # Count the number of buildings being sent to the database
             num_buildings = len(filtered_gdf)
             print(f"Number of buildings being sent to the database: {num_buildings}")
 
-            # Convert to GeoJSON structure without 'id' using drop_id=True
-            json_result = json.loads(filtered_gdf.to_json(drop_id=True))
-
-            # Add project info to the JSON structure
-            project_info = self.project_info.copy()  # Avoid mutating the original
-            project_info.pop("scenarioList", None)  # Remove scenarioList
-            project_info.pop("translation", None)  # Remove translation
-            json_result['project_info'] = project_info
-
-            # Ensure the output directory exists
-            output_dir = os.path.dirname(self.output_file)
-            if not os.path.exists(output_dir):
-                print(f"Directory {output_dir} does not exist. Creating it now.")
-                os.makedirs(output_dir, exist_ok=True)
-
-            # Save the JSON result to a file
-            with open(self.output_file, 'w') as f:
-                json.dump(json_result, f, indent=4)
-
-            print(f"Output file generated and saved to {self.output_file}")
-            return json_result
+            # Encode the buildings straight from the columns, followed by the project info
+            encoder = OutputEncoding().collection_encoder()
+            chunks = encoder.collection_chunks([filtered_gdf], {"project_info": self._project_info()})
+            with measure("output", "output_file") as record:
+                record["rows"] = num_buildings
+                snapshot = UploadSnapshot(self._project_info()) if uploader is not None else None
+                pages = self._open_pages(uploader)
+                if snapshot is not None and snapshot.usable(filtered_gdf):
+                    # Only the changes since the last successful upload are sent
+                    self._write_output(chunks)
+                    response = self._upload_patch(snapshot, filtered_gdf, uploader)
+                elif pages is not None:
+                    pages.add(filtered_gdf)
+                    self._write_output(chunks)
+                    response = pages.close()
+                else:
+                    response = self._write_output(chunks, uploader)
+
+                if snapshot is not None and response is not None:
+                    snapshot.save(filtered_gdf)
+
+            # Columnar copies for clients that read binary formats, and the project store's copy of this scenario
+            with measure("output", "extra_formats") as record:
+                record["rows"] = num_buildings
+                OutputFormats().write_extra_formats(filtered_gdf, self._project_info())
+            with measure("output", "project_store") as record:
+                record["rows"] = num_buildings
+                ProjectStore().save(filtered_gdf, self._project_info())
+            return self.output_file
 
         except Exception as e:
             print(f"Error generating output file: {e}")
@@ -0,0 +1,161 @@
+import contextvars
+import gzip
+import hashlib
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import geopandas as gpd
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from processing.output_generator.geojson_stream import GeoJSONStreamWriter
+from processing.utility.metrics import measure
+from processing.utility.path_names import safe_name
+
+
+class PaginatedUpload:
+    """
+    Upload of the output buildings as a sequence of FeatureCollection pages.
+    Pages are sent concurrently over one pooled session with retries; every page carries the project info
+    and its position, and the last page is only sent once all others were acknowledged.
+    Acknowledged pages are recorded in a ledger keyed on their content, so an interrupted upload
+    skips them when it is run again.
+    """
+
+    def __init__(self, url, headers, project_info, page_size=2000, workers=4, retries=5, backoff_factor=0.5,
+                 timeout=120, compress=False, ledger_directory="./data_source/cache/upload", encoder=None):
+        self.url = url
+        self.headers = {**headers, "Content-Type": "application/json"}
+        if compress:
+            self.headers["Content-Encoding"] = "gzip"
+        self.compress = compress
+        self.project_info = project_info
+        self.page_size = page_size
+        self.workers = workers
+        self.timeout = timeout
+        self.upload_id = f"{project_info.get('project_id')}_{project_info.get('scenario_id')}"
+        self.encoder = encoder or GeoJSONStreamWriter()
+
+        retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=["POST"], raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+        project_id, scenario_id = safe_name(project_info.get('project_id')), safe_name(project_info.get('scenario_id'))
+        self.ledger_path = os.path.join(ledger_directory, f"{project_id}_{scenario_id}.json")
+        self.acknowledged = self._load_ledger()
+        self.pending = []
+        self.pending_rows = 0
+        self.template = None
+        self.in_flight = {}
+        self.page_index = 0
+        self.sent = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def _load_ledger(self):
+        if not os.path.exists(self.ledger_path):
+            return set()
+        with open(self.ledger_path) as f:
+            acknowledged = set(json.load(f).get("acknowledged", []))
+        print(f"Resuming upload {self.upload_id}: {len(acknowledged)} pages already acknowledged.")
+        return acknowledged
+
+    def _save_ledger(self):
+        os.makedirs(os.path.dirname(self.ledger_path) or ".", exist_ok=True)
+        temp_path = f"{self.ledger_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"upload_id": self.upload_id, "acknowledged": sorted(self.acknowledged)}, f)
+        os.replace(temp_path, self.ledger_path)
+
+    def _encode(self, gdf, last):
+        page = {"upload_id": self.upload_id, "index": self.page_index, "last": last}
+        body = b"".join(self.encoder.collection_chunks([gdf], {"project_info": self.project_info, "page": page}))
+        self.page_index += 1
+        return hashlib.sha1(body).hexdigest(), body
+
+    def _post(self, body):
+        """Send one page; return the server's response, or None if it was not acknowledged."""
+        data = gzip.compress(body) if self.compress else body
+        try:
+            with measure("http", "upload_page"):
+                response = self.session.post(self.url, headers=self.headers, data=data, timeout=self.timeout)
+                response.raise_for_status()
+            return response.json() if response.content else {}
+        except (requests.exceptions.RequestException, ValueError) as err:
+            print(f"Page upload failed: {err}")
+            return None
+
+    def _collect(self, futures):
+        """Record the outcome of finished pages in the ledger."""
+        for future in futures:
+            page_hash = self.in_flight.pop(future)
+            if future.result() is None:
+                self.failed += 1
+                continue
+            self.acknowledged.add(page_hash)
+            self.sent += 1
+        self._save_ledger()
+
+    def _submit(self, gdf):
+        page_hash, body = self._encode(gdf, last=False)
+        if page_hash in self.acknowledged:
+            self.skipped += 1
+            return
+        if len(self.in_flight) >= 2 * self.workers:
+            done, _ = wait(self.in_flight, return_when=FIRST_COMPLETED)
+            self._collect(done)
+        self.in_flight[self.executor.submit(contextvars.copy_context().run, self._post, body)] = page_hash
+
+    def _take_rows(self, count):
+        """Remove and return the first rows of the pending frames."""
+        frame = pd.concat(self.pending) if len(self.pending) > 1 else self.pending[0]
+        taken, rest = frame.iloc[:count], frame.iloc[count:]
+        self.pending = [rest] if len(rest) else []
+        self.pending_rows = len(rest)
+        return taken
+
+    def add(self, gdf):
+        """Queue buildings for upload, sending every full page that is known not to be the last."""
+        self.template = gdf.iloc[:0]
+        if len(gdf) == 0:
+            return
+        self.pending.append(gdf)
+        self.pending_rows += len(gdf)
+        while self.pending_rows > self.page_size:
+            self._submit(self._take_rows(self.page_size))
+
+    def close(self):
+        """Wait for the pages in flight and send the last page; return its response, or None if incomplete."""
+        try:
+            self._collect(list(self.in_flight))
+            if self.failed:
+                print(f"Upload {self.upload_id} incomplete: {self.failed} pages failed. "
+                      f"Run it again to resume from {self.ledger_path}.")
+                return None
+
+            if self.pending:
+                last_gdf = self._take_rows(self.pending_rows)
+            else:
+                last_gdf = self.template if self.template is not None else gpd.GeoDataFrame(geometry=[])
+            _, body = self._encode(last_gdf, last=True)
+            result = self._post(body)
+            if result is None:
+                print(f"Upload {self.upload_id} incomplete: the last page failed. "
+                      f"Run it again to resume from {self.ledger_path}.")
+                return None
+
+            if os.path.exists(self.ledger_path):
+                os.remove(self.ledger_path)
+            print(f"GeoJSON data uploaded successfully in {self.sent + 1} pages "
+                  f"({self.skipped} already acknowledged).")
+            return result
+        finally:
+            self.executor.shutdown(wait=True)
+            self.session.close()
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import geopandas as gpd
+import numpy as np
+import pyarrow.parquet as pq
+import shapely
+
+from config.config import Config
+from processing.output_generator.output_formats import OutputFormats
+from processing.preparation.building_gdf_creator.census_store import BBOX_COLUMNS
+from processing.utility.path_names import safe_name
+
+_CATALOGUE_LOCK = threading.Lock()
+
+CATALOGUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenarios (
+    project_id TEXT NOT NULL,
+    scenario_id TEXT NOT NULL,
+    project_name TEXT,
+    scenario_name TEXT,
+    path TEXT NOT NULL,
+    n_buildings INTEGER NOT NULL,
+    minx REAL, miny REAL, maxx REAL, maxy REAL,
+    etag TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (project_id, scenario_id)
+)
+"""
+
+
+class ProjectStore(Config):
+    """
+    Local store of every project scenario's output buildings. Each scenario is a Hilbert-sorted GeoParquet
+    file with bbox columns, written in row groups so bbox filters skip the groups outside the box, and
+    a SQLite catalogue lists the stored scenarios with their extent and ETag.
+    """
+
+    def __init__(self):
+        super().__init__()
+        store_config = self.config.get('project_store', {})
+        self.enabled = store_config.get('enabled', True)
+        self.directory = store_config.get('directory', './data_source/project_store')
+        self.catalogue_path = store_config.get('catalogue', os.path.join(self.directory, 'catalogue.sqlite'))
+        self.row_group_size = store_config.get('row_group_size', 2000)
+        self.page_size = store_config.get('page_size', 1000)
+        self.max_page_size = store_config.get('max_page_size', 10000)
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.catalogue_path) or '.', exist_ok=True)
+        connection = sqlite3.connect(self.catalogue_path)
+        connection.row_factory = sqlite3.Row
+        connection.execute(CATALOGUE_SCHEMA)
+        return connection
+
+    @staticmethod
+    def _file_hash(path):
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def save(self, gdf, project_info):
+        """Store the output buildings of a project scenario, replacing an earlier run of the same scenario."""
+        if not self.enabled:
+            return None
+        project_id, scenario_id = str(project_info.get('project_id')), str(project_info.get('scenario_id'))
+        # The ids come from the request, so they are never used as path components as they are
+        path = os.path.join(self.directory, safe_name(project_id), f"{safe_name(scenario_id)}.parquet")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Sort along a Hilbert curve so that bbox filters touch few row groups
+        if len(gdf):
+            gdf = gdf.iloc[np.argsort(gdf.geometry.hilbert_distance().values, kind='stable')]
+        gdf = gdf.reset_index(drop=True)
+        gdf[BBOX_COLUMNS] = gdf.geometry.bounds.values
+        table = OutputFormats().to_arrow(gdf, project_info)
+
+        temp_path = f"{path}.tmp"
+        pq.write_table(table, temp_path, row_group_size=self.row_group_size)
+        os.replace(temp_path, path)
+
+        bounds = gdf.total_bounds.tolist() if len(gdf) else [None] * 4
+        now = time.time()
+        with _CATALOGUE_LOCK, closing(self._connect()) as connection, connection:
+            connection.execute(
+                "INSERT INTO scenarios VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (project_id, scenario_id) DO UPDATE SET project_name = excluded.project_name, "
+                "scenario_name = excluded.scenario_name, path = excluded.path, n_buildings = excluded.n_buildings, "
+                "minx = excluded.minx, miny = excluded.miny, maxx = excluded.maxx, maxy = excluded.maxy, "
+                "etag = excluded.etag, updated_at = excluded.updated_at",
+                (project_id, scenario_id, project_info.get('projectName'), project_info.get('scenario_name'),
+                 path, len(gdf), *bounds, self._file_hash(path), now, now)
+            )
+        print(f"Stored {len(gdf)} buildings of project {project_id}, scenario {scenario_id} in the project store.")
+        return path
+
+    def entry(self, project_id, scenario_id=None):
+        """Return the catalogue entry of a scenario, or of the project's latest scenario, or None."""
+        if not os.path.exists(self.catalogue_path):
+            return None
+        with closing(self._connect()) as connection:
+            if scenario_id is None:
+                row = connection.execute(
+                    "SELECT * FROM scenarios WHERE project_id = ? ORDER BY updated_at DESC LIMIT 1",
+                    (project_id,)).fetchone()
+            else:
+                row = connection.execute(
+                    "SELECT * FROM scenarios WHERE project_id = ? AND scenario_id = ?",
+                    (project_id, scenario_id)).fetchone()
+        return dict(row) if row is not None else None
+
+    def scenarios(self, project_id):
+        """Return the catalogue entries of all stored scenarios of a project."""
+        if not os.path.exists(self.catalogue_path):
+            return []
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT * FROM scenarios WHERE project_id = ? ORDER BY created_at", (project_id,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def query(self, entry, bbox=None, columns=None, offset=0, limit=None):
+        """
+        Return one page of a stored scenario's buildings, optionally only those intersecting the bbox
+        (minx, miny, maxx, maxy in the stored CRS) and only the given columns, with the total match count.
+        """
+        limit = min(limit or self.page_size, self.max_page_size)
+        schema_names = pq.read_schema(entry['path']).names
+        geometry_name = json.loads(pq.read_schema(entry['path']).metadata[b'geo'])['primary_column']
+        attributes = [col for col in schema_names if col not in BBOX_COLUMNS and col != geometry_name]
+        if columns:
+            attributes = [col for col in attributes if col in columns]
+
+        filters = None
+        if bbox is not None:
+            min_x, min_y, max_x, max_y = bbox
+            filters = [('minx', '<=', max_x), ('maxx', '>=', min_x), ('miny', '<=', max_y), ('maxy', '>=', min_y)]
+        gdf = gpd.read_parquet(entry['path'], columns=attributes + [geometry_name], filters=filters)
+        if bbox is not None:
+            gdf = gdf[gdf.intersects(shapely.box(*bbox))]
+
+        total = len(gdf)
+        return gdf.iloc[offset:offset + limit].reset_index(drop=True), total
@@ -0,0 +1,129 @@
+import hashlib
+import os
+
+import numpy as np
+import orjson
+import pandas as pd
+import pyarrow.parquet as pq
+import shapely
+
+from config.config import Config
+from processing.output_generator.output_encoding import OutputEncoding
+from processing.utility.path_names import safe_name
+
+ROW_HASH = "__row_hash__"
+
+
+class UploadSnapshot(Config):
+    """
+    Hashes of the last successfully uploaded output of a project scenario: one row per building_id
+    with a hash per attribute and geometry. Against it the next output is uploaded as a patch holding
+    only the added and removed buildings and the changed attributes.
+    """
+
+    def __init__(self, project_info):
+        super().__init__()
+        delta_config = self.config.get("delta_upload", {})
+        # Patches go to their own endpoint; the FeatureCollection endpoint does not accept them
+        self.url = delta_config.get("url")
+        self.enabled = bool(delta_config.get("enabled", False) and self.url)
+        directory = delta_config.get("snapshot_directory", "./data_source/cache/upload_snapshots")
+        project_id, scenario_id = safe_name(project_info.get('project_id')), safe_name(project_info.get('scenario_id'))
+        self.path = os.path.join(directory, f"{project_id}_{scenario_id}.parquet")
+        self.project_info = project_info
+        self.writer = OutputEncoding().feature_writer()
+
+    @staticmethod
+    def _column_hash(values):
+        return pd.util.hash_array(np.asarray(values, dtype=object).astype(str).astype(object))
+
+    def hashes(self, gdf):
+        """Return the per-attribute and row hashes of an output frame, indexed by building_id."""
+        geometry_name = gdf.geometry.name
+        hashes = pd.DataFrame({col: self._column_hash(gdf[col].to_numpy()) for col in gdf.columns
+                               if col not in (geometry_name, "building_id")})
+        hashes[geometry_name] = pd.util.hash_array(shapely.to_wkb(np.asarray(gdf.geometry.values, dtype=object)))
+        hashes[ROW_HASH] = pd.util.hash_pandas_object(hashes, index=False).to_numpy()
+        hashes.index = pd.Index(gdf["building_id"].astype(str).to_numpy(), name="building_id")
+        return hashes
+
+    @staticmethod
+    def version(hashes):
+        """Return a digest identifying the uploaded state the hashes describe."""
+        digest = hashlib.sha1()
+        digest.update(np.asarray(hashes.index, dtype=str).tobytes())
+        digest.update(hashes[ROW_HASH].to_numpy().tobytes())
+        return digest.hexdigest()
+
+    def usable(self, gdf):
+        """
+        Whether the frame can be diffed by building_id against a stored snapshot with the same columns.
+        Never without a configured delta_upload url.
+        """
+        if not (self.enabled and os.path.exists(self.path) and "building_id" in gdf.columns
+                and gdf["building_id"].notna().all() and gdf["building_id"].is_unique):
+            return False
+        snapshot_columns = set(pq.read_schema(self.path).names) - {"building_id"}
+        return snapshot_columns == (set(gdf.columns) - {"building_id"}) | {ROW_HASH}
+
+    def load(self):
+        return pd.read_parquet(self.path)
+
+    def save(self, gdf):
+        """Store the hashes of an output that was uploaded successfully."""
+        if not self.enabled or "building_id" not in gdf.columns or not gdf["building_id"].is_unique:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        hashes = self.hashes(gdf)
+        hashes.columns = hashes.columns.astype(str)
+        hashes.to_parquet(self.path)
+
+    def _changed_features(self, gdf, current, previous):
+        """Encode the changed attributes (and geometry) of buildings present in both states."""
+        geometry_name = gdf.geometry.name
+        common = current.index.intersection(previous.index)
+        changed_ids = common[current.loc[common, ROW_HASH].to_numpy() != previous.loc[common, ROW_HASH].to_numpy()]
+        if len(changed_ids) == 0:
+            return []
+
+        columns = [col for col in current.columns if col != ROW_HASH]
+        differs = np.column_stack([
+            current.loc[changed_ids, col].to_numpy() != previous.loc[changed_ids, col].to_numpy() for col in columns
+        ])
+
+        rows = gdf.set_index(gdf["building_id"].astype(str)).loc[changed_ids]
+        values = {col: self.writer.column_values(rows[col]) for col in columns if col != geometry_name}
+        geometries = self.writer.geometries_json(np.asarray(rows.geometry.values, dtype=object))
+
+        features = []
+        for row in range(len(changed_ids)):
+            properties = {col: values[col][row] for col, changed in zip(columns, differs[row])
+                          if changed and col != geometry_name}
+            properties["building_id"] = rows["building_id"].iloc[row]
+            feature = b'{"type":"Feature","properties":' + orjson.dumps(properties)
+            if differs[row][columns.index(geometry_name)]:
+                feature += b',"geometry":' + geometries[row].encode("utf-8")
+            features.append(feature + b"}")
+        return features
+
+    def patch(self, gdf):
+        """
+        Return the patch from the stored snapshot to the frame as encoded bytes and the number of
+        added, changed and removed buildings, or None if nothing changed.
+        """
+        previous = self.load()
+        current = self.hashes(gdf)
+
+        added_ids = current.index.difference(previous.index)
+        removed_ids = previous.index.difference(current.index)
+        changed = self._changed_features(gdf, current, previous)
+        if not len(added_ids) and not len(removed_ids) and not changed:
+            return None, (0, 0, 0)
+
+        added = gdf[gdf["building_id"].astype(str).isin(added_ids)]
+        header = orjson.dumps({"type": "BuildingPatch", "project_info": self.project_info,
+                               "base_version": self.version(previous), "version": self.version(current)})
+        body = (header[:-1] + b',"added":[' + b",\n".join(self.writer.feature_chunks(added)) +
+                b'],"changed":[' + b",\n".join(changed) +
+                b'],"removed":' + orjson.dumps(list(removed_ids)) + b"}")
+        return body, (len(added_ids), len(changed), len(removed_ids))
@@ -0,0 +1,124 @@
+import threading
+from collections import OrderedDict
+
+import geopandas as gpd
+import mapbox_vector_tile
+import numpy as np
+import shapely
+
+from config.config import Config
+from processing.output_generator.geojson_stream import GeoJSONStreamWriter
+from processing.output_generator.project_store import ProjectStore
+from processing.utility.disk_cache import DiskCache
+
+# Half the width of the web mercator world, in metres
+WEB_MERCATOR_EXTENT = 20037508.342789244
+
+# Building tables loaded in this process, keyed by (path, ETag), most recently used last:
+# (ETag, GeoDataFrame in EPSG:3857, STRtree)
+_LOADED_TABLES = OrderedDict()
+_TABLE_LOCK = threading.Lock()
+
+# Recently served tiles, keyed like the disk cache
+_MEMORY_TILES = OrderedDict()
+_MEMORY_LOCK = threading.Lock()
+
+
+class VectorTileBuilder(Config):
+    """
+    Mapbox Vector Tiles of a project scenario's output buildings, cut from its building table in the project
+    store through a spatial index. Tiles are kept in a small in-memory LRU and an on-disk cache keyed on the
+    table's ETag, so a new run of the scenario invalidates them.
+    """
+
+    def __init__(self):
+        super().__init__()
+        tiles_config = self.config.get('vector_tiles', {})
+        self.layer_name = tiles_config.get('layer_name', 'buildings')
+        self.attributes = tiles_config.get('attributes', ['building_id'])
+        self.min_zoom = tiles_config.get('min_zoom', 12)
+        self.max_zoom = tiles_config.get('max_zoom', 20)
+        self.extent = tiles_config.get('extent', 4096)
+        self.buffer = tiles_config.get('buffer', 64)
+        self.memory_tiles = tiles_config.get('memory_tiles', 512)
+        self.memory_tables = tiles_config.get('memory_tables', 8)
+        self.cache = DiskCache(tiles_config.get('cache_directory', './data_source/cache/tiles'),
+                               tiles_config.get('cache_max_bytes', 200 * 1024 * 1024), suffix='.mvt')
+        self.store = ProjectStore()
+
+    def _table(self, project_id, scenario_id=None):
+        """Return the stored building table of the scenario in web mercator with its STRtree, or None."""
+        entry = self.store.entry(project_id, scenario_id)
+        if entry is None:
+            return None
+
+        key = (entry['path'], entry['etag'])
+        with _TABLE_LOCK:
+            cached = _LOADED_TABLES.get(key)
+            if cached is None:
+                table = gpd.read_parquet(entry['path']).to_crs(epsg=3857)
+                cached = (entry['etag'], table, shapely.STRtree(table.geometry.values))
+                _LOADED_TABLES[key] = cached
+            _LOADED_TABLES.move_to_end(key)
+            while len(_LOADED_TABLES) > self.memory_tables:
+                _LOADED_TABLES.popitem(last=False)
+        return cached
+
+    @staticmethod
+    def tile_bounds(z, x, y):
+        """Return the web mercator bounds of a tile."""
+        size = 2 * WEB_MERCATOR_EXTENT / 2 ** z
+        min_x = -WEB_MERCATOR_EXTENT + x * size
+        max_y = WEB_MERCATOR_EXTENT - y * size
+        return min_x, max_y - size, min_x + size, max_y
+
+    def valid_tile(self, z, x, y):
+        return 0 <= z <= self.max_zoom and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+    def _encode(self, table, tree, z, x, y, attributes):
+        bounds = self.tile_bounds(z, x, y)
+        features = []
+        if z >= self.min_zoom:
+            margin = (bounds[2] - bounds[0]) * self.buffer / self.extent
+            buffered = (bounds[0] - margin, bounds[1] - margin, bounds[2] + margin, bounds[3] + margin)
+            indices = np.sort(tree.query(shapely.box(*buffered), predicate='intersects'))
+            rows = table.iloc[indices]
+            geometries = shapely.clip_by_rect(np.asarray(rows.geometry.values, dtype=object), *buffered)
+            values = {col: GeoJSONStreamWriter.column_values(rows[col]) for col in attributes}
+
+            for row, geometry in enumerate(geometries):
+                if geometry is None or geometry.is_empty:
+                    continue
+                # Vector tiles have no null values; missing attributes are left out
+                properties = {col: column[row] for col, column in values.items() if column[row] is not None}
+                features.append({'geometry': geometry, 'properties': properties})
+
+        return mapbox_vector_tile.encode(
+            [{'name': self.layer_name, 'features': features}],
+            default_options={'quantize_bounds': bounds, 'extents': self.extent}
+        )
+
+    def tile(self, project_id, z, x, y, attributes=None, scenario_id=None):
+        """Return the encoded tile of a scenario (by default the latest one), or None if nothing is stored."""
+        loaded = self._table(project_id, scenario_id)
+        if loaded is None:
+            return None
+        etag, table, tree = loaded
+
+        attributes = [col for col in (attributes or self.attributes) if col in table.columns]
+        key = f"{etag}/{z}/{x}/{y}/{','.join(attributes)}"
+        with _MEMORY_LOCK:
+            if key in _MEMORY_TILES:
+                _MEMORY_TILES.move_to_end(key)
+                return _MEMORY_TILES[key]
+
+        data = self.cache.get(key)
+        if data is None:
+            data = self._encode(table, tree, z, x, y, attributes)
+            self.cache.put(key, data)
+
+        with _MEMORY_LOCK:
+            _MEMORY_TILES[key] = data
+            while len(_MEMORY_TILES) > self.memory_tiles:
+                _MEMORY_TILES.popitem(last=False)
+        return data
@@ -0,0 +1,72 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import shapely
+
+from config.config import Config
+
+# Combined boundaries per census-section set, most recently used last
+_BOUNDARY_CACHE = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+
+class BoundaryBuilder(Config):
+    """
+    Combine census sections into one project boundary.
+    Census sections form a polygonal coverage, so shared edges are dissolved with a coverage
+    union; a generic union is only used if the sections turn out not to be a clean coverage.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.census_id_column = self.config.get('features', {}).get('census_id', {}).get('census_id_column', 'SEZ2011')
+        self.cache_size = self.config.get('boundary_cache_size', 64)
+
+    def _cache_key(self, census_gdf):
+        """Identify a census-section set by its section ids, or by its geometries if ids are missing."""
+        if self.census_id_column in census_gdf.columns:
+            members = np.sort(census_gdf[self.census_id_column].astype(str).unique())
+        else:
+            members = np.sort(shapely.to_wkb(np.asarray(census_gdf.geometry, dtype=object), hex=True))
+        digest = hashlib.sha1("|".join(members).encode("utf-8"))
+        digest.update(str(census_gdf.crs).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _coverage_union(self, geometries):
+        """Dissolve shared edges; fall back to a full union if the input is not a valid coverage."""
+        try:
+            boundary = shapely.coverage_union_all(geometries)
+            # Overlapping inputs are not a coverage: their union area would not match the summed area
+            total_area = shapely.area(geometries).sum()
+            if boundary.is_valid and np.isclose(boundary.area, total_area, rtol=1e-6):
+                return boundary
+            print("Census sections are not a clean coverage; using a full union.")
+        except shapely.errors.GEOSException as e:
+            print(f"Coverage union failed ({e}); using a full union.")
+        return shapely.union_all(geometries)
+
+    def build(self, census_gdf):
+        """Return the combined boundary geometry of the census sections, cached per section set."""
+        if census_gdf.empty:
+            raise ValueError("Selected census GeoDataFrame is empty.")
+
+        key = self._cache_key(census_gdf)
+        with _CACHE_LOCK:
+            if key in _BOUNDARY_CACHE:
+                _BOUNDARY_CACHE.move_to_end(key)
+                print("Combined boundary served from cache.")
+                return _BOUNDARY_CACHE[key]
+
+        geometries = np.asarray(census_gdf.geometry, dtype=object)
+        geometries = geometries[shapely.is_valid(geometries)]
+        if len(geometries) == 0:
+            raise ValueError("No valid census geometries to combine.")
+        boundary = self._coverage_union(geometries)
+
+        with _CACHE_LOCK:
+            _BOUNDARY_CACHE[key] = boundary
+            while len(_BOUNDARY_CACHE) > self.cache_size:
+                _BOUNDARY_CACHE.popitem(last=False)
+        return boundary
@@ -1,11 +1,13 @@
 import logging
 
 import geopandas as gpd
+import numpy as np
 import pandas as pd
+import shapely
 from shapely.geometry import Polygon, MultiPolygon
-from shapely.ops import unary_union
 
 from config.config import Config
+from processing.preparation.building_gdf_creator.boundary_builder import BoundaryBuilder
 from processing.preparation.building_gdf_creator.db_b_id_fetcher import BuildingDatabaseFetcher
 from processing.preparation.building_gdf_creator.osm_building_extractor import OSMBuildingExtractor
 from processing.preparation.building_gdf_creator.user_building_extractor import UserBuildingExtractor
@@ -28,6 +30,7 @@ class BuildingManager(Config):
         self.user_extractor = UserBuildingExtractor()
         self.osm_extractor = OSMBuildingExtractor()
         self.db_id_fetcher = BuildingDatabaseFetcher()
+        self.boundary_builder = BoundaryBuilder()
 
         # Configuration and defaults
         building_source_config = self.config.get("building_source", {})
@@ -38,6 +41,9 @@ class BuildingManager(Config):
         })
         self.output_file_path = self.config.get("building_path", "output_buildings.geojson")
         self.source_column = self.config.get("source_config", {}).get("column_name", "building_source")
+        self.projected_crs = f"EPSG:{self.config.get('PROJECTED_CRS', 32632)}"
+        # Share of an OSM footprint that user buildings must cover before it is dropped (0 = any touch)
+        self.overlap_threshold = self.config.get("osm_overlap_threshold", 0.0)
 
         logging.basicConfig(level=logging.INFO)
 
@@ -52,7 +58,11 @@ class BuildingManager(Config):
         if valid_boundaries.empty:
             raise ValueError("🚨 ERROR: No valid boundary geometries found!")
 
-        combined_boundary = unary_union(valid_boundaries)
+        if len(valid_boundaries) == 1:
+            # GetSelectedBoundaries already hands over the combined census boundary
+            combined_boundary = valid_boundaries.iloc[0]
+        else:
+            combined_boundary = self.boundary_builder.build(boundaries[boundaries.geometry.is_valid])
 
         # If result is MultiPolygon, choose the largest Polygon
         if isinstance(combined_boundary, MultiPolygon):
@@ -68,17 +78,36 @@ class BuildingManager(Config):
         if user_gdf.empty:
             logging.info("🔹 No user-provided buildings found. Keeping all OSM buildings.")
             return osm_gdf
+        if osm_gdf.empty:
+            return osm_gdf
+
+        if user_gdf.crs != osm_gdf.crs:
+            user_gdf = user_gdf.to_crs(osm_gdf.crs)
+
+        # Bulk index query (query geometries are prepared): one (user, osm) pair per intersection
+        user_idx, osm_idx = osm_gdf.sindex.query(user_gdf.geometry, predicate="intersects")
 
-        initial_osm_count = len(osm_gdf)
-        user_union = unary_union(user_gdf.geometry)
-        filtered_osm_gdf = osm_gdf[~osm_gdf.geometry.intersects(user_union)]
-        removed_count = initial_osm_count - len(filtered_osm_gdf)
+        if self.overlap_threshold > 0 and len(osm_idx) > 0:
+            # Drop an OSM building only if user buildings cover more than the threshold of its area
+            user_projected = np.asarray(user_gdf.geometry.to_crs(self.projected_crs), dtype=object)
+            osm_projected = np.asarray(osm_gdf.geometry.to_crs(self.projected_crs), dtype=object)
+            overlap = shapely.area(shapely.intersection(osm_projected[osm_idx], user_projected[user_idx]))
+            overlap_per_osm = np.bincount(osm_idx, weights=overlap, minlength=len(osm_gdf))
+            osm_area = shapely.area(osm_projected)
+            ratio = np.divide(overlap_per_osm, osm_area, out=np.zeros_like(overlap_per_osm), where=osm_area > 0)
+            overlapping = ratio > self.overlap_threshold
+        else:
+            overlapping = np.zeros(len(osm_gdf), dtype=bool)
+            overlapping[osm_idx] = True
+
+        filtered_osm_gdf = osm_gdf[~overlapping]
+        removed_count = int(overlapping.sum())
 
         logging.info(f"✅ Removed {removed_count} OSM buildings that overlapped with User buildings.")
         return filtered_osm_gdf
 
     def _fetch_database_ids(self, combined_gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
-        """Query the database for building IDs, handle duplicate footprints, and merge results."""
+        """Query the database for building IDs and apply source prioritization to the matched result."""
         if combined_gdf.empty or 'geometry' not in combined_gdf.columns:
             raise ValueError("🚨 ERROR: The combined GeoDataFrame is empty or missing a geometry column.")
 
@@ -89,35 +118,9 @@ class BuildingManager(Config):
             combined_gdf[self.source_column] = None
 
         combined_gdf = combined_gdf[combined_gdf.geometry.notnull()]
-        db_results = self.db_id_fetcher.run(combined_gdf)
-
-        if db_results is None or db_results.empty:
-            logging.info("🔹 No matching buildings found in the database.")
-            return combined_gdf
-
-        logging.info(f"✅ Fetched {len(db_results)} building IDs from the database.")
-
-        # Convert geometries to WKB format for accurate duplicate detection
-        db_results["geometry_wkb"] = db_results.geometry.apply(lambda geom: geom.wkb)
-
-        # Step 1: Handle Duplicate Footprints in `db_results`
-        duplicate_wkb = db_results["geometry_wkb"].duplicated(keep=False)  # Mark duplicates
-        if duplicate_wkb.any():
-            duplicate_count = duplicate_wkb.sum()
-            logging.warning(f"⚠️ Found {duplicate_count} duplicate building footprints in the database response.")
-
-            # Keep the first occurrence per footprint
-            db_results = db_results[~duplicate_wkb | db_results.duplicated(subset=["geometry_wkb"], keep="first")]
-
-        # Convert `combined_gdf` geometries to WKB for merging
-        combined_gdf["geometry_wkb"] = combined_gdf.geometry.apply(lambda geom: geom.wkb)
 
-        # Step 2: Merge database results with the combined dataset
-        merged_gdf = combined_gdf.merge(
-            db_results[["geometry_wkb", "building_id"]],
-            how="left",
-            on="geometry_wkb"
-        ).drop(columns=["geometry_wkb"])
+        # The fetcher matches footprints against the database once and attaches `building_id`
+        merged_gdf = self.db_id_fetcher.run(combined_gdf)
 
         # Ensure `building_id` exists in merged_gdf
         if "building_id" not in merged_gdf.columns:
@@ -3,6 +3,7 @@ import os
 import geopandas as gpd
 
 from config.config import Config
+from processing.preparation.building_gdf_creator.census_store import CensusStore
 
 
 class CensusSelector(Config):
@@ -12,11 +13,11 @@ class CensusSelector(Config):
         self.census_path = self.config['census_path']
         self.polygon_file = self.config['polygon_from_building']
         self.output_path = self.config['db_census_sections']
+        self.census_columns = self.config.get('census_columns', [])
+        self.census_store = CensusStore()
 
     def load_initial_data(self, polygon_gdf):
-        # Load Census GeoDataFrame
-        self.census_gdf = gpd.read_file(self.census_path)
-        # Load and set Polygon GeoDataFrame
+        # Load and set Polygon GeoDataFrame (census sections come from the in-memory census store)
         polygon_from_building = polygon_gdf
         polygon = polygon_from_building.geometry[0]
         self.polygon_gdf = gpd.GeoDataFrame(index=[0], crs=polygon_from_building.crs, geometry=[polygon])
@@ -24,16 +25,11 @@ class CensusSelector(Config):
 
     def select_census_sections(self, polygon_gdf):
         self.load_initial_data(polygon_gdf)
-        if self.census_gdf.empty or self.polygon_gdf.empty:
-            raise ValueError("Census data or polygon has not been loaded.")
+        if self.polygon_gdf.empty:
+            raise ValueError("Polygon has not been loaded.")
 
-        # Ensure both geodataframes have the same CRS
-        if self.census_gdf.crs != self.polygon_gdf.crs:
-            self.census_gdf = self.census_gdf.to_crs(self.polygon_gdf.crs)
-            print(f"Reprojected census data to match polygon CRS: {self.polygon_gdf.crs}")
-
-        # Select intersecting census sections
-        self.selected_census_gdf = self.census_gdf[self.census_gdf.intersects(self.polygon_gdf.geometry[0])]
+        # Select intersecting census sections through the store's spatial index
+        self.selected_census_gdf = self.census_store.select(self.polygon_gdf.geometry[0], crs=self.polygon_gdf.crs)
 
         if self.selected_census_gdf.empty:
             print("Warning: No census sections intersect the given polygon.")
@@ -46,8 +42,8 @@ class CensusSelector(Config):
             raise ValueError("No census sections selected to save.")
 
         # Keep only the specified columns and geometry
-        columns_to_keep = ['geometry', 'SEZ2011', 'E3', 'E4', 'E8', 'E9', 'E10', 'E11', 'E12', 'E13', 'E14', 'E15',
-                           'E16', 'PF1', 'P1']
+        columns_to_keep = ['geometry'] + [col for col in self.census_columns
+                                           if col in self.selected_census_gdf.columns]
         self.selected_census_gdf = self.selected_census_gdf[columns_to_keep]
 
         # Ensure the output directory exists
@@ -0,0 +1,102 @@
+import os
+import threading
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from config.config import Config
+
+# Census stores loaded in this process, keyed by store path: (mtime, GeoDataFrame, STRtree)
+_LOADED_STORES = {}
+_STORE_LOCK = threading.Lock()
+
+BBOX_COLUMNS = ["minx", "miny", "maxx", "maxy"]
+
+
+class CensusStore(Config):
+    """
+    Preprocessed census sections stored as a Hilbert-sorted GeoParquet file with bbox columns.
+    The store is built from the census GeoJSON once, loaded once per process and queried
+    through an STRtree instead of scanning every section.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.load_config()
+        self.census_path = self.config['census_path']
+        self.store_path = self.config.get('census_store_path',
+                                          os.path.splitext(self.census_path)[0] + '.parquet')
+        self.census_columns = self.config.get('census_columns', [])
+        self.default_crs = f"EPSG:{self.config.get('DEFAULT_CRS', 4326)}"
+
+    def _is_stale(self):
+        """Check whether the store is missing or older than the census source file."""
+        if not os.path.exists(self.store_path):
+            return True
+        return os.path.exists(self.census_path) and \
+            os.path.getmtime(self.store_path) < os.path.getmtime(self.census_path)
+
+    def build(self):
+        """Convert the census GeoJSON into a Hilbert-sorted GeoParquet with bbox columns."""
+        if not os.path.exists(self.census_path):
+            raise FileNotFoundError(f"Census file not found: {self.census_path}")
+
+        census_gdf = gpd.read_file(self.census_path)
+        if census_gdf.crs is None:
+            census_gdf.set_crs(self.default_crs, inplace=True)
+        elif census_gdf.crs.to_string() != self.default_crs:
+            census_gdf = census_gdf.to_crs(self.default_crs)
+
+        columns = [col for col in self.census_columns if col in census_gdf.columns] or \
+            [col for col in census_gdf.columns if col != 'geometry']
+        census_gdf = census_gdf[columns + ['geometry']]
+
+        # Sort along a Hilbert curve so that nearby sections are stored next to each other
+        order = np.argsort(census_gdf.geometry.hilbert_distance().values, kind="stable")
+        census_gdf = census_gdf.iloc[order].reset_index(drop=True)
+        census_gdf[BBOX_COLUMNS] = census_gdf.geometry.bounds.values
+
+        store_dir = os.path.dirname(self.store_path)
+        if store_dir and not os.path.exists(store_dir):
+            print(f"Directory {store_dir} does not exist. Creating it now.")
+            os.makedirs(store_dir, exist_ok=True)
+
+        census_gdf.to_parquet(self.store_path, index=False)
+        print(f"Census store with {len(census_gdf)} sections saved to {self.store_path}.")
+
+    def load(self):
+        """Return the in-memory census sections and their STRtree, building the store if needed."""
+        with _STORE_LOCK:
+            if self._is_stale():
+                self.build()
+
+            mtime = os.path.getmtime(self.store_path)
+            cached = _LOADED_STORES.get(self.store_path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1], cached[2]
+
+            census_gdf = gpd.read_parquet(self.store_path)
+            tree = shapely.STRtree(census_gdf.geometry.values)
+            _LOADED_STORES[self.store_path] = (mtime, census_gdf, tree)
+            print(f"Census store loaded with {len(census_gdf)} sections.")
+            return census_gdf, tree
+
+    def select(self, polygon, crs=None):
+        """Return the census sections intersecting the polygon, in the polygon's CRS."""
+        census_gdf, tree = self.load()
+
+        polygon_series = gpd.GeoSeries([polygon], crs=crs or census_gdf.crs)
+        if polygon_series.crs != census_gdf.crs:
+            polygon = polygon_series.to_crs(census_gdf.crs).iloc[0]
+
+        indices = np.sort(tree.query(polygon, predicate="intersects"))
+        selected = census_gdf.iloc[indices].drop(columns=BBOX_COLUMNS)
+
+        if selected.crs != polygon_series.crs:
+            selected = selected.to_crs(polygon_series.crs)
+        return selected
+
+
+if __name__ == '__main__':
+    CensusStore().build()
@@ -0,0 +1,70 @@
+import json
+import math
+
+import numpy as np
+import shapely
+from shapely.geometry import shape
+
+from config.config import Config
+from processing.utility.disk_cache import DiskCache
+
+
+class CensusTileCache(Config):
+    """
+    Cache of census service responses keyed by fixed grid tiles (in the default CRS).
+    Each tile stores the census sections intersecting it together with their attributes,
+    so repeated or overlapping polygons only query the service for uncovered tiles.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.load_config()
+        cache_config = self.config.get("census_cache", {})
+        self.enabled = cache_config.get("enabled", True)
+        self.tile_size = cache_config.get("tile_size", 0.01)
+        self.census_columns = self.config.get("census_columns", [])
+        self.cache = DiskCache(
+            cache_config.get("directory", "./data_source/cache/census_tiles"),
+            cache_config.get("max_bytes", 100 * 1024 * 1024),
+            suffix=".json"
+        )
+
+    def tiles_for(self, polygon):
+        """Return the (column, row) grid tiles intersecting the polygon and their boxes."""
+        minx, miny, maxx, maxy = polygon.bounds
+        columns = np.arange(math.floor(minx / self.tile_size), math.floor(maxx / self.tile_size) + 1)
+        rows = np.arange(math.floor(miny / self.tile_size), math.floor(maxy / self.tile_size) + 1)
+        grid_x, grid_y = (axis.ravel() for axis in np.meshgrid(columns, rows))
+
+        boxes = shapely.box(grid_x * self.tile_size, grid_y * self.tile_size,
+                            (grid_x + 1) * self.tile_size, (grid_y + 1) * self.tile_size)
+        hits = shapely.intersects(boxes, polygon)
+        return list(zip(zip(grid_x[hits].tolist(), grid_y[hits].tolist()), boxes[hits]))
+
+    def _key(self, tile):
+        return f"{self.tile_size}/{tile[0]}/{tile[1]}"
+
+    def get(self, tile):
+        """Return the cached census features of a tile, or None when the tile is not covered yet."""
+        data = self.cache.get(self._key(tile))
+        if data is None:
+            return None
+        return json.loads(data)["features"]
+
+    def store(self, tiles, features):
+        """Split service features over the requested tiles and persist one entry per tile."""
+        features = [self._compact_feature(feature) for feature in features if feature.get("geometry")]
+        geometries = np.array([shape(feature["geometry"]) for feature in features], dtype=object)
+        tree = shapely.STRtree(geometries)
+
+        for tile, tile_box in tiles:
+            indices = np.sort(tree.query(tile_box, predicate="intersects"))
+            payload = {"features": [features[i] for i in indices]}
+            self.cache.put(self._key(tile), json.dumps(payload).encode("utf-8"))
+
+    def _compact_feature(self, feature):
+        """Keep only the configured census attributes of a feature."""
+        properties = feature.get("properties") or {}
+        if self.census_columns:
+            properties = {key: properties.get(key) for key in self.census_columns if key in properties}
+        return {"type": "Feature", "geometry": feature["geometry"], "properties": properties}
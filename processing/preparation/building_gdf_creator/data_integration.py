@@ -1,6 +1,9 @@
 import os
 
 import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
 
 from config.config import Config
 
@@ -9,6 +12,11 @@ class DataIntegration(Config):
     def __init__(self):
         super().__init__()
         self.buildings_geojson_path = self.config['building_path']
+        self.projected_crs = f"EPSG:{self.config.get('PROJECTED_CRS', 32632)}"
+        self.census_id_column = self.config.get('features', {}).get('census_id', {}).get('census_id_column', 'SEZ2011')
+        join_config = self.config.get('census_join', {})
+        self.join_mode = join_config.get('mode', 'representative_point')
+        self.carry_attributes = join_config.get('carry_attributes', True)
 
     def check_and_align_crs(self, gdf1, gdf2):
         if gdf1.crs != gdf2.crs:
@@ -26,14 +34,73 @@ class DataIntegration(Config):
         integrated_gdf.to_file(self.buildings_geojson_path, driver='GeoJSON')
         print(f"Integrated data saved to {self.buildings_geojson_path}.")
 
-    def run(self, buildings_gdf, selected_census_gdf):
+    def _largest_overlap(self, buildings, boundaries, building_idx, section_idx):
+        """For (building, section) candidate pairs, keep the section with the largest overlap per building."""
+        building_geoms = np.asarray(buildings.geometry.iloc[building_idx].to_crs(self.projected_crs), dtype=object)
+        section_geoms = np.asarray(boundaries.geometry.iloc[section_idx].to_crs(self.projected_crs), dtype=object)
+        pairs = pd.DataFrame({
+            "building": building_idx,
+            "section": section_idx,
+            "overlap": shapely.area(shapely.intersection(building_geoms, section_geoms)),
+        })
+        best = pairs.sort_values("overlap", ascending=False, kind="stable").drop_duplicates(subset="building")
+        return pd.Series(best["section"].values, index=best["building"].values)
+
+    def representative_point_join(self, buildings, boundaries):
+        """
+        Assign each building to one census section through its representative point.
+        Only buildings whose point is ambiguous or that straddle a section edge are resolved
+        by largest overlap area.
+        """
+        points = buildings.geometry.representative_point()
+        point_idx, section_idx = boundaries.sindex.query(points, predicate="intersects")
+        if len(point_idx) == 0:
+            return pd.Series(dtype="int64")
+
+        hits = pd.DataFrame({"building": point_idx, "section": section_idx})
+        assigned = hits.drop_duplicates(subset="building").set_index("building")["section"]
+
+        # Candidate sections by bounding box only (cheap); one candidate means the building cannot straddle
+        bbox_building_idx, bbox_section_idx = boundaries.sindex.query(buildings.geometry.iloc[assigned.index])
+        bbox_building_idx = assigned.index.values[bbox_building_idx]
+        candidate_counts = pd.Series(bbox_building_idx).value_counts()
+
+        ties = hits["building"].value_counts()
+        ambiguous = set(ties[ties > 1].index)
+        multiple = candidate_counts[candidate_counts > 1].index.values
+        if len(multiple) > 0:
+            section_geoms = np.asarray(boundaries.geometry, dtype=object)[assigned.loc[multiple].values]
+            building_geoms = np.asarray(buildings.geometry, dtype=object)[multiple]
+            ambiguous.update(multiple[~shapely.within(building_geoms, section_geoms)])
+
+        if ambiguous:
+            mask = np.isin(bbox_building_idx, list(ambiguous))
+            resolved = self._largest_overlap(buildings, boundaries, bbox_building_idx[mask], bbox_section_idx[mask])
+            assigned.update(resolved)
+            print(f"Resolved {len(resolved)} buildings straddling census sections by largest overlap.")
+
+        return assigned.sort_index()
+
+    def run(self, buildings_gdf, selected_census_gdf, save=True):
         boundaries = selected_census_gdf
         buildings = buildings_gdf
 
         buildings = self.check_and_align_crs(boundaries, buildings)
 
-        # Perform spatial join
-        integrated_gdf = gpd.sjoin(buildings, boundaries, how='inner', predicate='within')
+        if self.join_mode == 'within':
+            # Perform spatial join
+            integrated_gdf = gpd.sjoin(buildings, boundaries, how='inner', predicate='within')
+        else:
+            assigned = self.representative_point_join(buildings, boundaries)
+            census_columns = [col for col in boundaries.columns if col != boundaries.geometry.name]
+            if not self.carry_attributes:
+                census_columns = [self.census_id_column]
+            integrated_gdf = buildings.iloc[assigned.index.values].copy()
+            census_values = boundaries[census_columns].iloc[assigned.values]
+            for column in census_columns:
+                integrated_gdf[column] = census_values[column].values
+            print(f"Assigned {len(integrated_gdf)} of {len(buildings)} buildings to census sections.")
 
-        self.save_integrated(integrated_gdf)
+        if save:
+            self.save_integrated(integrated_gdf)
         return integrated_gdf
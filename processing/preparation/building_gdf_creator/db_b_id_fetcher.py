@@ -5,6 +5,8 @@ import requests
 from shapely.geometry import shape, mapping
 
 from config.config import Config
+from processing.preparation.building_gdf_creator.footprint_matcher import FootprintMatcher
+from processing.utility.metrics import measure
 
 
 class BuildingDatabaseFetcher(Config):
@@ -16,6 +18,7 @@ class BuildingDatabaseFetcher(Config):
         self.db_url = self.config.get("db_building_id_url")
         self.headers = self.config.get("database_headers", {})
         self.default_crs = f"EPSG:{self.config.get('DEFAULT_CRS', 4326)}"
+        self.matcher = FootprintMatcher()
 
         # Load building source configurations
         building_source_config = self.config.get("building_source", {})
@@ -51,9 +54,11 @@ class BuildingDatabaseFetcher(Config):
 
         logging.debug("Sending request to database...")
         try:
-            response = requests.post(self.db_url, json=payload, headers=self.headers, timeout=10)
-            response.raise_for_status()
-            results = response.json().get("results", [])
+            with measure("http", "building_id") as record:
+                response = requests.post(self.db_url, json=payload, headers=self.headers, timeout=10)
+                response.raise_for_status()
+                results = response.json().get("results", [])
+                record["rows"] = len(results)
 
             if not results:
                 logging.info("No matching buildings found in the database.")
@@ -76,25 +81,19 @@ class BuildingDatabaseFetcher(Config):
             if db_results.empty:
                 return buildings_gdf  # No valid results, return original data
 
-            # Merge using Well-Known Binary (WKB) for accurate geometry comparison
-            db_results["geometry_wkb"] = db_results.geometry.apply(lambda geom: geom.wkb)
-            buildings_gdf["geometry_wkb"] = buildings_gdf.geometry.apply(lambda geom: geom.wkb)
+            # Match footprints once: normalized-geometry keys first, then IoU/Hausdorff tolerance
+            matched_ids = self.matcher.match(buildings_gdf, db_results, key_column="building_id")
 
-            merged_gdf = buildings_gdf.merge(
-                db_results[["geometry_wkb", "building_id"]],
-                how="left",
-                on="geometry_wkb"
-            ).drop(columns=["geometry_wkb"])
-
-            # Ensure `building_id` always exists in merged_gdf
-            if "building_id" not in merged_gdf.columns:
-                merged_gdf["building_id"] = None
+            merged_gdf = buildings_gdf.copy()
+            if "building_id" in merged_gdf.columns:
+                merged_gdf["building_id"] = matched_ids.combine_first(merged_gdf["building_id"])
+            else:
+                merged_gdf["building_id"] = matched_ids
 
             # Assign "Database" source where building_id is found
-            merged_gdf.loc[merged_gdf["building_id"].notna(), "building_source"] = self.source_config.get("db",
-                                                                                                          "Database")
+            merged_gdf.loc[matched_ids.notna(), "building_source"] = self.source_config.get("db", "Database")
 
-            logging.info(f"Merged {db_results.shape[0]} buildings with database IDs and updated sources.")
+            logging.info(f"Merged {matched_ids.notna().sum()} buildings with database IDs and updated sources.")
 
             return merged_gdf  # ✅ Returns a valid GeoDataFrame following GeoJSON rules
 
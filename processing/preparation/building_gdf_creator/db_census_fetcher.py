@@ -3,9 +3,12 @@ import os
 
 import geopandas as gpd
 import requests
-from shapely.geometry import mapping
+import shapely
+from shapely.geometry import mapping, shape
 
 from config.config import Config
+from processing.preparation.building_gdf_creator.census_tile_cache import CensusTileCache
+from processing.utility.metrics import measure
 
 
 class DbCensusFetcher(Config):
@@ -16,6 +19,9 @@ class DbCensusFetcher(Config):
         self.user_polygon_file = self.config.get('polygon_from_building')
         self.census_data = self.config["db_census_sections"]
         self.default_crs = f"EPSG:{self.config.get('DEFAULT_CRS', 4326)}"
+        self.timeout = self.config.get('db_census_timeout', 30)
+        self.census_id_column = self.config.get('features', {}).get('census_id', {}).get('census_id_column', 'SEZ2011')
+        self.tile_cache = CensusTileCache()
 
     def prepare_payload(self, polygon_gdf):
         """Prepare the payload with the user's polygon."""
@@ -50,23 +56,67 @@ class DbCensusFetcher(Config):
         except Exception as e:
             raise RuntimeError(f"Error preparing payload: {e}")
 
-    def fetch_census_data(self, polygon_gdf):
-        """Send a POST request to the database server and fetch census information."""
-        payload = self.prepare_payload(polygon_gdf)
-
-        try:
+    def _request_census_features(self, payload):
+        """Post a polygon payload to the census service and return the features of the response."""
+        with measure("http", "census") as record:
             response = requests.post(
                 self.db_server_url,
                 data=json.dumps(payload),
-                headers=self.headers
+                headers=self.headers,
+                timeout=self.timeout
             )
+            response.raise_for_status()
+            result = response.json()
+            features = result.get("features", []) if isinstance(result, dict) else result
+            record["rows"] = len(features)
+        return features
+
+    def _fetch_through_tile_cache(self, payload):
+        """Collect census features from cached tiles and query the service only for uncovered tiles."""
+        user_polygon = shape(payload["geometry"])
+        tiles = self.tile_cache.tiles_for(user_polygon)
+
+        features = []
+        missing_tiles = []
+        for tile, tile_box in tiles:
+            cached = self.tile_cache.get(tile)
+            if cached is None:
+                missing_tiles.append((tile, tile_box))
+            else:
+                features.extend(cached)
+        print(f"Census tile cache: {len(tiles) - len(missing_tiles)} tiles cached, {len(missing_tiles)} to fetch.")
+
+        if missing_tiles:
+            # Query each connected block of uncovered tiles as one polygon
+            uncovered = shapely.union_all([tile_box for _, tile_box in missing_tiles])
+            fetched = []
+            for part in shapely.get_parts(uncovered):
+                fetched.extend(self._request_census_features({"type": "Feature", "geometry": mapping(part)}))
+            self.tile_cache.store(missing_tiles, fetched)
+            features.extend(fetched)
+
+        census_gdf = gpd.GeoDataFrame.from_features(features, crs=self.default_crs)
+        if census_gdf.empty:
+            return census_gdf
+
+        # Sections spanning several tiles appear once per tile
+        if self.census_id_column in census_gdf.columns:
+            census_gdf = census_gdf.drop_duplicates(subset=self.census_id_column)
+        else:
+            census_gdf = census_gdf[~census_gdf.geometry.to_wkb().duplicated()]
 
-            if response.status_code == 200:
-                # Parse the response as GeoDataFrame
-                self.selected_census_gdf = gpd.GeoDataFrame.from_features(response.json())
-                return True
+        return census_gdf[census_gdf.intersects(user_polygon)].reset_index(drop=True)
+
+    def fetch_census_data(self, polygon_gdf):
+        """Send a POST request to the database server and fetch census information."""
+        payload = self.prepare_payload(polygon_gdf)
+
+        try:
+            if self.tile_cache.enabled:
+                self.selected_census_gdf = self._fetch_through_tile_cache(payload)
             else:
-                response.raise_for_status()
+                self.selected_census_gdf = gpd.GeoDataFrame.from_features(self._request_census_features(payload))
+            return True
         except requests.exceptions.RequestException as e:
             print(f"Error fetching census data: {e}")
             return None
@@ -90,7 +140,7 @@ class DbCensusFetcher(Config):
 
     def run(self, polygon_gdf):
         """Run the process to fetch and save census data."""
-        if self.fetch_census_data(polygon_gdf):
+        if self.fetch_census_data(polygon_gdf) and not self.selected_census_gdf.empty:
             print("Successfully retrieved census data.")
             self.check_and_save_geojson()
             return self.selected_census_gdf
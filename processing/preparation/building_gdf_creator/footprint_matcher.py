@@ -0,0 +1,103 @@
+import logging
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from config.config import Config
+from processing.utility.geometry_hash import GeometryHasher
+
+
+class FootprintMatcher(Config):
+    """
+    Match building footprints against candidate footprints (e.g. database buildings).
+    Fast path: equal normalized-geometry keys (snapped coordinates, canonical ring order).
+    Fallback: bulk spatial-index query with vectorized IoU and Hausdorff thresholds.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.load_config()
+        matching_config = self.config.get("footprint_matching", {})
+        self.iou_threshold = matching_config.get("iou_threshold", 0.9)
+        self.max_hausdorff = matching_config.get("max_hausdorff", 1.0)
+        self.projected_crs = f"EPSG:{self.config.get('PROJECTED_CRS', 32632)}"
+        self.hasher = GeometryHasher()
+
+        logging.basicConfig(level=logging.INFO)
+
+    def _exact_matches(self, buildings_gdf, candidates_gdf, key_column):
+        """Match footprints whose normalized geometry keys are equal."""
+        candidate_keys = pd.Series(self.hasher.keys(candidates_gdf.geometry),
+                                   index=candidates_gdf.index)
+
+        duplicated = candidate_keys.duplicated(keep="first")
+        if duplicated.any():
+            logging.warning(f"⚠️ Found {duplicated.sum()} duplicate candidate footprints, keeping the first.")
+
+        key_map = pd.Series(candidates_gdf.loc[~duplicated, key_column].values,
+                            index=candidate_keys[~duplicated].values)
+        building_keys = pd.Series(self.hasher.keys(buildings_gdf.geometry), index=buildings_gdf.index)
+        return building_keys.map(key_map)
+
+    def _tolerant_matches(self, buildings_gdf, candidates_gdf, key_column):
+        """Match remaining footprints by IoU and Hausdorff distance in the projected CRS."""
+        if buildings_gdf.empty or candidates_gdf.empty:
+            return pd.Series(dtype=object)
+
+        building_geoms = np.asarray(buildings_gdf.geometry.to_crs(self.projected_crs), dtype=object)
+        candidate_geoms = np.asarray(candidates_gdf.geometry.to_crs(self.projected_crs), dtype=object)
+
+        tree = shapely.STRtree(candidate_geoms)
+        left, right = tree.query(building_geoms, predicate="intersects")
+        if len(left) == 0:
+            return pd.Series(dtype=object)
+
+        left_geoms = building_geoms[left]
+        right_geoms = candidate_geoms[right]
+        intersection = shapely.area(shapely.intersection(left_geoms, right_geoms))
+        union = shapely.area(left_geoms) + shapely.area(right_geoms) - intersection
+        iou = np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+        # Hausdorff distance is only computed for pairs passing the (cheaper) IoU test
+        pairs = pd.DataFrame({"left": left, "right": right, "iou": iou})
+        pairs = pairs[pairs["iou"] >= self.iou_threshold]
+        if pairs.empty:
+            return pd.Series(dtype=object)
+        pairs["hausdorff"] = shapely.hausdorff_distance(building_geoms[pairs["left"]],
+                                                        candidate_geoms[pairs["right"]])
+        pairs = pairs[pairs["hausdorff"] <= self.max_hausdorff]
+
+        # Keep one-to-one assignments, best IoU first
+        pairs = pairs.sort_values("iou", ascending=False, kind="stable")
+        pairs = pairs.drop_duplicates(subset="left").drop_duplicates(subset="right")
+
+        return pd.Series(candidates_gdf[key_column].values[pairs["right"].values],
+                         index=buildings_gdf.index[pairs["left"].values])
+
+    def match(self, buildings_gdf, candidates_gdf, key_column="building_id"):
+        """
+        Return a Series aligned with buildings_gdf holding the key of the matching candidate
+        footprint, or NaN where no candidate matches.
+        """
+        result = pd.Series(np.nan, index=buildings_gdf.index, dtype=object)
+        candidates_gdf = candidates_gdf[candidates_gdf.geometry.notnull() & candidates_gdf[key_column].notna()]
+        if buildings_gdf.empty or candidates_gdf.empty:
+            return result
+
+        if candidates_gdf.crs != buildings_gdf.crs:
+            candidates_gdf = candidates_gdf.to_crs(buildings_gdf.crs)
+
+        exact = self._exact_matches(buildings_gdf, candidates_gdf, key_column)
+        result.update(exact)
+        logging.info(f"✅ Matched {exact.notna().sum()} footprints by normalized geometry.")
+
+        remaining = buildings_gdf[result.isna()]
+        used_keys = set(exact.dropna())
+        free_candidates = candidates_gdf[~candidates_gdf[key_column].isin(used_keys)]
+        tolerant = self._tolerant_matches(remaining, free_candidates, key_column)
+        if not tolerant.empty:
+            result.update(tolerant)
+        logging.info(f"✅ Matched {len(tolerant)} more footprints within IoU ≥ {self.iou_threshold} "
+                     f"and Hausdorff ≤ {self.max_hausdorff} m.")
+        return result
@@ -3,31 +3,19 @@ import os
 import geopandas as gpd
 
 from config.config import Config
+from processing.preparation.building_gdf_creator.boundary_builder import BoundaryBuilder
 
 
 class GetSelectedBoundaries(Config):
     def __init__(self):
         super().__init__()
         self.output_file_path = self.config['selected_boundaries']
-        self.polygons = []
         self.boundary_polygon = None
+        self.boundary_builder = BoundaryBuilder()
 
-    def _extract_polygons(self, selected_census_gdf):
-        """Extract polygons from the selected census GeoDataFrame."""
-        if selected_census_gdf.empty:
-            raise ValueError("Selected census GeoDataFrame is empty.")
-
-        for geom in selected_census_gdf.geometry:
-            if geom.geom_type == 'Polygon':
-                self.polygons.append(geom)
-            elif geom.geom_type == 'MultiPolygon':
-                self.polygons.extend(geom.geoms)
-
-    def _combine_polygons(self):
-        """Combine all extracted polygons into a single polygon."""
-        if not self.polygons:
-            raise ValueError("No polygons to combine.")
-        self.boundary_polygon = gpd.GeoSeries(self.polygons).unary_union
+    def _combine_polygons(self, selected_census_gdf):
+        """Combine the census sections into a single boundary with a (cached) coverage union."""
+        self.boundary_polygon = self.boundary_builder.build(selected_census_gdf)
 
     def _save_boundary(self):
         """Save the combined polygon boundary to the output file."""
@@ -45,8 +33,7 @@ class GetSelectedBoundaries(Config):
         return boundary_polygon
 
     def run(self, selected_census_gdf):
-        """Run the process to extract, combine, and save polygon boundaries."""
-        self._extract_polygons(selected_census_gdf)
-        self._combine_polygons()
+        """Run the process to combine and save polygon boundaries."""
+        self._combine_polygons(selected_census_gdf)
         boundary_polygon = self._save_boundary()
         return boundary_polygon
@@ -1,6 +1,7 @@
 import osmnx as ox
 
 from config.config import Config
+from processing.utility.metrics import measure
 
 
 class OSMBuildingExtractor(Config):
@@ -12,7 +13,9 @@ class OSMBuildingExtractor(Config):
 
     def run(self, boundary_polygon):
         """Extract building footprints from OSM."""
-        osm_buildings = ox.features_from_polygon(boundary_polygon, tags={'building': True})
+        with measure("http", "osm") as record:
+            osm_buildings = ox.features_from_polygon(boundary_polygon, tags={'building': True})
+            record["rows"] = len(osm_buildings)
         if osm_buildings.empty:
             raise ValueError("No buildings found in the specified boundary.")
         osm_buildings[self.source_column] = self.source_config.get('osm', 'OpenStreetMap')
@@ -1,8 +1,11 @@
 import os
 
 import geopandas as gpd
+import numpy as np
+import shapely
 
 from config.config import Config
+from processing.utility.user_buildings import UserBuildings
 
 
 class UserBuildingExtractor(Config):
@@ -18,8 +21,8 @@ class UserBuildingExtractor(Config):
         self.source_config = self.config.get('features', {}).get(self.source_column, {}).get("sources", {})
 
     def _read_file(self):
-        """Read GeoJSON file."""
-        gdf = gpd.read_file(self.user_file_path)
+        """Read the user buildings, from memory when this process saved them."""
+        gdf = UserBuildings().load()
         if gdf.empty:
             raise ValueError("User file is empty.")
         if 'geometry' not in gdf.columns:
@@ -32,6 +35,14 @@ class UserBuildingExtractor(Config):
             gdf = gdf.to_crs(self.default_crs)
         return gdf
 
+    def _within_boundary(self, gdf, boundary_polygon):
+        """Return a boolean mask of buildings lying within the boundary, using the spatial index."""
+        shapely.prepare(boundary_polygon)
+        inside = gdf.sindex.query(boundary_polygon, predicate="contains")
+        mask = np.zeros(len(gdf), dtype=bool)
+        mask[inside] = True
+        return mask
+
     def run(self, boundary_polygon):
         """Extract buildings from the user file and fetch building IDs."""
         if not os.path.exists(self.user_file_path):
@@ -43,7 +54,7 @@ class UserBuildingExtractor(Config):
             user_gdf = self._read_file()
             user_gdf = self._ensure_crs(user_gdf)
             user_gdf = user_gdf[user_gdf.geometry.is_valid]
-            user_gdf = user_gdf[user_gdf.geometry.apply(lambda geom: geom.within(boundary_polygon))]
+            user_gdf = user_gdf[self._within_boundary(user_gdf, boundary_polygon)]
             user_gdf[self.source_column] = self.source_config.get('user', 'User')
 
             # Return the result with required columns
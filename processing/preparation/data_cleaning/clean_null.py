@@ -5,23 +5,72 @@ from config.config import Config
 
 
 class CleanGeoData(Config):
+    """
+    Normalize empty values column by column and drop rows that are mostly empty.
+    Columns get a nullable dtype, so missing values stay <NA>: columns the config declares numeric become
+    Int64 or Float64, and other text becomes a string column, keeping codes such as "00184" as they are.
+    """
+
     def __init__(self):
         super().__init__()
-        self.buildings_file_path = self.config['building_path']
+        self.null_threshold = self.config.get('null_threshold', 0.5)
+        self.numeric_types = self._numeric_types()
         self.geo_data = None
+        self.dropped = None
 
-    def run(self, integrated_gdf):
-        self.geo_data = integrated_gdf
-        
-        # Replace empty strings, NaNs, etc., with None
-        self.geo_data = self.geo_data.replace({pd.NA: None, np.nan: None, '': None})
+    def _numeric_types(self):
+        """
+        Return the columns the config declares numeric, mapped to "int" or "float": int and float features,
+        the source columns their config names (e.g. census_id_column) and the census attribute columns.
+        """
+        types = {col: "int" for col in self.config.get('census_columns', [])}
+        for feature_name, feature_config in self.config.get('features', {}).items():
+            feature_type = feature_config.get('type')
+            if feature_type not in ("int", "float"):
+                continue
+            types[feature_name] = feature_type
+            for key, value in feature_config.items():
+                if key.endswith('_column') and isinstance(value, str):
+                    types[value] = feature_type
+        return types
+
+    def _normalize_column(self, series, numeric_type=None):
+        """Turn empty strings into missing values and give object columns their natural dtype."""
+        if series.dtype != object:
+            return series
 
-        # Drop rows with too many None values
-        threshold = len(self.geo_data.columns) * 0.5  # Define a threshold for None values
+        values = series.mask(series.eq(''))
+        present = values.dropna()
+        if present.empty:
+            return values
 
-        self.geo_data = self.geo_data.dropna(thresh=threshold)
+        value_types = present.map(type)
+        if value_types.eq(bool).all():
+            return values.astype('boolean')
+        if value_types.isin([int, float]).all() or (numeric_type and value_types.isin([str, int, float]).all()):
+            numeric = pd.to_numeric(values, errors='coerce')
+            if numeric[values.notna()].notna().all():
+                return numeric.astype('Float64') if numeric_type == "float" else numeric.convert_dtypes()
+        if value_types.eq(str).all():
+            return values.astype('string')
+        return values
+
+    def normalize(self, gdf):
+        """Normalize every attribute column, leaving the geometry untouched."""
+        geometry_name = gdf.geometry.name
+        for column in gdf.columns:
+            if column != geometry_name:
+                gdf[column] = self._normalize_column(gdf[column], self.numeric_types.get(column))
+        return gdf
+
+    def run(self, integrated_gdf):
+        self.geo_data = self.normalize(integrated_gdf.copy())
 
-        self.geo_data.to_file(self.buildings_file_path, driver='GeoJSON')
-        print(f"Cleaned GeoJSON successfully saved to {self.buildings_file_path}")
+        # Drop rows where fewer than the threshold share of columns hold a value
+        null_counts = np.column_stack([self.geo_data[col].isna().to_numpy() for col in self.geo_data.columns]).sum(axis=1)
+        keep = (len(self.geo_data.columns) - null_counts) >= len(self.geo_data.columns) * self.null_threshold
 
+        self.dropped = self.geo_data.index[~keep]
+        self.geo_data = self.geo_data[keep]
+        print(f"Cleaning kept {int(keep.sum())} buildings and dropped {len(self.dropped)} with too many empty values.")
         return self.geo_data
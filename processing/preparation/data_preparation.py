@@ -1,46 +1,108 @@
 import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
 
 from config.config import Config
+from processing.preparation.building_gdf_creator.boundary_builder import BoundaryBuilder
 from processing.preparation.building_gdf_creator.building_manager import BuildingManager
 from processing.preparation.building_gdf_creator.census_selector import CensusSelector
 from processing.preparation.building_gdf_creator.data_integration import DataIntegration
 from processing.preparation.building_gdf_creator.db_census_fetcher import DbCensusFetcher
 from processing.preparation.building_gdf_creator.get_selected_boundries import GetSelectedBoundaries
 from processing.preparation.data_cleaning.clean_null import CleanGeoData
+from processing.utility.census_table import CensusTable
+from processing.utility.geometry_hash import GeometryHasher
+from processing.utility.metrics import measured
 
 
 class PrepMain(Config):
     def __init__(self):
         super().__init__()
+        self.sections_per_batch = self.config.get('streaming', {}).get('sections_per_batch', 50)
+        # Census sections of the last preparation, stored with the project for later updates
+        self.census_sections = None
 
+    @measured("stage")
     def fetch_census_data(self, polygon_gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
         print("Fetching census data")
         return DbCensusFetcher().run(polygon_gdf)
 
+    @measured("stage")
     def select_census_sections(self, polygon_gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
         print("Selecting census sections")
         return CensusSelector().run(polygon_gdf)
 
+    @measured("stage")
+    def store_census_table(self, selected_census_gdf: gpd.GeoDataFrame) -> None:
+        print("Storing census attribute table")
+        census_table = CensusTable()
+        census_table.save(census_table.build(selected_census_gdf))
+
+    @measured("stage")
     def get_boundaries(self, selected_census_gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
         print("Processing boundaries")
         return GetSelectedBoundaries().run(selected_census_gdf)
 
+    @measured("stage")
     def extract_buildings(self, boundaries: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
         print("Extracting buildings")
         return BuildingManager().run(boundaries)
 
+    @measured("stage")
     def integrate_data(self, buildings_gdf: gpd.GeoDataFrame,
-                       selected_census_gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+                       selected_census_gdf: gpd.GeoDataFrame, save: bool = True) -> gpd.GeoDataFrame:
         print("Integrating data")
-        return DataIntegration().run(buildings_gdf, selected_census_gdf)
+        return DataIntegration().run(buildings_gdf, selected_census_gdf, save=save)
 
+    @measured("stage")
     def clean_data(self, integrated_gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
         print("Cleaning data")
         return CleanGeoData().run(integrated_gdf)
 
-    def run(self, polygon_gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+    def select_census(self, polygon_gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
         selected_census_gdf = self.fetch_census_data(polygon_gdf)
-        # selected_census_gdf = self.select_census_sections(polygon_gdf)
+        if selected_census_gdf is None or selected_census_gdf.empty:
+            # Fall back to the local, indexed census store when the census service fails or times out
+            selected_census_gdf = self.select_census_sections(polygon_gdf)
+        self.store_census_table(selected_census_gdf)
+        self.census_sections = selected_census_gdf
+        return selected_census_gdf
+
+    def extract_batch_buildings(self, batch_census_gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+        """Extract the buildings of a batch of census sections, one boundary part at a time."""
+        boundary = BoundaryBuilder().build(batch_census_gdf)
+        parts = [self.extract_buildings(gpd.GeoDataFrame(geometry=[part], crs=batch_census_gdf.crs))
+                 for part in shapely.get_parts(boundary)]
+        buildings_gdf = gpd.GeoDataFrame(pd.concat(parts, ignore_index=True), crs=parts[0].crs)
+        # Buildings touching two boundary parts are extracted twice
+        keys = pd.Series(GeometryHasher().keys(buildings_gdf.geometry.values))
+        return buildings_gdf[~keys.duplicated().values].reset_index(drop=True)
+
+    def iter_batches(self, polygon_gdf: gpd.GeoDataFrame):
+        """
+        Yield the prepared buildings one batch of census sections at a time.
+        Each building is integrated only with the batch holding its representative point,
+        so batches never share a building and every census section lies in a single batch.
+        """
+        selected_census_gdf = self.select_census(polygon_gdf)
+        self.get_boundaries(selected_census_gdf)
+
+        # Neighbouring sections go into the same batch
+        order = np.argsort(selected_census_gdf.geometry.hilbert_distance().values, kind="stable")
+        selected_census_gdf = selected_census_gdf.iloc[order]
+
+        for start in range(0, len(selected_census_gdf), self.sections_per_batch):
+            batch_census_gdf = selected_census_gdf.iloc[start:start + self.sections_per_batch]
+            print(f"Preparing census sections {start + 1}-{start + len(batch_census_gdf)} "
+                  f"of {len(selected_census_gdf)}")
+            buildings_gdf = self.extract_batch_buildings(batch_census_gdf)
+            integrated_gdf = self.integrate_data(buildings_gdf, batch_census_gdf, save=False)
+            if not integrated_gdf.empty:
+                yield self.clean_data(integrated_gdf)
+
+    def run(self, polygon_gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+        selected_census_gdf = self.select_census(polygon_gdf)
         boundaries = self.get_boundaries(selected_census_gdf)
         buildings_gdf = self.extract_buildings(boundaries)
 
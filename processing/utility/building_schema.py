@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_integer_dtype
+
+from config.config import Config
+
+# Feature config keys that enumerate the values of a string feature
+ENUMERATION_KEYS = ("allowed_usages", "allowed_values", "hvac_types", "tabula_types", "sources")
+
+
+class BuildingSchema(Config):
+    """
+    Compact in-memory dtypes for the building table.
+    Enumerated string features are held as categoricals, building ids as Arrow strings and
+    ranged integer features in the smallest integer type covering their configured range.
+    Columns are restored to their plain dtypes before a feature rewrites them and before output.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.features = self.config.get("features", {})
+        self.consumed_columns = self.config.get("consumed_columns", {})
+
+    def _compact_dtype(self, feature_name, column):
+        """Return the compact dtype for a feature column, or None if it should stay as it is."""
+        feature_config = self.features.get(feature_name, {})
+        feature_type = feature_config.get("type")
+
+        if feature_type == "str" and any(key in feature_config for key in ENUMERATION_KEYS):
+            return "category"
+        if feature_type == "UUID" and column.dropna().map(type).eq(str).all():
+            return "string[pyarrow]"
+        if feature_type == "int" and is_integer_dtype(column.dtype) and column.notna().all() \
+                and "min" in feature_config and "max" in feature_config:
+            for dtype in (np.int8, np.int16, np.int32):
+                limits = np.iinfo(dtype)
+                if limits.min <= feature_config["min"] and feature_config["max"] <= limits.max \
+                        and limits.min <= column.min() and column.max() <= limits.max:
+                    return dtype
+        if feature_type == "bool" and column.notna().all() and column.map(type).eq(bool).all():
+            return bool
+        return None
+
+    def compact(self, gdf, feature_name):
+        """Store a computed feature column compactly and drop the columns only this feature consumed."""
+        if feature_name in gdf.columns:
+            dtype = self._compact_dtype(feature_name, gdf[feature_name])
+            if dtype is not None:
+                gdf[feature_name] = gdf[feature_name].astype(dtype)
+
+            # Consumed columns are only needed while the feature still has rows to fill
+            consumed = [col for col in self.consumed_columns.get(feature_name, []) if col in gdf.columns]
+            if consumed and gdf[feature_name].notna().all():
+                gdf = gdf.drop(columns=consumed)
+        return gdf
+
+    def restore(self, gdf, columns=None):
+        """Give compact columns back their plain dtypes (object strings, int64)."""
+        columns = [col for col in (columns if columns is not None else gdf.columns) if col in gdf.columns]
+        for col in columns:
+            dtype = gdf[col].dtype
+            if isinstance(dtype, (pd.CategoricalDtype, pd.StringDtype)):
+                gdf[col] = gdf[col].astype(object).where(gdf[col].notna(), None)
+            elif is_integer_dtype(dtype) and not is_bool_dtype(dtype) and isinstance(dtype, np.dtype) \
+                    and dtype.itemsize < 8:
+                gdf[col] = gdf[col].astype(np.int64)
+        return gdf
@@ -0,0 +1,93 @@
+import hashlib
+import os
+import threading
+
+import pandas as pd
+
+from config.config import Config
+from processing.utility.path_names import safe_name
+
+# Census tables loaded in this process, keyed by table path: (mtime, DataFrame)
+_LOADED_TABLES = {}
+_TABLE_LOCK = threading.Lock()
+
+
+class CensusTable(Config):
+    """
+    Census attributes (E3–E16, PF1, P1, ...) held once per census section in a typed table
+    indexed by census id, instead of being copied onto every building row. Each project scenario has
+    its own table, so a request never reads the census sections of another project.
+    """
+
+    def __init__(self):
+        super().__init__()
+        project_info = self.config.get('project_info', {})
+        root, extension = os.path.splitext(
+            self.config.get('census_table_path', './data_source/output_files/census_table.parquet'))
+        self.table_path = (f"{root}_{safe_name(project_info.get('project_id'))}"
+                           f"_{safe_name(project_info.get('scenario_id'))}{extension}")
+        self.census_id_column = self.config.get('features', {}).get('census_id', {}).get('census_id_column', 'SEZ2011')
+        self.census_columns = self.config.get('census_columns', [])
+
+    def build(self, census_gdf):
+        """Build the typed attribute table from the selected census sections."""
+        attributes = [col for col in self.census_columns
+                      if col != self.census_id_column and col in census_gdf.columns]
+
+        census_ids = pd.to_numeric(census_gdf[self.census_id_column], errors='coerce')
+        table = pd.DataFrame(
+            {col: pd.to_numeric(census_gdf[col], errors='coerce').round().astype('Int32').values for col in attributes},
+            index=census_ids.values
+        )
+        table = table[table.index.notna()]
+        table.index = table.index.astype('int64')
+        table.index.name = self.census_id_column
+        return table[~table.index.duplicated(keep='first')]
+
+    def save(self, table):
+        """Persist the table and keep it in memory for the features of this process."""
+        table_dir = os.path.dirname(self.table_path)
+        if table_dir and not os.path.exists(table_dir):
+            print(f"Directory {table_dir} does not exist. Creating it now.")
+            os.makedirs(table_dir, exist_ok=True)
+
+        with _TABLE_LOCK:
+            table.to_parquet(self.table_path)
+            _LOADED_TABLES[self.table_path] = (os.path.getmtime(self.table_path), table)
+        print(f"Census table with {len(table)} sections saved to {self.table_path}.")
+
+    def load(self):
+        """Return the census table, or an empty table if none has been saved yet."""
+        with _TABLE_LOCK:
+            if not os.path.exists(self.table_path):
+                print(f"Census table not found: {self.table_path}")
+                return pd.DataFrame(index=pd.Index([], dtype='int64', name=self.census_id_column))
+
+            mtime = os.path.getmtime(self.table_path)
+            cached = _LOADED_TABLES.get(self.table_path)
+            if cached is None or cached[0] != mtime:
+                cached = (mtime, pd.read_parquet(self.table_path))
+                _LOADED_TABLES[self.table_path] = cached
+            return cached[1]
+
+    def content_hash(self):
+        """Return a hash of the table's content, empty tables included."""
+        table = self.load()
+        digest = hashlib.sha1(",".join(map(str, table.columns)).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(table, index=True).to_numpy().tobytes())
+        return digest.hexdigest()
+
+    def lookup(self, census_ids, columns):
+        """Return the requested attributes for the given census ids (one row per id, NA if unknown)."""
+        table = self.load()
+        columns = [col for col in columns if col in table.columns]
+        keys = pd.to_numeric(pd.Series(census_ids), errors='coerce')
+        return table[columns].reindex(keys.values)
+
+    def join(self, gdf, columns, census_id_column):
+        """Return a copy of gdf with the requested census attributes joined on the census id column."""
+        attributes = self.lookup(gdf[census_id_column], columns)
+        joined = gdf.copy()
+        for col in attributes.columns:
+            joined[col] = attributes[col].values
+        return joined
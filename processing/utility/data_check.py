@@ -3,6 +3,7 @@ import os
 import geopandas as gpd
 
 from config.config import Config
+from processing.utility.user_buildings import UserBuildings
 
 
 class DataCheck(Config):
@@ -35,7 +36,7 @@ class DataCheck(Config):
         if os.path.exists(self.user_file):
             try:
                 print(f"Loading user file: {self.user_file}")
-                return gpd.read_file(self.user_file)
+                return UserBuildings().load()
             except Exception as e:
                 print(f"Error loading user file: {e}")
         else:
@@ -2,6 +2,7 @@ import pandas as pd
 import requests
 
 from config.config import Config
+from processing.utility.metrics import measure
 
 
 class DatabaseCheck(Config):
@@ -29,15 +30,17 @@ class DatabaseCheck(Config):
 
         try:
             # Send request to the database with building IDs and feature name
-            response = requests.post(
-                self.db_url,
-                json={"building_ids": building_ids},
-                params={"feature_name": feature_name}
-            )
-            response.raise_for_status()
-
-            # Parse the response JSON
-            data = response.json()
+            with measure("http", "db_feature") as record:
+                response = requests.post(
+                    self.db_url,
+                    json={"building_ids": building_ids},
+                    params={"feature_name": feature_name}
+                )
+                response.raise_for_status()
+
+                # Parse the response JSON
+                data = response.json()
+                record["rows"] = len(data)
             return pd.DataFrame(data)  # Expected: [{"building_id": "db123", "n_floors": 3}, ...]
 
         except requests.RequestException as e:
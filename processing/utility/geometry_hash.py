@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import shapely
+
+from config.config import Config
+
+
+class GeometryHasher(Config):
+    """
+    Builds normalized keys for footprints so that the same building gets the same key
+    regardless of coordinate jitter below the snapping grid, ring start vertex or ring orientation.
+    """
+
+    def __init__(self):
+        super().__init__()
+        matching_config = self.config.get("footprint_matching", {})
+        self.grid_size = matching_config.get("grid_size", 1e-7)
+
+    def normalize(self, geometries):
+        """Snap coordinates to the configured grid and bring rings into canonical order."""
+        geometries = np.asarray(geometries, dtype=object)
+        snapped = shapely.set_precision(geometries, self.grid_size)
+        return shapely.normalize(snapped)
+
+    def keys(self, geometries):
+        """Return the WKB of each normalized geometry (None for missing geometries)."""
+        return shapely.to_wkb(self.normalize(geometries))
+
+    def hashes(self, geometries):
+        """Return a 64-bit hash of each normalized geometry."""
+        return pd.util.hash_array(self.keys(geometries))
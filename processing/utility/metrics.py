@@ -0,0 +1,181 @@
+import contextvars
+import resource
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+
+from config.config import Config
+
+# Upper bounds of the wall time histogram buckets, in seconds
+WALL_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+
+# Totals per (kind, name) since the process started, served at the metrics endpoint
+_TOTALS = {}
+# Measurements of the latest jobs, oldest first
+_JOBS = OrderedDict()
+# The job of the running request and the list it records into, as (job_id, records); kept per thread
+# so concurrent requests do not record into each other's jobs
+_CURRENT = contextvars.ContextVar("metrics_current_job", default=(None, None))
+_METRICS_LOCK = threading.Lock()
+
+
+def _peak_rss_bytes():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _add_to_totals(record):
+    totals = _TOTALS.setdefault((record["kind"], record["name"]), {
+        "runs": 0, "errors": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "peak_rss_delta_bytes": 0, "rows": 0,
+        "buckets": [0] * len(WALL_BUCKETS),
+    })
+    totals["runs"] += 1
+    totals["errors"] += int(record["error"])
+    totals["wall_seconds"] += record["wall_seconds"]
+    totals["cpu_seconds"] += record["cpu_seconds"]
+    totals["peak_rss_delta_bytes"] += record["peak_rss_delta_bytes"]
+    totals["rows"] += record["rows"] or 0
+    for i, bound in enumerate(WALL_BUCKETS):
+        if record["wall_seconds"] <= bound:
+            totals["buckets"][i] += 1
+            break
+
+
+def _store(records):
+    current = _CURRENT.get()[1]
+    with _METRICS_LOCK:
+        for record in records:
+            _add_to_totals(record)
+            if current is not None:
+                current.append(record)
+
+
+@contextmanager
+def measure(kind, name):
+    """
+    Measure a step: wall time, CPU time of the process, growth of the peak RSS and, if the caller sets
+    record["rows"], the rows it handled. The record is added to the running job and the process totals.
+    """
+    record = {"kind": kind, "name": name, "rows": None, "error": False}
+    rss, cpu, start = _peak_rss_bytes(), time.process_time(), time.perf_counter()
+    try:
+        yield record
+    except BaseException:
+        record["error"] = True
+        raise
+    finally:
+        record["wall_seconds"] = time.perf_counter() - start
+        record["cpu_seconds"] = time.process_time() - cpu
+        record["peak_rss_delta_bytes"] = _peak_rss_bytes() - rss
+        _store([record])
+
+
+def measured(kind):
+    """Decorate a method so every call is measured as a step named after it, counting the rows it returns."""
+    def decorator(method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            with measure(kind, method.__name__) as record:
+                result = method(*args, **kwargs)
+                if hasattr(result, "__len__") and not isinstance(result, (str, bytes, tuple, dict)):
+                    record["rows"] = len(result)
+                return result
+        return wrapper
+    return decorator
+
+
+class Metrics(Config):
+    """
+    Timings of the preparation stages, scenarios, features, external HTTP calls and output steps.
+    Measurements are kept per job for the job result, and summed per step for the Prometheus endpoint.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.max_jobs = self.config.get('metrics', {}).get('max_jobs', 20)
+
+    def start_job(self, job_id):
+        """Record the following measurements for a new job, dropping the oldest jobs over max_jobs."""
+        with _METRICS_LOCK:
+            _JOBS.pop(job_id, None)
+            _JOBS[job_id] = []
+            _CURRENT.set((job_id, _JOBS[job_id]))
+            while len(_JOBS) > self.max_jobs:
+                _JOBS.popitem(last=False)
+
+    @staticmethod
+    @contextmanager
+    def collect():
+        """Collect the measurements of a block separately, e.g. in a worker process, to be added to a job later."""
+        records = []
+        token = _CURRENT.set((_CURRENT.get()[0], records))
+        try:
+            yield records
+        finally:
+            _CURRENT.reset(token)
+
+    @staticmethod
+    def add(records):
+        """Add measurements taken elsewhere (a worker process) to the running job and the totals."""
+        _store(records)
+
+    @staticmethod
+    def job_summary(job_id=None):
+        """Return the measurements of a job (by default the running one) summed per kind and step."""
+        job_id = job_id or _CURRENT.get()[0]
+        with _METRICS_LOCK:
+            records = list(_JOBS.get(job_id, []))
+
+        steps = {}
+        for record in records:
+            step = steps.setdefault(record["kind"], {}).setdefault(record["name"], {
+                "runs": 0, "errors": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "peak_rss_delta_bytes": 0,
+                "rows": None,
+            })
+            step["runs"] += 1
+            step["errors"] += int(record["error"])
+            step["wall_seconds"] = round(step["wall_seconds"] + record["wall_seconds"], 6)
+            step["cpu_seconds"] = round(step["cpu_seconds"] + record["cpu_seconds"], 6)
+            step["peak_rss_delta_bytes"] += record["peak_rss_delta_bytes"]
+            if record["rows"] is not None:
+                step["rows"] = (step["rows"] or 0) + record["rows"]
+        return {"job_id": job_id, "steps": steps}
+
+    @staticmethod
+    def prometheus():
+        """Return the process totals in the Prometheus text exposition format."""
+        with _METRICS_LOCK:
+            totals = {key: {**values, "buckets": list(values["buckets"])} for key, values in _TOTALS.items()}
+
+        def labels(kind, name, **extra):
+            pairs = {"kind": kind, "name": name, **extra}
+            escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+                       for value in pairs.values())
+            return "{" + ",".join(f'{key}="{value}"' for key, value in zip(pairs, escaped)) + "}"
+
+        lines = []
+        counters = [
+            ("pipeline_step_runs_total", "runs", "Runs of a step."),
+            ("pipeline_step_errors_total", "errors", "Runs of a step that raised an error."),
+            ("pipeline_step_cpu_seconds_total", "cpu_seconds", "Process CPU time spent in a step."),
+            ("pipeline_step_rows_total", "rows", "Rows returned or handled by a step."),
+            ("pipeline_step_peak_rss_increase_bytes_total", "peak_rss_delta_bytes",
+             "Growth of the process peak resident set size during a step."),
+        ]
+        for metric, field, description in counters:
+            lines += [f"# HELP {metric} {description}", f"# TYPE {metric} counter"]
+            lines += [f"{metric}{labels(kind, name)} {values[field]}" for (kind, name), values in sorted(totals.items())]
+
+        metric = "pipeline_step_wall_seconds"
+        lines += [f"# HELP {metric} Wall time of a step.", f"# TYPE {metric} histogram"]
+        for (kind, name), values in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(WALL_BUCKETS, values["buckets"]):
+                cumulative += count
+                lines.append(f"{metric}_bucket{labels(kind, name, le=bound)} {cumulative}")
+            lines.append(f"{metric}_bucket{labels(kind, name, le='+Inf')} {values['runs']}")
+            lines.append(f"{metric}_sum{labels(kind, name)} {values['wall_seconds']}")
+            lines.append(f"{metric}_count{labels(kind, name)} {values['runs']}")
+        return "\n".join(lines) + "\n"
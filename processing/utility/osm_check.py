@@ -1,6 +1,9 @@
 import geopandas as gpd
 import osmnx as ox
 
+from processing.utility.metrics import measure
+
+
 class OSMCheck:
     def __init__(self, config):
         self.config = config
@@ -38,7 +41,9 @@ class OSMCheck:
     def fetch_osm_data(self, feature_tag, polygon):
         print("Fetching OSM data using osmnx...")
         tags = {"building": True, feature_tag: True}
-        osm_gdf = ox.features_from_polygon(polygon, tags=tags)
+        with measure("http", "osm") as record:
+            osm_gdf = ox.features_from_polygon(polygon, tags=tags)
+            record["rows"] = len(osm_gdf)
         print(f"Retrieved {len(osm_gdf)} records from OSM.")
         return osm_gdf
 
@@ -0,0 +1,13 @@
+import hashlib
+import re
+
+# Ids used as file names as they are; anything else (path separators, dots, long values) is hashed
+_SAFE_NAME = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+
+def safe_name(value):
+    """Return a file name for a request-supplied id that cannot leave the directory it is joined to."""
+    value = str(value)
+    if _SAFE_NAME.match(value):
+        return value
+    return "id-" + hashlib.sha1(value.encode("utf-8")).hexdigest()
@@ -0,0 +1,71 @@
+import os
+import tempfile
+
+import geopandas as gpd
+import pyarrow as pa
+
+from config.config import Config
+from processing.utility.path_names import safe_name
+
+
+class ProjectState(Config):
+    """
+    The full building table of each project scenario, with its census sections, kept as the base later
+    updates of the scenario are compared against. Unlike the output it is neither column- nor polygon-filtered.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.directory = self.config.get('project_state', {}).get('directory', './data_source/project_state')
+
+    def _paths(self, project_id, scenario_id):
+        base = os.path.join(self.directory, safe_name(project_id), f"{safe_name(scenario_id)}.state")
+        return f"{base}.parquet", f"{base}_census.parquet"
+
+    @staticmethod
+    def _text_columns(gdf):
+        """Return a copy of gdf whose object columns mixing value types (e.g. numbers and text) hold text."""
+        gdf = gdf.copy()
+        for column in gdf.columns:
+            if column == gdf.geometry.name or gdf[column].dtype != object:
+                continue
+            values = gdf[column]
+            if values.dropna().map(type).nunique() > 1:
+                gdf[column] = values.where(values.isna(), values.astype(str))
+        return gdf
+
+    def _write(self, gdf, path):
+        gdf = gdf.reset_index(drop=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        os.close(fd)
+        try:
+            try:
+                gdf.to_parquet(temp_path)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                self._text_columns(gdf).to_parquet(temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def save(self, gdf, project_info, census_gdf=None):
+        """Store the buildings and census sections of a project scenario, replacing its previous state."""
+        buildings_path, census_path = self._paths(project_info.get('project_id'), project_info.get('scenario_id'))
+        os.makedirs(os.path.dirname(buildings_path), exist_ok=True)
+        if census_gdf is not None:
+            self._write(census_gdf, census_path)
+        elif os.path.exists(census_path):
+            os.remove(census_path)
+        self._write(gdf, buildings_path)
+        print(f"Stored the state of project {project_info.get('project_id')}, "
+              f"scenario {project_info.get('scenario_id')} ({len(gdf)} buildings).")
+        return buildings_path
+
+    def load(self, project_id, scenario_id):
+        """Return the stored buildings and census sections (or None) of a scenario; None if it has no stored state."""
+        buildings_path, census_path = self._paths(project_id, scenario_id)
+        if not os.path.exists(buildings_path):
+            return None
+        census_gdf = gpd.read_parquet(census_path) if os.path.exists(census_path) else None
+        return gpd.read_parquet(buildings_path), census_gdf
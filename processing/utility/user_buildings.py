@@ -0,0 +1,50 @@
+import os
+import threading
+
+import geopandas as gpd
+
+from config.config import Config
+from processing.output_generator.geojson_stream import GeoJSONStreamWriter
+
+# User buildings saved by this process, keyed by file path: (mtime, GeoDataFrame)
+_USER_BUILDINGS = {}
+_USER_BUILDINGS_LOCK = threading.Lock()
+
+
+class UserBuildings(Config):
+    """
+    The user building file, kept in memory by the process that wrote it.
+    Readers get the in-memory buildings while the file is unchanged, and read the file otherwise.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.path = self.config.get('user_building_file')
+
+    def exists(self):
+        return bool(self.path) and os.path.exists(self.path)
+
+    def save(self, gdf):
+        """Write the user buildings to the user building file and keep them in memory."""
+        user_file_dir = os.path.dirname(self.path)
+        if user_file_dir and not os.path.exists(user_file_dir):
+            print(f"Directory {user_file_dir} does not exist. Creating it now.")
+            os.makedirs(user_file_dir)
+
+        extra = {}
+        if gdf.crs is not None and gdf.crs.to_epsg() != 4326:
+            extra["crs"] = {"type": "name", "properties": {"name": f"urn:ogc:def:crs:EPSG::{gdf.crs.to_epsg()}"}}
+        for _ in GeoJSONStreamWriter.tee_to_file(GeoJSONStreamWriter().collection_chunks([gdf], extra), self.path):
+            pass
+        with _USER_BUILDINGS_LOCK:
+            _USER_BUILDINGS[self.path] = (os.path.getmtime(self.path), gdf.copy())
+
+    def load(self):
+        """Return the user buildings, from memory if the file is the one this process wrote."""
+        if not self.exists():
+            raise FileNotFoundError(f"File not found: {self.path}")
+        with _USER_BUILDINGS_LOCK:
+            cached = _USER_BUILDINGS.get(self.path)
+            if cached is not None and cached[0] == os.path.getmtime(self.path):
+                return cached[1].copy()
+        return gpd.read_file(self.path)
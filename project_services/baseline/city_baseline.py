@@ -0,0 +1,110 @@
+import os
+import threading
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from config.config import Config
+from processing.preparation.building_gdf_creator.boundary_builder import BoundaryBuilder
+from processing.preparation.building_gdf_creator.census_store import BBOX_COLUMNS, CensusStore
+from processing.preparation.data_preparation import PrepMain
+from processing.utility.building_schema import BuildingSchema
+from project_services.scenario.scenarios import BaselineScenario
+
+# City baselines loaded in this process, keyed by layer path: (mtime, GeoDataFrame, STRtree)
+_LOADED_BASELINES = {}
+_BASELINE_LOCK = threading.Lock()
+
+
+class CityBaseline(Config):
+    """
+    City-wide baseline buildings, computed once by running the preparation and the baseline scenario
+    over every census section, and stored as a Hilbert-sorted GeoParquet layer with bbox columns.
+    Project polygons are answered by clipping this layer through its spatial index.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.layer_path = self.config.get('city_baseline', {}).get(
+            'path', './data_source/output_files/city_baseline.parquet')
+        self.default_crs = f"EPSG:{self.config.get('DEFAULT_CRS', 4326)}"
+        self.census_id_column = self.config.get('features', {}).get('census_id', {}).get('census_id_column', 'SEZ2011')
+
+    def available(self):
+        return os.path.exists(self.layer_path)
+
+    def precompute(self):
+        """Run the preparation and the baseline scenario over the whole city and store the result."""
+        census_gdf, _ = CensusStore().load()
+        city_polygon = BoundaryBuilder().build(census_gdf)
+        polygon_gdf = gpd.GeoDataFrame(geometry=[city_polygon], crs=census_gdf.crs).to_crs(self.default_crs)
+
+        print(f"Precomputing the city baseline over {len(census_gdf)} census sections...")
+        gdf = PrepMain().run(polygon_gdf)
+        gdf = BaselineScenario().run_scenario(gdf)
+        gdf = BuildingSchema().restore(gdf.copy()).to_crs(self.default_crs)
+
+        # Sort along a Hilbert curve so that nearby buildings are stored next to each other
+        order = np.argsort(gdf.geometry.hilbert_distance().values, kind="stable")
+        gdf = gdf.iloc[order].reset_index(drop=True)
+        gdf[BBOX_COLUMNS] = gdf.geometry.bounds.values
+
+        layer_dir = os.path.dirname(self.layer_path)
+        if layer_dir and not os.path.exists(layer_dir):
+            print(f"Directory {layer_dir} does not exist. Creating it now.")
+            os.makedirs(layer_dir, exist_ok=True)
+
+        gdf.to_parquet(self.layer_path, index=False)
+        print(f"City baseline with {len(gdf)} buildings saved to {self.layer_path}.")
+
+    def load(self):
+        """Return the in-memory baseline layer and its STRtree."""
+        with _BASELINE_LOCK:
+            mtime = os.path.getmtime(self.layer_path)
+            cached = _LOADED_BASELINES.get(self.layer_path)
+            if cached is None or cached[0] != mtime:
+                layer = gpd.read_parquet(self.layer_path)
+                cached = (mtime, layer, shapely.STRtree(layer.geometry.values))
+                _LOADED_BASELINES[self.layer_path] = cached
+                print(f"City baseline loaded with {len(layer)} buildings.")
+            return cached[1], cached[2]
+
+    def clip(self, polygon_gdf, census_sections=None):
+        """
+        Return the baseline buildings of the project. With the project's census sections, these are the
+        buildings assigned to those sections, as the full preparation extracts them; otherwise the buildings
+        intersecting the project polygon.
+        """
+        layer, tree = self.load()
+        if census_sections is not None and not census_sections.empty and 'census_id' in layer.columns:
+            _, indices = tree.query(census_sections.to_crs(layer.crs).geometry.values, predicate="intersects")
+            indices = np.unique(indices)
+            section_ids = pd.to_numeric(census_sections[self.census_id_column], errors='coerce')
+            in_sections = pd.to_numeric(layer['census_id'].iloc[indices], errors='coerce').isin(section_ids)
+            indices = indices[in_sections.to_numpy()]
+        else:
+            polygon = polygon_gdf.to_crs(layer.crs).geometry.iloc[0]
+            indices = np.sort(tree.query(polygon, predicate="intersects"))
+        clipped = layer.iloc[indices].drop(columns=BBOX_COLUMNS).reset_index(drop=True)
+        print(f"Clipped {len(clipped)} buildings from the city baseline.")
+        return clipped
+
+    def prepare_project(self, polygon_gdf):
+        """
+        Store the project's census sections, census table and boundary, which later feature
+        recalculations (user overrides, other scenarios) read, without running the full preparation.
+        Returns the selected census sections.
+        """
+        preparation = PrepMain()
+        selected_census_gdf = preparation.select_census_sections(polygon_gdf)
+        if selected_census_gdf is None or selected_census_gdf.empty:
+            return selected_census_gdf
+        preparation.store_census_table(selected_census_gdf)
+        preparation.get_boundaries(selected_census_gdf)
+        return selected_census_gdf
+
+
+if __name__ == '__main__':
+    CityBaseline().precompute()
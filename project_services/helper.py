@@ -1,8 +1,9 @@
-import os
-
 import geopandas as gpd
 
 from config.config import Config
+from processing.utility.metrics import Metrics
+from processing.utility.user_buildings import UserBuildings
+from project_services.baseline.city_baseline import CityBaseline
 from project_services.scenario.scenario_manager import ScenarioManager
 from project_services.utils.polygon_from_buildings import BuildingPolygonCreator
 from project_services.utils.project_id import ProjectId
@@ -19,6 +20,7 @@ class DataHelper(Config):
         self.polygon_creator = BuildingPolygonCreator()
         self.project_id_generator = ProjectId()
         self.scenario_id_generator = ScenarioId()
+        self.city_baseline = CityBaseline()
 
     def process_polygon_array(self, data):
         self._save_project_info(data)
@@ -26,26 +28,31 @@ class DataHelper(Config):
         if not polygon_array:
             raise ValueError("No polygonArray data provided.")
         polygon_gdf = self.polygon_creator.user_polygon(polygon_array)
+
+        # Clip the precomputed city baseline when it exists; otherwise run the full preparation
+        if self.city_baseline.available():
+            census_sections = self.city_baseline.prepare_project(polygon_gdf)
+            baseline_gdf = self.city_baseline.clip(polygon_gdf, census_sections)
+            if not baseline_gdf.empty:
+                building_geometry = data.get("buildingGeometry")
+                overrides_gdf = self._load_building_geometry(building_geometry) if building_geometry else None
+                self.manager.run_from_baseline(baseline_gdf, overrides_gdf, census_sections)
+                return
         self.manager.run_scenarios(polygon_gdf)
 
-    def process_building_geometry(self, data):
+    def process_building_geometry(self, data, buildings_gdf=None):
+        """Run the scenarios on the request's buildings; buildings_gdf holds them if the body was parsed as a stream."""
         self._save_project_info(data)
-        building_geometry = data.get("buildingGeometry")
-        if not building_geometry:
-            raise ValueError("No buildingGeometry data provided.")
-        buildings_gdf = self._load_building_geometry(building_geometry)
+        buildings_gdf = self._request_buildings(data, buildings_gdf)
         self._save_building_geometry(buildings_gdf)
-        polygon_gdf = self.polygon_creator.create_polygon_from_buildings()
+        polygon_gdf = self.polygon_creator.create_polygon_from_buildings(buildings_gdf)
         self.manager.run_scenarios(polygon_gdf)
 
-    def update_buildings_gdf(self, data):
+    def update_buildings_gdf(self, data, buildings_gdf=None):
         self._save_project_info(data)
-        building_geometry = data.get("buildingGeometry")
-        if not building_geometry:
-            raise ValueError("No buildingGeometry data provided.")
-        buildings_gdf = self._load_building_geometry(building_geometry)
+        buildings_gdf = self._request_buildings(data, buildings_gdf)
         self._save_building_geometry(buildings_gdf)
-        polygon_gdf = self.polygon_creator.create_polygon_from_buildings()
+        polygon_gdf = self.polygon_creator.create_polygon_from_buildings(buildings_gdf)
 
         gdf = self.manager.run_scenarios(polygon_gdf, buildings_gdf)
         return gdf
@@ -67,10 +74,12 @@ class DataHelper(Config):
 
         print(f"Project ID: {self.project_id}")
         print(f"Scenario ID: {self.scenario_id}")
+        Metrics().start_job(f"{self.project_id}/{self.scenario_id}")
 
         project_info = {
             "project_id": self.project_id,
             "scenario_id": self.scenario_id,
+            "base_scenario_id": data.get("base_scenario_id", ""),
             "projectName": data.get("projectName", ""),
             "scenario_name": data.get("scenario_name", ""),
             "scenarioList": data.get("scenarioList", []),
@@ -83,6 +92,17 @@ class DataHelper(Config):
         print(f"project_info: {project_info}")
         self.save_config()
 
+    def _request_buildings(self, data, buildings_gdf=None):
+        building_geometry = data.get("buildingGeometry")
+        if buildings_gdf is None:
+            if not building_geometry:
+                raise ValueError("No buildingGeometry data provided.")
+            return self._load_building_geometry(building_geometry)
+        try:
+            return self._apply_input_crs(buildings_gdf, building_geometry or {})
+        except Exception as e:
+            raise ValueError(f"Error processing building geometry: {e}")
+
     def _load_building_geometry(self, building_geometry):
         try:
             # Load GeoDataFrame from features
@@ -90,40 +110,37 @@ class DataHelper(Config):
                 building_geometry['features'], crs=self.default_crs
             )
             print("Building geometry data loaded successfully.")
-
-            # Check CRS provided in the data
-            input_crs = building_geometry.get("crs", {}).get("properties", {}).get("name")
-            if input_crs:
-                print(f"CRS provided in data: {input_crs}")
-                try:
-                    input_crs = gpd.CRS.from_string(input_crs).to_epsg()  # Convert CRS to EPSG code
-                    buildings_gdf.set_crs(input_crs, inplace=True, allow_override=True)
-                except Exception as crs_error:
-                    print(f"Error parsing CRS: {crs_error}. Defaulting to {self.default_crs}.")
-                    buildings_gdf.set_crs(self.default_crs, inplace=True)
-            else:
-                print(f"No CRS provided in data. Defaulting to {self.default_crs}.")
-                buildings_gdf.set_crs(self.default_crs, inplace=True)
-
-            # Ensure the geometry column is active
-            if "geometry" not in buildings_gdf.columns:
-                raise ValueError("No geometry column found in the provided data.")
-            buildings_gdf.set_geometry("geometry", inplace=True)
-
-            # Check and reproject CRS if needed
-            return self._check_crs(buildings_gdf)
+            return self._apply_input_crs(buildings_gdf, building_geometry)
 
         except Exception as e:
             raise ValueError(f"Error processing building geometry: {e}")
 
-    def _save_building_geometry(self, buildings_gdf):
+    def _apply_input_crs(self, buildings_gdf, building_geometry):
+        """Set the CRS given with the building geometry (or the default) and reproject to the default CRS."""
+        # Check CRS provided in the data
+        input_crs = building_geometry.get("crs", {}).get("properties", {}).get("name")
+        if input_crs:
+            print(f"CRS provided in data: {input_crs}")
+            try:
+                input_crs = gpd.CRS.from_string(input_crs).to_epsg()  # Convert CRS to EPSG code
+                buildings_gdf.set_crs(input_crs, inplace=True, allow_override=True)
+            except Exception as crs_error:
+                print(f"Error parsing CRS: {crs_error}. Defaulting to {self.default_crs}.")
+                buildings_gdf.set_crs(self.default_crs, inplace=True)
+        else:
+            print(f"No CRS provided in data. Defaulting to {self.default_crs}.")
+            buildings_gdf.set_crs(self.default_crs, inplace=True)
 
-        user_file_dir = os.path.dirname(self.user_building_file)
-        if not os.path.exists(user_file_dir):
-            print(f"Directory {user_file_dir} does not exist. Creating it now.")
-            os.makedirs(user_file_dir)
+        # Ensure the geometry column is active
+        if "geometry" not in buildings_gdf.columns:
+            raise ValueError("No geometry column found in the provided data.")
+        buildings_gdf.set_geometry("geometry", inplace=True)
 
-        buildings_gdf.to_file(self.user_building_file, driver="GeoJSON")
+        # Check and reproject CRS if needed
+        return self._check_crs(buildings_gdf)
+
+    def _save_building_geometry(self, buildings_gdf):
+        UserBuildings().save(buildings_gdf)
         print(f"Building geometry saved to {self.user_building_file} in CRS {self.default_crs}.")
         self.config["user_building_file"] = self.user_building_file
         print("Project info saved in config.json.")
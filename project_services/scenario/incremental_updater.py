@@ -0,0 +1,187 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from config.config import Config
+from processing.features_collection.base_feature import INCREMENTAL_ATTR
+from processing.features_collection.feature_factory import FeatureFactory
+from processing.preparation.building_gdf_creator.data_integration import DataIntegration
+from processing.utility.census_table import CensusTable
+from processing.utility.geometry_hash import GeometryHasher
+from processing.utility.project_state import ProjectState
+
+
+class StoredProjectNotFound(LookupError):
+    """Raised when a project is updated that has no stored buildings to compare against."""
+
+
+class IncrementalUpdater(Config):
+    """
+    Prepare an updated building set for recomputation without rerunning the preparation steps.
+    Incoming buildings are compared with the project's stored state by building_id; only the features of
+    changed buildings and of their dependents (neighbour lists within the search radius and
+    census-level aggregates) are cleared, so the scenario features only fill those rows.
+    """
+
+    def __init__(self):
+        super().__init__()
+        project_info = self.config.get('project_info', {})
+        self.project_id = project_info.get('project_id')
+        self.scenario_id = project_info.get('scenario_id')
+        # An update is compared with the scenario it names as its base, by default with the scenario itself
+        self.base_scenario_id = project_info.get('base_scenario_id') or self.scenario_id
+        self.census_sections = None
+        self.default_crs = f"EPSG:{self.config.get('DEFAULT_CRS', 4326)}"
+        self.projected_crs = f"EPSG:{self.config.get('PROJECTED_CRS', 32632)}"
+        self.features = self.config.get('features', {})
+        self.census_id_column = self.features.get('census_id', {}).get('census_id_column', 'SEZ2011')
+        self.neighbours_radius = self.features.get('neighbours_ids', {}).get('radius', 100)
+
+        update_config = self.config.get('incremental_update', {})
+        self.identity_columns = update_config.get('identity_columns', ['building_id', 'building_source'])
+        self.factory = FeatureFactory()
+        self.feature_columns = [name for name in self.features
+                                if name != 'geometry' and name not in self.identity_columns]
+
+    def load_stored(self):
+        """Return the stored buildings of the base scenario being updated, and keep its stored census sections."""
+        state = ProjectState().load(self.project_id, self.base_scenario_id)
+        if state is None:
+            raise StoredProjectNotFound(
+                f"No stored buildings for project {self.project_id}, scenario {self.base_scenario_id}; run the "
+                f"scenario before updating it, or name a stored scenario as base_scenario_id.")
+        stored, self.census_sections = state
+        if 'building_id' not in stored.columns or stored.empty:
+            raise StoredProjectNotFound(
+                f"Stored buildings of project {self.project_id} have no building_id; cannot update them.")
+        return stored.to_crs(self.default_crs)
+
+    @staticmethod
+    def _differs(new_values, old_values):
+        """Compare two aligned value arrays, treating equal numbers and two missing values as unchanged."""
+        new_values = pd.Series(new_values, dtype=object)
+        old_values = pd.Series(old_values, dtype=object)
+        both_missing = new_values.isna().values & old_values.isna().values
+
+        new_numeric = pd.to_numeric(new_values, errors='coerce')
+        old_numeric = pd.to_numeric(old_values, errors='coerce')
+        numeric = (new_numeric.notna() & old_numeric.notna()).values
+        same = np.where(
+            numeric,
+            np.isclose(new_numeric.fillna(0).values, old_numeric.fillna(0).values),
+            new_values.astype(str).values == old_values.astype(str).values
+        )
+        return ~(same | both_missing)
+
+    def _assign_census_ids(self, gdf, rows):
+        """Assign census ids to new or moved buildings and drop those outside the project's census sections."""
+        if self.census_sections is not None and not self.census_sections.empty:
+            sections = self.census_sections
+            buildings = gdf.loc[rows].to_crs(sections.crs)
+            assigned = DataIntegration().representative_point_join(buildings, sections)
+
+            census_ids = pd.Series(None, index=rows, dtype=object)
+            census_ids.iloc[assigned.index.values] = sections[self.census_id_column].iloc[assigned.values].values
+            gdf.loc[rows, 'census_id'] = census_ids.values
+        else:
+            print(f"No census sections stored for project {self.project_id}; keeping the stored census ids.")
+
+        outside = rows[gdf.loc[rows, 'census_id'].isna().values]
+        if len(outside) > 0:
+            print(f"Dropping {len(outside)} buildings outside the project's census sections.")
+            gdf = gdf.drop(index=outside)
+        return gdf
+
+    def _rows_near(self, gdf, geometries):
+        """Return the index labels of buildings within the neighbour radius of any of the geometries."""
+        geometries = gpd.GeoSeries(geometries, crs=self.default_crs).dropna()
+        if geometries.empty:
+            return gdf.index[:0]
+        projected = gdf.geometry.to_crs(self.projected_crs)
+        targets = geometries.to_crs(self.projected_crs).values
+        _, positions = shapely.STRtree(projected.values).query(targets, predicate='dwithin',
+                                                                distance=self.neighbours_radius)
+        return gdf.index[np.unique(positions)]
+
+    def _clear(self, gdf, rows, columns):
+        columns = [col for col in columns if col in gdf.columns]
+        if len(rows) > 0 and columns:
+            gdf.loc[rows, columns] = None
+
+    def run(self, incoming_gdf, stored=None, census_sections=None):
+        """
+        Return the incoming buildings with stale feature values cleared. They are compared with the given
+        stored buildings and census sections, or with the project's stored state.
+        """
+        if stored is None:
+            stored = self.load_stored()
+        else:
+            stored = stored.to_crs(self.default_crs)
+            self.census_sections = census_sections
+
+        # The census features of this run read the project's own census table, rebuilt from its stored sections
+        if self.census_sections is not None and not self.census_sections.empty:
+            census_table = CensusTable()
+            census_table.save(census_table.build(self.census_sections))
+
+        gdf = incoming_gdf.to_crs(self.default_crs).reset_index(drop=True)
+        for column in ['building_id'] + self.feature_columns:
+            if column not in gdf.columns:
+                gdf[column] = None
+        gdf[self.feature_columns] = gdf[self.feature_columns].astype(object)
+
+        stored = stored.drop_duplicates(subset='building_id').set_index('building_id')
+        ids = gdf['building_id']
+        known = ids.notna() & ids.isin(stored.index)
+        new_rows = gdf.index[~known]
+        removed = stored.index.difference(ids.dropna())
+
+        matched = gdf.loc[known]
+        previous = stored.loc[matched['building_id'].values]
+        hasher = GeometryHasher()
+        moved_mask = hasher.keys(matched.geometry.values) != hasher.keys(previous.geometry.values)
+        moved = matched.index[moved_mask]
+
+        # Attribute edits: the edited value is kept, everything derived from it is recomputed
+        edited = pd.DataFrame(False, index=gdf.index, columns=self.feature_columns)
+        for column in self.feature_columns:
+            if column in previous.columns:
+                edited.loc[matched.index, column] = self._differs(matched[column].values, previous[column].values)
+        edited.loc[new_rows] = gdf.loc[new_rows, self.feature_columns].notna().values
+
+        for column in self.feature_columns:
+            rows = edited.index[edited[column]]
+            for dependent in self.factory.dependents([column]):
+                if dependent in self.feature_columns:
+                    self._clear(gdf, rows[~edited.loc[rows, dependent].values], [dependent])
+
+        # New or moved footprints: every feature that was not explicitly given is recomputed
+        reshaped = moved.union(new_rows)
+        for column in self.feature_columns:
+            if column != 'census_id':
+                self._clear(gdf, reshaped[~edited.loc[reshaped, column].values], [column])
+        if len(reshaped) > 0:
+            gdf = self._assign_census_ids(gdf, reshaped)
+
+        # Neighbour lists of buildings near any added, moved or removed footprint
+        neighbour_columns = ['neighbours_ids'] + sorted(self.factory.dependents(['neighbours_ids']))
+        changed_geometries = list(gdf.geometry.loc[reshaped.intersection(gdf.index)]) + \
+            list(previous.geometry.values[moved_mask]) + list(stored.geometry.loc[removed])
+        self._clear(gdf, self._rows_near(gdf, changed_geometries), neighbour_columns)
+
+        # Census-level aggregates of every census section that lost, gained or changed a building
+        touched_rows = edited.index[edited.any(axis=1)].union(reshaped).intersection(gdf.index)
+        touched_ids = gdf.loc[touched_rows, 'building_id'].dropna()
+        census_ids = set(gdf.loc[touched_rows, 'census_id'].dropna()) | \
+            set(stored.loc[stored.index.isin(touched_ids), 'census_id'].dropna()) | \
+            set(stored.loc[removed, 'census_id'].dropna())
+        census_rows = gdf.index[gdf['census_id'].isin(census_ids)]
+        aggregates = self.factory.census_aggregates
+        aggregate_columns = set(aggregates) | self.factory.dependents(aggregates)
+        self._clear(gdf, census_rows, [col for col in self.feature_columns if col in aggregate_columns])
+
+        print(f"Incremental update: {len(new_rows)} new, {len(moved)} moved, {int(edited.loc[matched.index].any(axis=1).sum())} "
+              f"edited and {len(removed)} removed buildings; {len(census_ids)} census sections affected.")
+        gdf.attrs[INCREMENTAL_ATTR] = True
+        return gdf
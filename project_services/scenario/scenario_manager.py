@@ -1,9 +1,22 @@
 import os
 
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
 from config.config import Config
+from processing.features_collection.feature_cache import FeatureCache
 from processing.output_generator.file_to_db import DBServerUploader
 from processing.output_generator.output_generator import OutputFileGenerator
+from processing.preparation.building_gdf_creator.footprint_matcher import FootprintMatcher
 from processing.preparation.data_preparation import PrepMain
+from processing.utility.building_schema import BuildingSchema
+from processing.utility.metrics import measure
+from processing.utility.project_state import ProjectState
+from project_services.scenario.incremental_updater import IncrementalUpdater
+from project_services.scenario.streaming_runner import StreamingScenarioRunner
+from project_services.scenario.tiled_executor import TiledScenarioExecutor
 from project_services.scenario.scenarios import BaselineScenario, GeometryScenario, DemographicScenario, EnergyScenario
 
 
@@ -21,6 +34,10 @@ class ScenarioManager(Config):
         }
         self.project_info = {}
         self.scenario_list = []
+        self.census_sections = None
+        self.projected_crs = f"EPSG:{self.config.get('PROJECTED_CRS', 32632)}"
+        # Share of a baseline footprint a new user building must cover before it replaces it, as for OSM
+        self.overlap_threshold = self.config.get("osm_overlap_threshold", 0.0)
 
     def reload_config(self):
         self.load_config()
@@ -35,41 +52,134 @@ class ScenarioManager(Config):
         print("Running preparation steps...")
         preparation = PrepMain()
         building_gdf = preparation.run(polygon_gdf)
+        self.census_sections = preparation.census_sections
         print("Preparation completed.")
         return building_gdf
 
     def generate_output(self, gdf):
         print("Generating output file...")
         generator = OutputFileGenerator()
-        json_result = generator.generate_output_file(gdf)
-        if json_result:
-            self.uploader.upload_geojson(json_result)
+        generator.generate_output_file(gdf, self.uploader)
+        print("Output file generated.")
+
+    def run_scenarios_streaming(self, polygon_gdf):
+        """Run the scenarios batch by batch and stream the building and output files to disk."""
+        scenario_classes = [self.scenario_map[name.lower()] for name in self.scenario_list
+                            if name.lower() in self.scenario_map]
+        batches = StreamingScenarioRunner().run(polygon_gdf, scenario_classes)
+
+        print("Generating output file...")
+        OutputFileGenerator().generate_output_stream(batches, self.building_file, self.uploader)
+        print(f"Feature cache hits/misses: {FeatureCache.stats()}")
         print("Output file generated.")
 
     def run_scenarios(self, polygon_gdf, gdf=None):
         self.reload_config()
 
+        # Metropolitan-scale areas are processed out of core; the buildings are never held in memory at once
+        if self.config.get("streaming", {}).get("enabled", False) and "update" not in self.scenario_list:
+            return self.run_scenarios_streaming(polygon_gdf)
+
         if "update" in self.scenario_list:
-            gdf = gdf
-            self.prepare(polygon_gdf)
+            # Only changed buildings and their dependents are recomputed, against this project's stored state
+            updater = IncrementalUpdater()
+            gdf = updater.run(gdf)
+            self.census_sections = updater.census_sections
         else:
             gdf = self.prepare(polygon_gdf)
 
+        # Large building sets run in parallel spatial partitions when tiled execution is enabled
+        scenario_classes = []
         for scenario_name in self.scenario_list:
             scenario_class = self.scenario_map.get(scenario_name.lower())
             if scenario_class:
-                print(f"Running scenario: {scenario_name}")
+                scenario_classes.append(scenario_class)
+            else:
+                print(f"Warning: Scenario '{scenario_name}' not found in scenario_map.")
+        tiled_gdf = TiledScenarioExecutor().run(gdf, scenario_classes)
+
+        if tiled_gdf is not None:
+            gdf = tiled_gdf
+        else:
+            for scenario_class in scenario_classes:
+                print(f"Running scenario: {scenario_class.__name__}")
                 scenario_instance = scenario_class()
                 gdf = scenario_instance.run_scenario(gdf)
+        print(f"Feature cache hits/misses: {FeatureCache.stats()}")
+
+        self.save_building_file(gdf)
+        self.generate_output(gdf)
+        return gdf
+
+    def run_from_baseline(self, baseline_gdf, overrides_gdf=None, census_sections=None):
+        """Serve a project from the clipped city baseline, recomputing only the buildings the user overrides."""
+        self.reload_config()
+        self.census_sections = census_sections
+        gdf = baseline_gdf
+
+        if overrides_gdf is not None and not overrides_gdf.empty:
+            # The clipped baseline is the stored state the overrides are compared against
+            gdf, overrides_gdf = self._replace_overridden(gdf, overrides_gdf)
+            gdf = pd.concat([gdf, overrides_gdf], ignore_index=True)
+            gdf = IncrementalUpdater().run(gpd.GeoDataFrame(gdf, geometry='geometry', crs=baseline_gdf.crs),
+                                           baseline_gdf, census_sections)
+            gdf = BaselineScenario().run_scenario(gdf)
+
+        for scenario_name in self.scenario_list:
+            if scenario_name.lower() in ("baseline", "update"):
+                continue
+            scenario_class = self.scenario_map.get(scenario_name.lower())
+            if scenario_class:
+                print(f"Running scenario: {scenario_name}")
+                gdf = scenario_class().run_scenario(gdf)
             else:
                 print(f"Warning: Scenario '{scenario_name}' not found in scenario_map.")
+        print(f"Feature cache hits/misses: {FeatureCache.stats()}")
 
         self.save_building_file(gdf)
         self.generate_output(gdf)
         return gdf
 
+    def _replace_overridden(self, baseline_gdf, overrides_gdf):
+        """
+        Drop the baseline buildings the user overrides replace: those with the same building_id, those whose
+        footprint an override without id matches (the override takes their id), and those that new user
+        buildings cover by more than the overlap threshold.
+        """
+        overrides_gdf = overrides_gdf.to_crs(baseline_gdf.crs)
+        overrides_gdf['building_id'] = (overrides_gdf['building_id'].astype(object)
+                                        if 'building_id' in overrides_gdf.columns else None)
+        gdf = baseline_gdf
+        if 'building_id' in baseline_gdf.columns:
+            missing = overrides_gdf['building_id'].isna()
+            if missing.any():
+                matched = FootprintMatcher().match(overrides_gdf[missing], gdf).dropna()
+                for index, building_id in matched.astype(gdf['building_id'].dtype).items():
+                    overrides_gdf.at[index, 'building_id'] = building_id
+            gdf = gdf[~gdf['building_id'].isin(overrides_gdf['building_id'].dropna())]
+
+        new_gdf = overrides_gdf[overrides_gdf['building_id'].isna()]
+        if new_gdf.empty or gdf.empty:
+            return gdf, overrides_gdf
+
+        new_idx, baseline_idx = gdf.sindex.query(new_gdf.geometry, predicate="intersects")
+        new_projected = np.asarray(new_gdf.geometry.to_crs(self.projected_crs), dtype=object)
+        baseline_projected = np.asarray(gdf.geometry.to_crs(self.projected_crs), dtype=object)
+        overlap = shapely.area(shapely.intersection(baseline_projected[baseline_idx], new_projected[new_idx]))
+        overlap_per_building = np.bincount(baseline_idx, weights=overlap, minlength=len(gdf))
+        area = shapely.area(baseline_projected)
+        ratio = np.divide(overlap_per_building, area, out=np.zeros_like(overlap_per_building), where=area > 0)
+        replaced = ratio > self.overlap_threshold
+        print(f"Removed {int(replaced.sum())} baseline buildings overlapped by new user buildings.")
+        return gdf[~replaced], overrides_gdf
+
     def save_building_file(self, gdf):
         if not os.path.exists(os.path.dirname(self.building_file)):
             os.makedirs(os.path.dirname(self.building_file))
-        gdf.to_file(self.building_file, driver='GeoJSON')
+        with measure("output", "building_file") as record:
+            gdf = BuildingSchema().restore(gdf.copy())
+            gdf.to_file(self.building_file, driver='GeoJSON')
+            # The project's own copy, which later updates of this project are compared against
+            ProjectState().save(gdf, self.project_info, self.census_sections)
+            record["rows"] = len(gdf)
         print("Features are updated in the buildings GeoJSON file.")
\ No newline at end of file
@@ -1,4 +1,5 @@
 from processing.features_collection.feature_factory import FeatureFactory
+from processing.utility.metrics import measure
 
 class BaseScenario(FeatureFactory):
     def __init__(self):
@@ -7,9 +8,11 @@ class BaseScenario(FeatureFactory):
 
     def run_scenario(self, gdf):
         """Execute each feature method based on the scenario's feature list and return the modified GeoDataFrame."""
-        for feature_name in self.feature_list:
-            print(f"Executing feature: {feature_name}")
-            gdf = self.run_feature(feature_name, gdf)
+        with measure("scenario", type(self).__name__) as record:
+            for feature_name in self.feature_list:
+                print(f"Executing feature: {feature_name}")
+                gdf = self.run_feature(feature_name, gdf)
+            record["rows"] = len(gdf)
         return gdf
 
 # Scenario classes inheriting from BaseScenario
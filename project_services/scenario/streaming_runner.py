@@ -0,0 +1,137 @@
+import os
+import shutil
+import tempfile
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from config.config import Config
+from processing.features_collection.feature_factory import FeatureFactory
+from processing.preparation.data_preparation import PrepMain
+from processing.utility.building_schema import BuildingSchema
+
+HALO_COLUMN = "__halo__"
+
+
+class StreamingScenarioRunner(Config):
+    """
+    Out-of-core scenario run for areas too large to hold in memory.
+    The first pass prepares and computes row-local features one census-section batch at a time,
+    spools each batch to GeoParquet and keeps only small per-section summaries. The second pass
+    reads the batches back one by one, fills census-level aggregates from the summaries and
+    neighbour features with a halo read from the other spooled batches, and yields the finished batch.
+    """
+
+    def __init__(self):
+        super().__init__()
+        streaming_config = self.config.get('streaming', {})
+        self.spool_root = streaming_config.get('spool_directory', './data_source/cache/streaming')
+        self.features = self.config.get('features', {})
+        self.neighbours_radius = self.features.get('neighbours_ids', {}).get('radius', 100)
+        self.default_crs = f"EPSG:{self.config.get('DEFAULT_CRS', 4326)}"
+        self.projected_crs = f"EPSG:{self.config.get('PROJECTED_CRS', 32632)}"
+        self.factory = FeatureFactory()
+        self.schema = BuildingSchema()
+
+    def _feature_order(self, scenario_classes):
+        """Return the features of all scenarios in run order, each once."""
+        feature_list = []
+        for scenario_class in scenario_classes:
+            feature_list.extend(scenario_class().feature_list)
+        return list(dict.fromkeys(feature_list))
+
+    def _summarize(self, batch):
+        """Return the per-section totals needed by the census-level aggregates."""
+        if 'census_id' not in batch.columns or 'area' not in batch.columns:
+            return None
+        return pd.to_numeric(batch['area'], errors='coerce').groupby(batch['census_id']).sum().rename('total_area')
+
+    def _halo(self, batch, manifest, batch_path, columns):
+        """Read the buildings of other spooled batches within the neighbour radius of this batch."""
+        projected = batch.geometry.to_crs(self.projected_crs)
+        search_area = gpd.GeoSeries([projected.unary_union.envelope.buffer(self.neighbours_radius)],
+                                    crs=self.projected_crs).to_crs(self.default_crs).iloc[0]
+
+        halo_parts = []
+        for path, bounds in manifest:
+            if path == batch_path or not shapely.intersects(shapely.box(*bounds), search_area):
+                continue
+            candidates = gpd.read_parquet(path, columns=columns + ['geometry'])
+            candidate_geoms = np.asarray(candidates.geometry.to_crs(self.projected_crs).values, dtype=object)
+            _, near = shapely.STRtree(candidate_geoms).query(
+                np.asarray(projected.values, dtype=object), predicate='dwithin', distance=self.neighbours_radius)
+            if len(near) > 0:
+                halo_parts.append(candidates.iloc[np.unique(near)])
+        if not halo_parts:
+            return None
+        return gpd.GeoDataFrame(pd.concat(halo_parts, ignore_index=True), crs=self.default_crs)
+
+    def _run_neighbour_features(self, batch, feature_names, manifest, batch_path):
+        """Run neighbour-dependent features on the batch extended with its halo, keeping the batch rows."""
+        required = {col for name in feature_names for col in self.features.get(name, {}).get('required_features', [])}
+        halo = self._halo(batch, manifest, batch_path, sorted(required - set(feature_names)))
+
+        frame = batch.copy()
+        frame[HALO_COLUMN] = False
+        if halo is not None:
+            # Halo rows only serve as neighbours; a placeholder keeps them from being calculated
+            for name in feature_names:
+                halo[name] = ""
+            halo[HALO_COLUMN] = True
+            frame = gpd.GeoDataFrame(pd.concat([frame, halo], ignore_index=True), crs=batch.crs)
+
+        for name in feature_names:
+            frame = self.factory.run_feature(name, frame)
+        return frame[~frame[HALO_COLUMN].astype(bool)].drop(columns=[HALO_COLUMN]).reset_index(drop=True)
+
+    def run(self, polygon_gdf, scenario_classes):
+        """Yield the finished building batches of the polygon."""
+        feature_order = self._feature_order(scenario_classes)
+        aggregates = self.factory.census_aggregates
+        neighbour_features = {'neighbours_ids'} | self.factory.dependents(['neighbours_ids'])
+        deferred = set(aggregates) | self.factory.dependents(aggregates) | neighbour_features
+        local_features = [name for name in feature_order if name not in deferred]
+
+        os.makedirs(self.spool_root, exist_ok=True)
+        spool_dir = tempfile.mkdtemp(dir=self.spool_root)
+        manifest = []
+        summaries = []
+        try:
+            # First pass: row-local features per batch, spooled to disk
+            for batch in PrepMain().iter_batches(polygon_gdf):
+                for name in local_features:
+                    batch = self.factory.run_feature(name, batch)
+                batch = self.schema.restore(batch).to_crs(self.default_crs)
+
+                summary = self._summarize(batch)
+                if summary is not None:
+                    summaries.append(summary)
+                path = os.path.join(spool_dir, f"batch_{len(manifest):05d}.parquet")
+                batch.to_parquet(path, index=False)
+                manifest.append((path, tuple(batch.total_bounds)))
+                print(f"Spooled batch {len(manifest)} with {len(batch)} buildings.")
+
+            totals = pd.concat(summaries).groupby(level=0).sum() if summaries else pd.Series(dtype=float)
+
+            # Second pass: census aggregates from the section summaries, neighbours with a halo, then output
+            for path, _ in manifest:
+                batch = gpd.read_parquet(path)
+                neighbours_done = False
+                for name in feature_order:
+                    if name not in deferred:
+                        continue
+                    if name == 'tot_area_per_cens_id' and not totals.empty:
+                        batch[name] = batch['census_id'].map(totals).values
+                    elif name in neighbour_features:
+                        if not neighbours_done:
+                            batch = self._run_neighbour_features(
+                                batch, [n for n in feature_order if n in neighbour_features], manifest, path)
+                            neighbours_done = True
+                    else:
+                        # Census sections never span batches, so section-level features are exact per batch
+                        batch = self.factory.run_feature(name, batch)
+                yield batch
+        finally:
+            shutil.rmtree(spool_dir, ignore_errors=True)
@@ -0,0 +1,118 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from config.config import Config
+from processing.features_collection.feature_factory import FeatureFactory
+from processing.utility.building_schema import BuildingSchema
+from processing.utility.metrics import Metrics
+
+ROW_COLUMN = "__row__"
+HALO_COLUMN = "__halo__"
+
+
+def _run_partition(scenario_classes, partition_gdf):
+    """Run the scenarios over one partition (core and halo rows) in a worker process; return it with its measurements."""
+    gdf = partition_gdf
+    with Metrics.collect() as records:
+        for scenario_class in scenario_classes:
+            gdf = scenario_class().run_scenario(gdf)
+    return gdf, records
+
+
+class TiledScenarioExecutor(Config):
+    """
+    Run scenarios over large building sets in parallel partitions.
+    Buildings are partitioned by census section or by square tile; each partition also carries a halo of
+    the buildings within the neighbour radius, so neighbour-dependent features see the same surroundings
+    as in a single run. Only the core rows of each partition are kept and merged back in input order.
+    """
+
+    def __init__(self):
+        super().__init__()
+        tiled_config = self.config.get('tiled_execution', {})
+        self.enabled = tiled_config.get('enabled', False)
+        self.mode = tiled_config.get('mode', 'census')
+        self.tile_size = tiled_config.get('tile_size', 1000)
+        self.min_buildings = tiled_config.get('min_buildings', 2000)
+        self.max_workers = tiled_config.get('max_workers') or os.cpu_count() or 1
+        self.global_features = tiled_config.get('global_features', ['building_id', 'census_id'])
+        self.halo_radius = self.config.get('features', {}).get('neighbours_ids', {}).get('radius', 100)
+        self.projected_crs = f"EPSG:{self.config.get('PROJECTED_CRS', 32632)}"
+
+    def _by_census(self, gdf):
+        return self.mode == 'census' and 'census_id' in gdf.columns and gdf['census_id'].notna().all()
+
+    def _partition_keys(self, gdf):
+        """Return the partition key of every building: its census section or its projected tile."""
+        if self._by_census(gdf):
+            return gdf['census_id'].astype(str).to_numpy()
+
+        centroids = gdf.geometry.to_crs(self.projected_crs).centroid
+        columns = np.floor(centroids.x.to_numpy() / self.tile_size).astype(np.int64)
+        rows = np.floor(centroids.y.to_numpy() / self.tile_size).astype(np.int64)
+        return np.char.add(np.char.add(columns.astype(str), '/'), rows.astype(str))
+
+    def _partitions(self, gdf):
+        """Group the partition keys into about four partitions per worker, keeping keys together."""
+        keys = self._partition_keys(gdf)
+        unique_keys, codes = np.unique(keys, return_inverse=True)
+        bundles = min(len(unique_keys), self.max_workers * 4)
+        bundle_of_key = np.arange(len(unique_keys)) * bundles // len(unique_keys)
+        bundle_codes = bundle_of_key[codes]
+        return [np.flatnonzero(bundle_codes == bundle) for bundle in range(bundles)]
+
+    def _with_halo(self, gdf, projected, tree, core_positions):
+        """Return the partition frame: its core rows plus the halo rows within the neighbour radius."""
+        _, nearby = tree.query(projected[core_positions], predicate='dwithin', distance=self.halo_radius)
+        halo_positions = np.setdiff1d(np.unique(nearby), core_positions)
+        partition = gdf.iloc[np.concatenate([core_positions, halo_positions])].copy()
+        partition[HALO_COLUMN] = np.r_[np.zeros(len(core_positions), bool), np.ones(len(halo_positions), bool)]
+        return partition
+
+    def run(self, gdf, scenario_classes):
+        """Run the scenarios tiled, or return None when the building set should run in one piece."""
+        if not self.enabled or len(gdf) < self.min_buildings or self.max_workers < 2:
+            return None
+
+        # Features whose values must agree across partitions are computed once for the whole frame
+        factory = FeatureFactory()
+        for feature_name in self.global_features:
+            gdf = factory.run_feature(feature_name, gdf)
+
+        gdf = gdf.reset_index(drop=True)
+        by_census = self._by_census(gdf)
+        gdf[ROW_COLUMN] = np.arange(len(gdf))
+        projected = np.asarray(gdf.geometry.to_crs(self.projected_crs).values, dtype=object)
+        tree = shapely.STRtree(projected)
+        partitions = [self._with_halo(gdf, projected, tree, positions) for positions in self._partitions(gdf)]
+        print(f"Running {len(scenario_classes)} scenarios over {len(gdf)} buildings in "
+              f"{len(partitions)} {'census' if by_census else 'tile'} partitions with {self.max_workers} workers.")
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            results = []
+            for result, records in pool.map(_run_partition, [scenario_classes] * len(partitions), partitions):
+                results.append(result)
+                Metrics.add(records)
+
+        cores = [result[~result[HALO_COLUMN].astype(bool)] for result in results]
+        merged = pd.concat(cores, ignore_index=True).sort_values(ROW_COLUMN, kind='stable')
+        merged = gpd.GeoDataFrame(merged.drop(columns=[ROW_COLUMN, HALO_COLUMN]).reset_index(drop=True),
+                                  geometry=gdf.geometry.name, crs=results[0].crs if results else gdf.crs)
+
+        # Partitions are uniform per column again; give the features back their compact dtypes
+        schema = BuildingSchema()
+        for feature_name in schema.features:
+            merged = schema.compact(schema.restore(merged, [feature_name]), feature_name)
+
+        # Tiles cut through census sections, so census-level aggregates are recomputed over the merged frame
+        if not by_census:
+            for feature_name in factory.census_aggregates:
+                if feature_name in merged.columns:
+                    merged[feature_name] = None
+                    merged = factory.run_feature(feature_name, merged)
+        return merged
@@ -0,0 +1,110 @@
+import gzip
+
+import geopandas as gpd
+import ijson
+from shapely.geometry import shape
+
+from config.config import Config
+
+FEATURES_PREFIX = "buildingGeometry.features"
+FEATURE_PREFIX = FEATURES_PREFIX + ".item"
+
+
+class RequestTooLarge(ValueError):
+    """Raised when a request body exceeds the configured size limits."""
+
+
+class _LimitedReader:
+    """File-like view of a stream that raises RequestTooLarge once more than `limit` bytes were read."""
+
+    def __init__(self, stream, limit, what):
+        self.stream = stream
+        self.limit = limit
+        self.what = what
+        self.count = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.count += len(data)
+        if self.limit and self.count > self.limit:
+            raise RequestTooLarge(f"{self.what} exceeds the limit of {self.limit} bytes.")
+        return data
+
+
+class BuildingGeometryReader(Config):
+    """
+    Parse a buildingGeometry request body incrementally. The body is read in chunks (gunzipped if sent
+    with Content-Encoding: gzip) and the features are collected straight into a geometry array and
+    property columns, so neither the whole body nor a list of feature dicts is held in memory.
+    """
+
+    def __init__(self):
+        super().__init__()
+        limits = self.config.get('request_limits', {})
+        self.max_body_bytes = limits.get('max_body_bytes', 200 * 1024 * 1024)
+        self.max_json_bytes = limits.get('max_json_bytes', 1024 * 1024 * 1024)
+        self.max_features = limits.get('max_features', 1000000)
+        self.read_chunk_bytes = limits.get('read_chunk_bytes', 1024 * 1024)
+
+    def _stream(self, body, content_encoding=None):
+        stream = _LimitedReader(body, self.max_body_bytes, "Request body")
+        if content_encoding and content_encoding.lower() == "gzip":
+            # Limit the decompressed size as well, so a small compressed body cannot expand without bound
+            stream = _LimitedReader(gzip.GzipFile(fileobj=stream), self.max_json_bytes, "Decompressed request body")
+        return stream
+
+    def read(self, body, content_encoding=None):
+        """
+        Return the request's members other than the features, and the features as a GeoDataFrame
+        without a CRS (None if the request has no buildingGeometry features).
+        """
+        data = {}
+        geometries = []
+        columns = {}
+        key = builder = feature = None
+
+        events = ijson.parse(self._stream(body, content_encoding), buf_size=self.read_chunk_bytes, use_float=True)
+        for prefix, event, value in events:
+            if prefix.startswith(FEATURE_PREFIX):
+                if feature is None:
+                    feature = ijson.ObjectBuilder()
+                feature.event(event, value)
+                if prefix == FEATURE_PREFIX and event == "end_map":
+                    self._add_feature(feature.value, geometries, columns)
+                    feature = None
+                continue
+            if prefix == FEATURES_PREFIX:
+                continue
+
+            if prefix == "":
+                if event not in ("start_map", "map_key", "end_map"):
+                    raise ValueError("Request body must be a JSON object.")
+                # Members of the root object: the previous member is complete
+                if key is not None:
+                    data[key] = builder.value
+                key = value if event == "map_key" else None
+                builder = ijson.ObjectBuilder() if event == "map_key" else None
+                continue
+            builder.event(event, value)
+
+        if not isinstance(data.get("buildingGeometry"), dict) or not geometries:
+            return data, None
+
+        count = len(geometries)
+        properties = {name: values + [None] * (count - len(values)) for name, values in columns.items()}
+        buildings_gdf = gpd.GeoDataFrame(properties, geometry=geometries)
+        print(f"Read {count} buildings from the request body.")
+        return data, buildings_gdf
+
+    def _add_feature(self, feature, geometries, columns):
+        """Append a feature's geometry and properties to the column lists."""
+        if len(geometries) >= self.max_features:
+            raise RequestTooLarge(f"Request has more than {self.max_features} buildings.")
+        geometry = feature.get("geometry")
+        index = len(geometries)
+        geometries.append(shape(geometry) if geometry else None)
+        for name, value in (feature.get("properties") or {}).items():
+            values = columns.setdefault(name, [])
+            # Columns first seen on a later feature, or missing on earlier ones, are padded with None
+            values.extend([None] * (index - len(values)))
+            values.append(value)
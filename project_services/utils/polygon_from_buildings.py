@@ -1,9 +1,11 @@
 import os
 
 import geopandas as gpd
+import shapely
 from shapely.geometry import Polygon
 
 from config.config import Config
+from processing.utility.user_buildings import UserBuildings
 
 
 class BuildingPolygonCreator(Config):
@@ -12,6 +14,11 @@ class BuildingPolygonCreator(Config):
         self.default_crs = f"EPSG:{self.config.get('DEFAULT_CRS', 4326)}"
         self.user_building_file = self.config.get('user_building_file')
         self.output_path = self.config.get('polygon_from_building')
+        self.projected_crs = f"EPSG:{self.config.get('PROJECTED_CRS', 32632)}"
+        hull_config = self.config.get('project_hull', {})
+        self.hull_mode = hull_config.get('mode', 'convex')
+        self.concave_ratio = hull_config.get('concave_ratio', 0.3)
+        self.buffer_meters = hull_config.get('buffer_meters', 50)
 
     def user_polygon(self, polygon_coords):
         """Create and save a polygon from the provided coordinates."""
@@ -23,12 +30,13 @@ class BuildingPolygonCreator(Config):
         return polygon_gdf
 
     def load_buildings(self):
-        """Load the user building file as a GeoDataFrame."""
-        if not os.path.exists(self.user_building_file):
+        """Load the user buildings as a GeoDataFrame."""
+        user_buildings = UserBuildings()
+        if not user_buildings.exists():
             raise FileNotFoundError(f"File not found: {self.user_building_file}")
 
         try:
-            buildings_gdf = gpd.read_file(self.user_building_file)
+            buildings_gdf = user_buildings.load()
             if buildings_gdf.empty:
                 raise ValueError("The building file contains no geometries.")
             print("Buildings loaded successfully.")
@@ -36,12 +44,13 @@ class BuildingPolygonCreator(Config):
         except Exception as e:
             raise FileNotFoundError(f"Unable to load building file: {e}")
 
-    def create_polygon_from_buildings(self):
-        """Create a polygon encompassing all building geometries."""
+    def create_polygon_from_buildings(self, buildings_gdf=None):
+        """Create a polygon encompassing all building geometries, loading the user buildings if none are given."""
         self.load_config()
-        buildings_gdf = self.load_buildings()
+        if buildings_gdf is None or buildings_gdf.empty:
+            buildings_gdf = self.load_buildings()
 
-        polygon = self._create_convex_hull(buildings_gdf)
+        polygon = self._create_hull(buildings_gdf)
         self._update_map_center(polygon)
         self._save_polygon_in_project_info(polygon)
 
@@ -75,9 +84,28 @@ class BuildingPolygonCreator(Config):
         gdf.to_file(self.output_path, driver='GeoJSON')
         print(f"GeoJSON file saved to {self.output_path}")
 
-    def _create_convex_hull(self, gdf):
-        """Create a convex hull polygon from building geometries."""
-        return gdf.unary_union.convex_hull
+    def _create_hull(self, gdf):
+        """Create the project polygon from the building vertices, without a union of the footprints."""
+        points = shapely.multipoints(shapely.get_coordinates(gdf.geometry.values))
+        if self.hull_mode == 'concave':
+            polygon = self._create_concave_hull(points, gdf.crs)
+            if polygon is not None:
+                return polygon
+        return points.convex_hull
+
+    def _create_concave_hull(self, points, crs):
+        """
+        Create a concave hull of the building vertices, buffered by buffer_meters so the buildings on its edge
+        are covered. Returns None if the hull is not a single polygon.
+        """
+        projected = gpd.GeoSeries([points], crs=crs or self.default_crs).to_crs(self.projected_crs)
+        hull = shapely.concave_hull(projected.iloc[0], ratio=self.concave_ratio).buffer(self.buffer_meters, quad_segs=2)
+        if hull.geom_type != 'Polygon' or hull.is_empty:
+            return None
+        polygon = gpd.GeoSeries([hull], crs=self.projected_crs).to_crs(crs or self.default_crs).iloc[0]
+        print(f"Concave project hull covers {hull.area / projected.iloc[0].convex_hull.buffer(self.buffer_meters).area:.0%} "
+              f"of the buffered convex hull.")
+        return polygon
 
     def _update_map_center(self, polygon):
         """Update the map center in the configuration based on the polygon centroid."""
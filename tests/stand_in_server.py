@@ -0,0 +1,83 @@
+import argparse
+import gzip
+import itertools
+import json
+import threading
+
+import cherrypy
+
+
+class StandInDatabaseServer:
+    """
+    Local stand-in for the building database endpoint, for trying uploads without the real server.
+    It accepts whole, paginated and patch uploads (optionally gzip-compressed), answers every fail_every-th
+    request with 503 to exercise retries, and lists what it received on GET.
+    """
+    exposed = True
+
+    def __init__(self, fail_every=0):
+        self.fail_every = fail_every
+        self.requests = itertools.count(1)
+        self.uploads = {}
+        self.patches = []
+        self.lock = threading.Lock()
+
+    @cherrypy.tools.json_out()
+    def POST(self, *args, **kwargs):
+        if self.fail_every and next(self.requests) % self.fail_every == 0:
+            raise cherrypy.HTTPError(503, "Stand-in failure")
+
+        body = cherrypy.request.body.read()
+        if cherrypy.request.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        try:
+            data = json.loads(body)
+        except json.JSONDecodeError:
+            raise cherrypy.HTTPError(400, "Invalid or missing JSON data")
+
+        if data.get("type") == "BuildingPatch":
+            with self.lock:
+                self.patches.append(data)
+            return {"status_code": 200, "version": data["version"], "added": len(data["added"]),
+                    "changed": len(data["changed"]), "removed": len(data["removed"])}
+
+        page = data.get("page", {"upload_id": "whole", "index": 0, "last": True})
+        with self.lock:
+            upload = self.uploads.setdefault(page["upload_id"], {"pages": {}, "complete": False})
+            upload["pages"][page["index"]] = len(data.get("features", []))
+            if page["last"]:
+                missing = sorted(set(range(page["index"])) - set(upload["pages"]))
+                if missing:
+                    raise cherrypy.HTTPError(409, f"Pages missing before the last page: {missing}")
+                upload["complete"] = True
+            received = sum(upload["pages"].values())
+
+        return {"status_code": 200, "upload_id": page["upload_id"], "page": page["index"],
+                "buildings_received": received}
+
+    @cherrypy.tools.json_out()
+    def GET(self, *args, **kwargs):
+        with self.lock:
+            return {upload_id: {"pages": len(upload["pages"]), "buildings": sum(upload["pages"].values()),
+                                "complete": upload["complete"]}
+                    for upload_id, upload in self.uploads.items()}
+
+
+def start(port=8003, fail_every=0, path="/api/new_validated_building_scenario/lod1/"):
+    """Start the stand-in server in the background and return it."""
+    server = StandInDatabaseServer(fail_every)
+    cherrypy.config.update({"server.socket_host": "127.0.0.1", "server.socket_port": port,
+                            "log.screen": False, "engine.autoreload.on": False})
+    cherrypy.tree.mount(server, path, {"/": {"request.dispatch": cherrypy.dispatch.MethodDispatcher()}})
+    cherrypy.engine.start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stand-in for the building database upload endpoint.")
+    parser.add_argument("--port", type=int, default=8003)
+    parser.add_argument("--fail-every", type=int, default=0, help="Answer every n-th request with 503.")
+    arguments = parser.parse_args()
+
+    start(arguments.port, arguments.fail_every)
+    cherrypy.engine.block()
@@ -0,0 +1,84 @@
+import socket
+
+import cherrypy
+import geopandas as gpd
+import pytest
+import requests
+from shapely.geometry import box
+
+import stand_in_server
+from processing.output_generator.paginated_upload import PaginatedUpload
+
+PATH = "/api/new_validated_building_scenario/lod1/"
+
+
+@pytest.fixture(scope="module")
+def server():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    stand_in = stand_in_server.start(port=port, path=PATH)
+    stand_in.url = f"http://127.0.0.1:{port}{PATH}"
+    yield stand_in
+    cherrypy.engine.exit()
+
+
+def buildings(count):
+    return gpd.GeoDataFrame({"building_id": range(count), "height": [3.0 * i for i in range(count)]},
+                            geometry=[box(i, 0, i + 1, 1) for i in range(count)], crs="EPSG:4326")
+
+
+def upload(server, tmp_path, project_id, gdf, retries=5):
+    uploader = PaginatedUpload(server.url, {}, {"project_id": project_id, "scenario_id": "s1"}, page_size=10,
+                               workers=2, retries=retries, backoff_factor=0, ledger_directory=str(tmp_path))
+    uploader.add(gdf.iloc[:15])
+    uploader.add(gdf.iloc[15:])
+    return uploader, uploader.close()
+
+
+def received(server, project_id):
+    return requests.get(server.url).json()[f"{project_id}_s1"]
+
+
+def test_pages_are_sent_in_order_with_the_last_page_after_the_others(server, tmp_path):
+    server.fail_every = 0
+    uploader, result = upload(server, tmp_path, "paging", buildings(25))
+
+    assert result["page"] == 2
+    assert uploader.sent == 2
+    assert received(server, "paging") == {"pages": 3, "buildings": 25, "complete": True}
+    assert not (tmp_path / "paging_s1.json").exists()
+
+
+def test_failed_requests_are_retried(server, tmp_path):
+    server.fail_every = 2
+    try:
+        uploader, result = upload(server, tmp_path, "retry", buildings(45))
+    finally:
+        server.fail_every = 0
+
+    assert result is not None
+    assert uploader.failed == 0
+    assert received(server, "retry") == {"pages": 5, "buildings": 45, "complete": True}
+
+
+def test_interrupted_upload_resumes_from_the_ledger(server, tmp_path):
+    gdf = buildings(45)
+    server.fail_every = 2
+    try:
+        first, result = upload(server, tmp_path, "resume", gdf, retries=0)
+    finally:
+        server.fail_every = 0
+
+    assert result is None
+    assert first.failed > 0
+    assert (tmp_path / "resume_s1.json").exists()
+    assert not received(server, "resume")["complete"]
+
+    second, result = upload(server, tmp_path, "resume", gdf)
+
+    assert result is not None
+    assert second.skipped == first.sent
+    assert second.sent == 4 - first.sent
+    assert received(server, "resume") == {"pages": 5, "buildings": 45, "complete": True}
+    assert not (tmp_path / "resume_s1.json").exists()
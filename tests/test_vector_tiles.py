@@ -0,0 +1,62 @@
+import geopandas as gpd
+import mapbox_vector_tile
+from shapely.geometry import box
+
+from processing.output_generator import vector_tiles
+from processing.output_generator.project_store import ProjectStore
+from processing.output_generator.vector_tiles import VectorTileBuilder
+from processing.utility.disk_cache import DiskCache
+
+
+def builder(tmp_path):
+    store = ProjectStore()
+    store.directory = str(tmp_path / "store")
+    store.catalogue_path = str(tmp_path / "store" / "catalogue.sqlite")
+    tiles = VectorTileBuilder()
+    tiles.store = store
+    tiles.cache = DiskCache(str(tmp_path / "tiles"), 1024 * 1024, suffix=".mvt")
+    tiles.attributes = ["building_id", "height"]
+    return tiles
+
+
+def buildings():
+    # Two buildings in Turin, both inside tile 14/8540/5889
+    return gpd.GeoDataFrame({"building_id": ["a", "b"], "height": [9.5, None]},
+                            geometry=[box(7.6600, 45.0700, 7.6602, 45.0702), box(7.6605, 45.0700, 7.6607, 45.0702)],
+                            crs="EPSG:4326")
+
+
+def test_tile_is_encoded_with_the_stored_buildings(tmp_path):
+    tiles = builder(tmp_path)
+    tiles.store.save(buildings(), {"project_id": "p", "scenario_id": "s"})
+
+    data = tiles.tile("p", 14, 8540, 5889)
+    layer = mapbox_vector_tile.decode(data)[tiles.layer_name]
+
+    assert layer["extent"] == tiles.extent
+    properties = sorted((feature["properties"] for feature in layer["features"]), key=lambda p: p["building_id"])
+    # Vector tiles have no null values, so the missing height is left out
+    assert properties == [{"building_id": "a", "height": 9.5}, {"building_id": "b"}]
+    assert all(feature["geometry"]["type"] == "Polygon" for feature in layer["features"])
+
+
+def test_tile_outside_the_buildings_is_empty(tmp_path):
+    tiles = builder(tmp_path)
+    tiles.store.save(buildings(), {"project_id": "p", "scenario_id": "s"})
+
+    layer = mapbox_vector_tile.decode(tiles.tile("p", 14, 0, 0)).get(tiles.layer_name, {"features": []})
+    assert layer["features"] == []
+    assert tiles.tile("unknown", 14, 8540, 5889) is None
+
+
+def test_loaded_tables_are_bounded(tmp_path):
+    tiles = builder(tmp_path)
+    tiles.memory_tables = 2
+    for project_id in ("p1", "p2", "p3"):
+        tiles.store.save(buildings(), {"project_id": project_id, "scenario_id": "s"})
+        tiles.tile(project_id, 14, 8540, 5889)
+
+    paths = {path for path, _ in vector_tiles._LOADED_TABLES}
+    assert len(vector_tiles._LOADED_TABLES) <= 2
+    assert tiles.store.entry("p3", "s")["path"] in paths
+    assert tiles.store.entry("p1", "s")["path"] not in paths
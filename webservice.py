@@ -1,10 +1,21 @@
+import hashlib
 import json
+import os
 
 import cherrypy
+import ijson
 from cherrypy import response
+from cherrypy.lib.static import serve_file
 
 from config.config import Config
+from processing.output_generator.geojson_stream import GeoJSONStreamWriter
+from processing.output_generator.output_formats import FORMATS, OutputFormats
+from processing.output_generator.project_store import ProjectStore
+from processing.output_generator.vector_tiles import VectorTileBuilder
+from processing.utility.metrics import Metrics
 from project_services.helper import DataHelper
+from project_services.scenario.incremental_updater import StoredProjectNotFound
+from project_services.utils.building_geometry_reader import BuildingGeometryReader, RequestTooLarge
 
 
 # Base server class with shared configuration and helper
@@ -21,6 +32,24 @@ class BaseServer(Config):
         cherrypy.response.headers['Access-Control-Max-Age'] = '3600'
         cherrypy.response.headers['Content-Type'] = 'text/plain'
 
+
+def read_building_geometry():
+    """Parse a buildingGeometry request body as it streams in; return the data, the buildings and an error response."""
+    try:
+        json_body, buildings_gdf = BuildingGeometryReader().read(
+            cherrypy.request.rfile, cherrypy.request.headers.get('Content-Encoding'))
+    except RequestTooLarge as e:
+        response.status = 413
+        return None, None, {"status_code": 413, "message": str(e)}
+    except (ijson.JSONError, OSError, EOFError, ValueError) as e:
+        response.status = 400
+        return None, None, {"status_code": 400, "message": f"Invalid or missing JSON data: {e}"}
+
+    count = 0 if buildings_gdf is None else len(buildings_gdf)
+    print(f"Received buildingGeometry data with {count} buildings; other members: {sorted(json_body)}")
+    return json_body, buildings_gdf, None
+
+
 # Polygon Server: Handles requests specific to polygonArray
 class PolygonServer(BaseServer):
     @cherrypy.tools.json_out()
@@ -43,7 +72,7 @@ class PolygonServer(BaseServer):
 
             message = {"status_code": 200, "message": "polygonArray Data processed successfully",
                        "project_name": project_name, "scenario_name": scenario_name, "project_id": project_id,
-                       "scenario_id": scenario_id}
+                       "scenario_id": scenario_id, "metrics": Metrics.job_summary()}
 
             print(message)
             return message
@@ -55,19 +84,16 @@ class PolygonServer(BaseServer):
 
 # Building Server: Handles requests specific to buildingGeometry
 class BuildingServer(BaseServer):
+    @cherrypy.config(**{'request.process_request_body': False})
     @cherrypy.tools.json_out()
     def POST(self):
-        try:
-            body = cherrypy.request.body.read().decode('utf-8')
-            json_body = json.loads(body)
-            print("Received JSON data for buildingGeometry:", json_body)
-        except json.JSONDecodeError:
-            response.status = 400
-            return {"status_code": 400, "message": "Invalid or missing JSON data"}
+        json_body, buildings_gdf, error = read_building_geometry()
+        if error:
+            return error
 
         if 'buildingGeometry' in json_body:
             print("Processing buildingGeometry data...")
-            self.helper.process_building_geometry(json_body)
+            self.helper.process_building_geometry(json_body, buildings_gdf)
             self.load_config()
             project_id = self.config["project_info"]["project_id"]
             scenario_id = self.config["project_info"]["scenario_id"]
@@ -76,7 +102,7 @@ class BuildingServer(BaseServer):
 
             message = {"status_code": 200, "message": "buildingGeometry Data processed successfully",
                        "project_name": project_name, "scenario_name": scenario_name, "project_id": project_id,
-                       "scenario_id": scenario_id}
+                       "scenario_id": scenario_id, "metrics": Metrics.job_summary()}
 
             print(message)
             return message
@@ -88,19 +114,19 @@ class BuildingServer(BaseServer):
 
 
 class UpdateBuildingServer(BaseServer):
+    @cherrypy.config(**{'request.process_request_body': False})
     @cherrypy.tools.json_out()
     def POST(self):
-        try:
-            body = cherrypy.request.body.read().decode('utf-8')
-            json_body = json.loads(body)
-            print("Received JSON data for buildingGeometry:", json_body)
-        except json.JSONDecodeError:
-            response.status = 400
-            return {"status_code": 400, "message": "Invalid or missing JSON data"}
+        json_body, buildings_gdf, error = read_building_geometry()
+        if error:
+            return error
 
         if 'buildingGeometry' in json_body:
             print("Processing buildingGeometry data...")
-            gdf = self.helper.update_buildings_gdf(json_body)
+            try:
+                gdf = self.helper.update_buildings_gdf(json_body, buildings_gdf)
+            except StoredProjectNotFound as e:
+                raise cherrypy.HTTPError(404, str(e))
             self.load_config()
             project_id = self.config["project_info"]["project_id"]
             scenario_id = self.config["project_info"]["scenario_id"]
@@ -109,7 +135,7 @@ class UpdateBuildingServer(BaseServer):
 
             message = {"status_code": 200, "message": "buildingGeometry Data processed successfully",
                        "project_name": project_name, "scenario_name": scenario_name, "project_id": project_id,
-                       "scenario_id": scenario_id}
+                       "scenario_id": scenario_id, "metrics": Metrics.job_summary()}
 
             print(message)
             return message
@@ -119,6 +145,110 @@ class UpdateBuildingServer(BaseServer):
     def GET(self):
         return "GET request received on UpdateBuildingServer"
 
+# Results Server: Serves the latest output in the format asked for by ?format= or the Accept header
+class ResultsServer(BaseServer):
+    def GET(self, format=None):
+        formats = OutputFormats()
+        fmt = formats.negotiate(cherrypy.request.headers.get('Accept'), format)
+        if fmt is None:
+            raise cherrypy.HTTPError(406, f"Supported formats: {', '.join(FORMATS)}")
+
+        path = formats.result_file(fmt)
+        if path is None:
+            raise cherrypy.HTTPError(404, 'No output has been generated yet.')
+        return serve_file(os.path.abspath(path), content_type=FORMATS[fmt][0],
+                          disposition='attachment', name=os.path.basename(path))
+
+# Project Server: Serves stored project results
+#   /projects/<id>/scenarios                  catalogue of the project's stored scenarios
+#   /projects/<id>/scenarios/<sid>            buildings, with bbox, columns, offset and limit parameters
+#   /projects/<id>/tiles/<z>/<x>/<y>.mvt      vector tiles of the latest (or ?scenario=) scenario
+class ProjectServer(BaseServer):
+    def GET(self, project_id=None, resource=None, *path, **params):
+        if resource == 'tiles' and len(path) == 3:
+            return self._tile(project_id, *path, **params)
+        if resource == 'scenarios' and not path:
+            return self._scenarios(project_id)
+        if resource == 'scenarios' and len(path) == 1:
+            return self._scenario(project_id, path[0], **params)
+        raise cherrypy.HTTPError(404, 'Unknown project resource.')
+
+    @staticmethod
+    def _not_modified(etag):
+        """Set the ETag header and tell whether the client already holds this version."""
+        cherrypy.response.headers['ETag'] = etag
+        return cherrypy.request.headers.get('If-None-Match') == etag
+
+    def _scenarios(self, project_id):
+        entries = ProjectStore().scenarios(project_id)
+        if not entries:
+            raise cherrypy.HTTPError(404, f'No results stored for project {project_id}.')
+        cherrypy.response.headers['Content-Type'] = 'application/json'
+        return json.dumps([{key: value for key, value in entry.items() if key != 'path'}
+                           for entry in entries]).encode('utf-8')
+
+    def _scenario(self, project_id, scenario_id, bbox=None, columns=None, offset='0', limit=None):
+        store = ProjectStore()
+        entry = store.entry(project_id, scenario_id)
+        if entry is None:
+            raise cherrypy.HTTPError(404, f'No results stored for project {project_id}, scenario {scenario_id}.')
+        try:
+            bbox = [float(value) for value in bbox.split(',')] if bbox else None
+            offset = int(offset)
+            limit = int(limit) if limit else None
+        except ValueError:
+            raise cherrypy.HTTPError(400, 'bbox must be four numbers; offset and limit must be integers.')
+        if (bbox is not None and len(bbox) != 4) or offset < 0 or (limit is not None and limit <= 0):
+            raise cherrypy.HTTPError(400, 'bbox must be minx,miny,maxx,maxy; offset and limit must be positive.')
+
+        query = json.dumps([bbox, columns, offset, limit])
+        etag = '"' + hashlib.sha1(f"{entry['etag']}{query}".encode('utf-8')).hexdigest() + '"'
+        if self._not_modified(etag):
+            cherrypy.response.status = 304
+            return b''
+
+        page, total = store.query(entry, bbox, columns.split(',') if columns else None, offset, limit)
+        extra = {'numberMatched': total, 'numberReturned': len(page), 'offset': offset,
+                 'project_id': project_id, 'scenario_id': scenario_id}
+        cherrypy.response.headers['Content-Type'] = 'application/geo+json'
+        return b''.join(GeoJSONStreamWriter().collection_chunks([page], extra))
+
+    def _tile(self, project_id, z, x, y, attributes=None, scenario=None):
+        if not y.endswith('.mvt'):
+            raise cherrypy.HTTPError(404, 'Tiles are served as .mvt.')
+        try:
+            z, x, y = int(z), int(x), int(y[:-len('.mvt')])
+        except ValueError:
+            raise cherrypy.HTTPError(400, 'Tile coordinates must be integers.')
+
+        builder = VectorTileBuilder()
+        if not builder.valid_tile(z, x, y):
+            raise cherrypy.HTTPError(400, f'Tile {z}/{x}/{y} is out of range.')
+        entry = ProjectStore().entry(project_id, scenario)
+        if entry is None:
+            raise cherrypy.HTTPError(404, f'No results stored for project {project_id}.')
+
+        # A new run of the scenario changes the table's ETag; clients revalidate before reusing a tile
+        cherrypy.response.headers['Cache-Control'] = 'no-cache'
+        query = json.dumps([entry['scenario_id'], z, x, y, attributes])
+        etag = '"' + hashlib.sha1(f"{entry['etag']}{query}".encode('utf-8')).hexdigest() + '"'
+        if self._not_modified(etag):
+            cherrypy.response.status = 304
+            return b''
+
+        tile = builder.tile(project_id, z, x, y, attributes.split(',') if attributes else None, entry['scenario_id'])
+        if tile is None:
+            raise cherrypy.HTTPError(404, f'No results stored for project {project_id}.')
+
+        cherrypy.response.headers['Content-Type'] = 'application/vnd.mapbox-vector-tile'
+        return tile
+
+# Metrics Server: Step timings and row counts in the Prometheus text format
+class MetricsServer(BaseServer):
+    def GET(self):
+        cherrypy.response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+        return Metrics.prometheus().encode('utf-8')
+
 # CORS setup function
 def CORS():
     cherrypy.response.headers["Access-Control-Allow-Origin"] = "*"
@@ -141,6 +271,9 @@ if __name__ == '__main__':
     cherrypy.tree.mount(PolygonServer(), '/polygonArray', config)
     cherrypy.tree.mount(BuildingServer(), '/buildingGeometry', config)
     cherrypy.tree.mount(UpdateBuildingServer(), '/updateBuildings', config)
+    cherrypy.tree.mount(ResultsServer(), '/results', config)
+    cherrypy.tree.mount(ProjectServer(), '/projects', config)
+    cherrypy.tree.mount(MetricsServer(), '/metrics', config)
 
     cherrypy.engine.start()
     cherrypy.engine.block()
\ No newline at end of file